@@ -0,0 +1,165 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+
+import io
+import os
+import sys
+import gzip
+import time
+import queue
+import tarfile
+import zipfile
+import threading
+
+ARCHIVE_FORMATS = ["zip", "tar", "tar.gz"]
+_STOP = object()
+
+
+def archive_format_for(path):
+	"""guesses the format from the archive's name"""
+	name = path.lower()
+	if name.endswith((".tar.gz", ".tgz")):
+		return "tar.gz"
+	if name.endswith(".tar"):
+		return "tar"
+	return "zip"
+
+
+def archive_name(path):
+	"""the name path gets inside the archive, so extracting it recreates the folder layout"""
+	path = os.path.normpath(path)
+	if os.path.isabs(path) or path.startswith(".."):
+		path = os.path.splitdrive(path)[1].lstrip(os.sep + "/")
+	return path.replace(os.sep, "/")
+
+
+class ArchiveWriter:
+	"""
+		writes files into one zip or tar archive in a single sequential pass, instead of creating
+		a file per post and image. path "-" streams the archive to stdout.
+
+		adding only queues the file. a background thread does the compressing and writing, so
+		the converting thread never waits on a slow file system unless max_queued files are
+		already waiting. files added under a name that's already in the archive are skipped.
+		close() (or leaving the with block) finishes the archive and raises any error writing it.
+	"""
+	def __init__(self, path, archive_format=None, compression_level=6, max_queued=256):
+		self.path = path
+		self.archive_format = archive_format or archive_format_for(path)
+		if self.archive_format not in ARCHIVE_FORMATS:
+			raise ValueError(f"unknown archive format '{self.archive_format}'. known: {', '.join(ARCHIVE_FORMATS)}")
+		self.compression_level = compression_level
+		self.files = 0
+		self.bytes = 0
+
+		self._names = set()
+		self._error = None
+		self._queue = queue.Queue(max_queued)
+		self._open()
+		self._thread = threading.Thread(target=self._write_queued, name="archive-writer", daemon=True)
+		self._thread.start()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+	def add_text(self, name, text):
+		self._put((archive_name(name), text.encode("utf-8"), None, False))
+
+	def add_file(self, name, path, remove_after=False):
+		"""queues the file at path. with remove_after, path is deleted once it's in the archive"""
+		self._put((archive_name(name), None, path, remove_after))
+
+	def flush(self):
+		"""waits until everything added so far is written"""
+		self._queue.join()
+		if self._error is not None:
+			raise self._error
+
+	def close(self):
+		if self._thread is None:
+			return
+		self._queue.put(_STOP)
+		self._thread.join()
+		self._thread = None
+		self._close_archive()
+		if self._error is not None:
+			raise self._error
+
+	def _put(self, item):
+		if self._error is not None:
+			raise self._error
+		self._queue.put(item)
+
+	def _open(self):
+		if self.path == "-":
+			self._out = sys.stdout.buffer
+			self._owns_out = False
+		else:
+			self._out = open(self.path, "wb")
+			self._owns_out = True
+
+		self._gzip = None
+		if self.archive_format == "zip":
+			# zipfile handles unseekable outputs like stdout by writing sizes after each file
+			self._zip = zipfile.ZipFile(self._out, "w", zipfile.ZIP_DEFLATED, compresslevel=self.compression_level)
+			return
+		out = self._out
+		if self.archive_format == "tar.gz":
+			out = self._gzip = gzip.GzipFile(fileobj=self._out, mode="wb", compresslevel=self.compression_level)
+		# stream mode, never seeks back
+		self._tar = tarfile.open(fileobj=out, mode="w|", format=tarfile.PAX_FORMAT)
+
+	def _write_queued(self):
+		while True:
+			item = self._queue.get()
+			try:
+				if item is _STOP:
+					return
+				if self._error is None: # after an error, keep draining so adders never block forever
+					self._write(*item)
+			except Exception as e:
+				self._error = e
+			finally:
+				self._queue.task_done()
+
+	def _write(self, name, data, path, remove_after):
+		if name in self._names:
+			if remove_after:
+				os.unlink(path)
+			return
+		self._names.add(name)
+		if data is None:
+			with open(path, "rb") as f:
+				data = f.read()
+			if remove_after:
+				os.unlink(path)
+
+		if self.archive_format == "zip":
+			info = zipfile.ZipInfo(name, time.localtime()[:6])
+			info.compress_type = zipfile.ZIP_DEFLATED
+			info.external_attr = 0o644 << 16
+			self._zip.writestr(info, data, compresslevel=self.compression_level)
+		else:
+			info = tarfile.TarInfo(name)
+			info.size = len(data)
+			info.mtime = int(time.time())
+			info.mode = 0o644
+			self._tar.addfile(info, io.BytesIO(data))
+		self.files += 1
+		self.bytes += len(data)
+
+	def _close_archive(self):
+		try:
+			if self.archive_format == "zip":
+				self._zip.close()
+			else:
+				self._tar.close()
+				if self._gzip is not None:
+					self._gzip.close()
+		finally:
+			if self._owns_out:
+				self._out.close()
+			else:
+				self._out.flush()
@@ -0,0 +1,193 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+"""
+	converts many blogger exports in one process, sharing the image download pool, the image
+	cache and the --jobs process pool between them. every blog gets its own output folder.
+
+		py batch_convert.py exports/*.xml --output-root sites --format jekyll
+		py batch_convert.py --manifest blogs.json
+
+	a manifest lists each export with its output root, format and settings to override:
+
+		[{"export": "exports/a.xml", "output": "sites/a", "format": "jekyll"},
+		 {"export": "exports/b.xml", "output": "sites/b", "config": {"images_on_own_line": false}}]
+
+	the blogs share one image downloader and process pool, so their settings (SHARED_CONFIG_KEYS)
+	are given on the command line for every blog, not in the manifest. images a blog's posts
+	failed on are queued in its own retry queue once every blog's downloads finished.
+	there's no --archive: convert each blog into its own archive with convert_blogger_xml_to_md.py
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+from convert_blogger_xml_to_md import \
+	convert_posts_to_md, g_converter_config, converter_logger, HAPPY_LOG, \
+	add_conversion_arguments, apply_args_to_config, make_image_downloader, make_conversion_pool
+from convert_blogger_xml_to_jekyll import jekyll_paths
+from convert_blogger_xml_to_hugo import hugo_paths
+
+
+def markdown_paths(output_root):
+	return {
+		"md_file_save_path": os.path.join(output_root, "converted_posts"),
+		"image_save_path": os.path.join(output_root, "fetched_images"),
+		"img_path_relative_to_md": "../fetched_images",
+	}
+
+
+FORMATS = {
+	# format (and render target) -> paths for an output root
+	"md": markdown_paths,
+	"jekyll": jekyll_paths,
+	"hugo": hugo_paths,
+}
+
+
+# settings of the image downloader and process pool the blogs share, and of the archive batch conversion doesn't write
+SHARED_CONFIG_KEYS = {
+	"conversion jobs", "image cache path", "shared image cache", "revalidate image cache", "ignore downloaded image cache",
+	"image download workers", "image downloads per host", "image download retries", "image download timeout",
+	"image mirror folders", "image mirror index path", "offline",
+	"archive path", "archive format", "archive compression level",
+}
+
+
+class Blog:
+	def __init__(self, export, output_root, output_format="md", overrides=None):
+		if output_format not in FORMATS:
+			raise ValueError(f"unknown format '{output_format}' for '{export}'. known: {', '.join(FORMATS)}")
+		self.export = export
+		self.output_root = output_root
+		self.output_format = output_format
+		self.overrides = overrides or {}
+
+	def make_config(self, base_config):
+		config = dict(base_config)
+		config.update(FORMATS[self.output_format](self.output_root))
+		config["render target"] = self.output_format
+		if config["profile report path"]:
+			# one report per blog, named as given, in the blog's output root
+			config["profile report path"] = os.path.join(self.output_root, os.path.basename(config["profile report path"]))
+		config.update(self.overrides)
+		return config
+
+
+def blogs_from_manifest(path):
+	with open(path, "r", encoding="utf-8") as f:
+		entries = json.load(f)
+	base = os.path.dirname(os.path.abspath(path))
+	for e in entries:
+		shared = sorted(SHARED_CONFIG_KEYS.intersection(e.get("config") or {}))
+		if shared:
+			raise SystemExit(f"'{e['export']}' in '{path}' sets {', '.join(repr(k) for k in shared)}, "
+							 "which every blog shares. give them on the command line instead")
+	return [Blog(os.path.join(base, e["export"]), os.path.join(base, e["output"]),
+				 e.get("format", "md"), e.get("config")) for e in entries]
+
+
+def blogs_from_globs(patterns, output_root, output_format):
+	exports = []
+	for pattern in patterns:
+		matches = sorted(glob.glob(pattern))
+		if not matches:
+			converter_logger.warning(f"no exports match '{pattern}'")
+		exports += [m for m in matches if m not in exports]
+	# each blog is converted into a folder named after its export
+	return [Blog(e, os.path.join(output_root, os.path.splitext(os.path.basename(e))[0]), output_format)
+			for e in exports]
+
+
+def check_distinct_outputs(blogs):
+	roots = {}
+	for blog in blogs:
+		root = os.path.abspath(blog.output_root)
+		if root in roots:
+			raise SystemExit(f"'{blog.export}' and '{roots[root]}' would both be converted into '{blog.output_root}'")
+		roots[root] = blog.export
+
+
+def convert_blogs(blogs, base_config=None):
+	"""converts every blog, one after the other, on shared pools. returns per blog results"""
+	base_config = g_converter_config if base_config is None else base_config
+	results = []
+	runs = []
+	image_downloader = make_image_downloader(base_config)
+	jobs = base_config["conversion jobs"]
+	process_pool = make_conversion_pool(jobs, base_config) if jobs > 1 else None
+	try:
+		for i, blog in enumerate(blogs):
+			converter_logger.log(HAPPY_LOG, f"[{i + 1}/{len(blogs)}] converting '{blog.export}' into '{blog.output_root}'")
+			config = blog.make_config(base_config)
+			start = time.perf_counter()
+			result = {"export": blog.export, "output": blog.output_root, "xml bytes": os.path.getsize(blog.export)}
+			try:
+				run = convert_posts_to_md(blog.export, None, config, image_downloader, process_pool)
+				runs.append(run)
+				result.update({"posts": run.converted_posts, "unchanged posts": run.unchanged_posts})
+			except Exception as e:
+				# one broken export shouldn't stop the others
+				converter_logger.exception(f"failed converting '{blog.export}': {e}")
+				result["error"] = str(e)
+			result["seconds"] = time.perf_counter() - start
+			results.append(result)
+	finally:
+		if process_pool is not None:
+			process_pool.shutdown()
+		image_downloader.close() # the downloads of every blog finish here
+		for run in runs:
+			run.queue_shared_image_failures()
+	return results
+
+
+def log_summary(results, seconds):
+	posts = sum(r.get("posts", 0) for r in results)
+	mb = sum(r["xml bytes"] for r in results) / (1024 * 1024)
+	failed = [r for r in results if "error" in r]
+	for r in results:
+		status = f"failed: {r['error']}" if "error" in r else \
+			f"{r['posts']} posts ({r['unchanged posts']} unchanged) in {r['seconds']:.1f}s"
+		converter_logger.info(f"'{r['export']}': {status}")
+	converter_logger.log(HAPPY_LOG, f"converted {len(results) - len(failed)}/{len(results)} blogs, {posts} posts, "
+									f"{mb:.1f} MB of exports in {seconds:.1f}s "
+									f"({posts / seconds:.1f} posts/s, {mb / seconds:.2f} MB/s, images included)")
+
+
+def main():
+	parser = argparse.ArgumentParser(prog="batch_convert.py", description="convert many blogger exports in one go")
+	parser.add_argument("exports", nargs="*", help="exports to convert. globs are expanded, ie 'exports/*.xml'")
+	parser.add_argument("--manifest", help="JSON list of {export, output, format, config} to convert instead")
+	parser.add_argument("--output-root", default="converted_blogs",
+						help="each export given on the command line is converted into <output root>/<export name>")
+	parser.add_argument("--format", choices=sorted(FORMATS), default="md",
+						help="output format of exports given on the command line")
+	parser.add_argument("--image-cache", help="image cache shared by every blog. by default '<output root>/.image-cache'")
+	add_conversion_arguments(parser)
+	args = parser.parse_args()
+	if bool(args.exports) == bool(args.manifest):
+		parser.error("give either exports or --manifest")
+
+	if args.archive:
+		parser.error("--archive can't be used when converting many blogs. convert each into its own archive with convert_blogger_xml_to_md.py")
+
+	apply_args_to_config(args)
+	blogs = blogs_from_manifest(args.manifest) if args.manifest else blogs_from_globs(args.exports, args.output_root, args.format)
+	if not blogs:
+		parser.error("no exports to convert")
+	check_distinct_outputs(blogs)
+	if args.image_cache:
+		g_converter_config["image cache path"] = args.image_cache
+	elif not g_converter_config["image cache path"]:
+		shared_root = os.path.commonpath([os.path.abspath(b.output_root) for b in blogs]) if args.manifest else args.output_root
+		g_converter_config["image cache path"] = os.path.join(shared_root, ".image-cache")
+
+	start = time.perf_counter()
+	results = convert_blogs(blogs)
+	log_summary(results, time.perf_counter() - start)
+	return 1 if any("error" in r for r in results) else 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
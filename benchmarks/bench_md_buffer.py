@@ -0,0 +1,55 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+"""
+	times convert_html_to_md on synthetic posts of growing size. the time per MB should stay
+	flat as posts grow. with --against REV, the converter at that git revision is timed too.
+	REV is any commit or branch without the change being measured, ie the one it's based on:
+
+		py benchmarks/bench_md_buffer.py --against <base commit>
+"""
+
+import argparse
+import bench_utils
+
+import convert_blogger_xml_to_md
+
+BLOCK = (
+	'<h2>Section {i}</h2><p>Some <b>bold</b> text, <i>italics</i> and a <a href="https://example.com/{i}">link</a>.</p>'
+	'<a href="https://1.bp.blogspot.com/-x/s1600/pic{i}.png"><img alt="pic {i}" src="https://1.bp.blogspot.com/-x/s320/pic{i}.png" /></a>'
+	'<ul><li>first</li><li>second with <span style="font-family: courier;">code_{i}()</span></li></ul>'
+	'<p>' + "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 4 + '</p>'
+)
+
+
+def make_post(size_bytes):
+	blocks = []
+	total = 0
+	i = 0
+	while total < size_bytes:
+		block = BLOCK.format(i=i)
+		blocks.append(block)
+		total += len(block)
+		i += 1
+	return "".join(blocks)
+
+
+def main():
+	parser = argparse.ArgumentParser(description="markdown output scaling benchmark")
+	parser.add_argument("--sizes-mb", type=float, nargs="+", default=[0.5, 1, 2, 5])
+	parser.add_argument("--against", metavar="REV", help="also time the converter at this git revision")
+	parser.add_argument("--repeat", type=int, default=3)
+	args = parser.parse_args()
+
+	converters = [("current", bench_utils.quiet_converter(convert_blogger_xml_to_md))]
+	if args.against:
+		converters.append((args.against, bench_utils.quiet_converter(bench_utils.load_converter_at_rev(args.against))))
+
+	print(f"{'converter':>12} {'post MB':>8} {'seconds':>9} {'s per MB':>9}")
+	for name, converter in converters:
+		for size_mb in args.sizes_mb:
+			html = make_post(int(size_mb * 1024 * 1024))
+			took = bench_utils.best_time(lambda: converter.convert_html_to_md(html), args.repeat)
+			print(f"{name:>12} {size_mb:>8} {took:>9.3f} {took / size_mb:>9.3f}")
+
+
+if __name__ == '__main__':
+	main()
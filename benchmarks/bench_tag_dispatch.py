@@ -0,0 +1,48 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+"""
+	measures tag throughput of HTMLToMarkdownParser on a tag-dense corpus: lots of short
+	inline and block tags with little text between them. with --against REV, the
+	converter at that git revision is measured too. REV is any commit or branch without
+	the change being measured, ie the one it's based on:
+
+		py benchmarks/bench_tag_dispatch.py --against <base commit>
+"""
+
+import argparse
+import bench_utils
+
+import convert_blogger_xml_to_md
+
+# every tag the converter knows, nested the way Blogger's editor nests them
+BLOCK = (
+	'<div><p><b>b</b><i>i</i><strike>s</strike><u>u</u><sup>1</sup><sub>2</sub>'
+	'<span>x</span><span style="font-family: courier;">y</span><a href="https://example.com/">a</a></p>'
+	'<h3>h</h3><ul><li>1</li><li>2<ol><li>3</li></ol></li></ul><blockquote>q</blockquote>'
+	'<table><tbody><tr><th>h</th><th>h</th></tr><tr><td>c</td><td>c</td></tr></tbody></table>'
+	'<br /><hr /><code>c</code></div>'
+)
+TAGS_PER_BLOCK = BLOCK.count("<") - BLOCK.count("</") # start tags, self closing included
+
+
+def main():
+	parser = argparse.ArgumentParser(description="tag dispatch throughput benchmark")
+	parser.add_argument("--blocks", type=int, default=20000)
+	parser.add_argument("--against", metavar="REV", help="also measure the converter at this git revision")
+	parser.add_argument("--repeat", type=int, default=3)
+	args = parser.parse_args()
+
+	html = BLOCK * args.blocks
+	tags = TAGS_PER_BLOCK * args.blocks
+
+	converters = [("current", bench_utils.quiet_converter(convert_blogger_xml_to_md))]
+	if args.against:
+		converters.append((args.against, bench_utils.quiet_converter(bench_utils.load_converter_at_rev(args.against))))
+
+	print(f"{'converter':>12} {'tags':>9} {'seconds':>9} {'tags/s':>10}")
+	for name, converter in converters:
+		took = bench_utils.best_time(lambda: converter.convert_html_to_md(html), args.repeat)
+		print(f"{name:>12} {tags:>9} {took:>9.3f} {tags / took:>10.0f}")
+
+
+if __name__ == '__main__':
+	main()
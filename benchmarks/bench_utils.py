@@ -0,0 +1,40 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+
+import os
+import sys
+import time
+import types
+import logging
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+	sys.path.insert(0, REPO_ROOT)
+
+
+def load_converter_at_rev(rev):
+	"""imports convert_blogger_xml_to_md.py as it was at git revision rev, to compare against"""
+	source = subprocess.run(["git", "show", f"{rev}:convert_blogger_xml_to_md.py"], cwd=REPO_ROOT,
+							capture_output=True, text=True, check=True).stdout
+	module = types.ModuleType(f"convert_blogger_xml_to_md_at_{rev}")
+	module.__file__ = os.path.join(REPO_ROOT, "convert_blogger_xml_to_md.py")
+	exec(compile(source, module.__file__, "exec"), module.__dict__)
+	return module
+
+
+def quiet_converter(converter):
+	"""keeps the converter's logging out of timings"""
+	logging.disable(logging.CRITICAL)
+	converter.g_converter_config["dont download use demo image"] = "../demo.jpg"
+	return converter
+
+
+def best_time(fn, repeat=3):
+	"""returns the fastest of repeat runs of fn, in seconds"""
+	best = None
+	for _ in range(repeat):
+		start = time.perf_counter()
+		fn()
+		took = time.perf_counter() - start
+		best = took if best is None else min(best, took)
+	return best
@@ -0,0 +1,145 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+"""
+	a local stand-in for a blog's atom feed (/feeds/posts/default), serving the posts of an
+	export page by page like Blogger does: start-index, max-results (at most 500), and
+	updated-min with orderby=updated for delta syncs. like the public feed, entries don't say
+	which kind they are. use it to test or benchmark converting from a feed without the internet:
+
+		py benchmarks/feed_server.py backup.xml --port 8766 --latency-ms 100
+		py convert_blogger_xml_to_md.py http://127.0.0.1:8766/feeds/posts/default
+"""
+
+import sys
+import time
+import argparse
+import datetime
+import threading
+import collections
+import http.server
+import urllib.parse
+import xml.etree.ElementTree as ET
+from image_server import _ThreadingHTTPServer
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+OPEN_SEARCH = "http://a9.com/-/spec/opensearchrss/1.0/"
+KIND_SCHEME = "http://schemas.google.com/g/2005#kind"
+POST_KIND = "http://schemas.google.com/blogger/2008/kind#post"
+MAX_RESULTS = 500
+
+
+def _time(text):
+	return datetime.datetime.strptime(text, '%Y-%m-%dT%H:%M:%S.%f%z')
+
+
+class FeedServer:
+	"""serves the posts of the export at xml_path as a paged feed on 127.0.0.1 from a background thread. use as a context manager"""
+	def __init__(self, xml_path, port=0, latency=0.0, keep_kinds=False):
+		self.latency = latency
+		self.stats = collections.Counter()
+		self._lock = threading.Lock()
+		ET.register_namespace("", ATOM[1:-1])
+		ET.register_namespace("openSearch", OPEN_SEARCH)
+		self.posts = []
+		for entry in ET.parse(xml_path).getroot().iter(f"{ATOM}entry"):
+			kinds = [c for c in entry.findall(f"{ATOM}category") if c.attrib.get("scheme") == KIND_SCHEME]
+			if not any(c.attrib.get("term") == POST_KIND for c in kinds):
+				continue
+			if not keep_kinds:
+				for c in kinds:
+					entry.remove(c)
+			self.posts.append(entry)
+		self._server = _ThreadingHTTPServer(("127.0.0.1", port), self._make_handler())
+		self._thread = None
+
+	@property
+	def url(self):
+		return f"http://127.0.0.1:{self._server.server_address[1]}/feeds/posts/default"
+
+	def count(self, stat, n=1):
+		with self._lock:
+			self.stats[stat] += n
+
+	def update_post(self, index, updated):
+		"""bumps the post's updated timestamp, as if it was edited"""
+		self.posts[index].find(f"{ATOM}updated").text = updated
+
+	def page(self, query):
+		"""the feed xml of the page query asks for"""
+		posts = self.posts
+		updated_min = query.get("updated-min")
+		if updated_min:
+			posts = [p for p in posts if _time(p.find(f"{ATOM}updated").text) >= _time(updated_min)]
+		key = "updated" if query.get("orderby") == "updated" else "published"
+		posts = sorted(posts, key=lambda p: _time(p.find(f"{ATOM}{key}").text), reverse=True)
+		start = max(int(query.get("start-index", 1)), 1)
+		count = min(int(query.get("max-results", 25)), MAX_RESULTS)
+		feed = ET.Element(f"{ATOM}feed")
+		ET.SubElement(feed, f"{{{OPEN_SEARCH}}}totalResults").text = str(len(posts))
+		ET.SubElement(feed, f"{{{OPEN_SEARCH}}}startIndex").text = str(start)
+		ET.SubElement(feed, f"{{{OPEN_SEARCH}}}itemsPerPage").text = str(count)
+		page_posts = posts[start - 1:start - 1 + count]
+		feed.extend(page_posts)
+		self.count("entries", len(page_posts))
+		return ET.tostring(feed, encoding="utf-8", xml_declaration=True)
+
+	def _make_handler(self):
+		server = self
+
+		class Handler(http.server.BaseHTTPRequestHandler):
+			protocol_version = "HTTP/1.1" # keep-alive
+
+			def log_message(self, *args):
+				pass
+
+			def do_GET(self):
+				server.count("requests")
+				if server.latency:
+					time.sleep(server.latency)
+				parts = urllib.parse.urlsplit(self.path)
+				if parts.path != "/feeds/posts/default":
+					self.send_error(404)
+					return
+				body = server.page(dict(urllib.parse.parse_qsl(parts.query)))
+				self.send_response(200)
+				self.send_header("Content-Type", "application/atom+xml; charset=UTF-8")
+				self.send_header("Content-Length", str(len(body)))
+				self.end_headers()
+				self.wfile.write(body)
+
+		return Handler
+
+	def start(self):
+		self._thread = threading.Thread(target=self._server.serve_forever, name="feed-server", daemon=True)
+		self._thread.start()
+		return self
+
+	def stop(self):
+		self._server.shutdown()
+		self._server.server_close()
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, *exc_info):
+		self.stop()
+
+
+def main():
+	parser = argparse.ArgumentParser(description="serve an export's posts as a paged blogger feed")
+	parser.add_argument("xml_path", help="blogger backup xml to serve the posts of")
+	parser.add_argument("--port", type=int, default=8766)
+	parser.add_argument("--latency-ms", type=float, default=0, help="delay before answering each request")
+	args = parser.parse_args()
+
+	with FeedServer(args.xml_path, args.port, args.latency_ms / 1000) as server:
+		print(f"serving {len(server.posts)} posts on {server.url}, ctrl+c to stop")
+		try:
+			while True:
+				time.sleep(3600)
+		except KeyboardInterrupt:
+			pass
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,115 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+"""
+	a local stand-in for Blogger's image hosts, so image downloads can be benchmarked without
+	the internet. every path is an image: its bytes are derived from the path, so they're the
+	same on every run. supports keep-alive and ETag revalidation like the real hosts.
+
+		py benchmarks/image_server.py --port 8765 --latency-ms 50
+"""
+
+import sys
+import time
+import hashlib
+import argparse
+import threading
+import collections
+import http.server
+import socketserver
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+	daemon_threads = True
+
+
+class ImageServer:
+	"""serves made up images on 127.0.0.1 from a background thread. use as a context manager"""
+	def __init__(self, port=0, latency=0.0, image_kb=32):
+		self.latency = latency
+		self.image_bytes = int(image_kb * 1024)
+		self.stats = collections.Counter()
+		self._lock = threading.Lock()
+		self._server = _ThreadingHTTPServer(("127.0.0.1", port), self._make_handler())
+		self._thread = None
+
+	@property
+	def url(self):
+		return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+	def image(self, path):
+		seed = hashlib.sha256(path.encode("utf-8")).digest()
+		return (seed * (self.image_bytes // len(seed) + 1))[:self.image_bytes]
+
+	def count(self, stat):
+		with self._lock:
+			self.stats[stat] += 1
+
+	def _make_handler(self):
+		server = self
+
+		class Handler(http.server.BaseHTTPRequestHandler):
+			protocol_version = "HTTP/1.1" # keep-alive
+
+			def setup(self):
+				server.count("connections")
+				http.server.BaseHTTPRequestHandler.setup(self)
+
+			def log_message(self, *args):
+				pass
+
+			def do_GET(self):
+				server.count("requests")
+				if server.latency:
+					time.sleep(server.latency)
+				body = server.image(self.path)
+				etag = f'"{hashlib.md5(body).hexdigest()}"'
+				if self.headers.get("If-None-Match") == etag:
+					server.count("not modified")
+					self.send_response(304)
+					self.send_header("ETag", etag)
+					self.send_header("Content-Length", "0")
+					self.end_headers()
+					return
+				self.send_response(200)
+				self.send_header("Content-Type", "image/png")
+				self.send_header("Content-Length", str(len(body)))
+				self.send_header("ETag", etag)
+				self.end_headers()
+				self.wfile.write(body)
+
+		return Handler
+
+	def start(self):
+		self._thread = threading.Thread(target=self._server.serve_forever, name="image-server", daemon=True)
+		self._thread.start()
+		return self
+
+	def stop(self):
+		self._server.shutdown()
+		self._server.server_close()
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, *exc_info):
+		self.stop()
+
+
+def main():
+	parser = argparse.ArgumentParser(description="serve made up images for benchmarking image downloads")
+	parser.add_argument("--port", type=int, default=8765)
+	parser.add_argument("--latency-ms", type=float, default=0, help="delay before answering each request")
+	parser.add_argument("--image-kb", type=float, default=32)
+	args = parser.parse_args()
+
+	with ImageServer(args.port, args.latency_ms / 1000, args.image_kb) as server:
+		print(f"serving images on {server.url}, ctrl+c to stop")
+		try:
+			while True:
+				time.sleep(3600)
+		except KeyboardInterrupt:
+			pass
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,199 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+"""
+	end to end throughput benchmarks on a synthetic export, written as JSON so versions can be
+	compared:
+
+		py benchmarks/run_benchmarks.py --posts 2000 --output before.json
+		... change things ...
+		py benchmarks/run_benchmarks.py --posts 2000 --output after.json --compare before.json
+
+	every stage runs in its own process, so its peak RSS is its own. images are served by a
+	local ImageServer with --image-latency-ms of made up network latency.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+from bench_utils import REPO_ROOT
+from synthetic_export import SyntheticExport, add_export_arguments
+from image_server import ImageServer
+
+STAGES = ["generate", "html conversion", "conversion", "conversion with image downloads", "conversion with cached images"]
+IMAGE_STAGES = {"conversion with image downloads", "conversion with cached images"}
+MB = 1024 * 1024
+
+
+def stage_generate(args):
+	start = time.perf_counter()
+	SyntheticExport(args.posts, args.post_kb, args.mix, args.seed, args.comments_per_post,
+					args.image_base_url).write(args.export)
+	seconds = time.perf_counter() - start
+	xml_mb = os.path.getsize(args.export) / MB
+	return {"seconds": seconds, "posts": args.posts, "posts per second": args.posts / seconds,
+			"xml MB": xml_mb, "MB per second": xml_mb / seconds}
+
+
+def stage_html_conversion(args, converter):
+	"""only the html to markdown conversion of every post, no xml parsing or file writes"""
+	posts = 0
+	html_bytes = 0
+	seconds = 0.0
+	for entry in converter.iter_blogger_entries(args.export):
+		if converter.extract_entry_kind(entry) != "post":
+			continue
+		_, content_html = converter.extract_post_data(entry)
+		start = time.perf_counter()
+		converter.convert_post_html(content_html)
+		seconds += time.perf_counter() - start
+		posts += 1
+		html_bytes += len(content_html.encode("utf-8"))
+	return {"seconds": seconds, "posts": posts, "posts per second": posts / seconds,
+			"html MB": html_bytes / MB, "MB per second": html_bytes / MB / seconds}
+
+
+def stage_conversion(args, converter, stage):
+	"""a whole convert_posts_to_md run. the image stages download from the local image server"""
+	out_path = os.path.join(args.workdir, "images" if stage in IMAGE_STAGES else "no-images")
+	config = converter.g_converter_config
+	config["md_file_save_path"] = os.path.join(out_path, "posts")
+	config["image_save_path"] = os.path.join(out_path, "images")
+	config["img_path_relative_to_md"] = "../images"
+	config["conversion jobs"] = args.jobs
+	config["profile report path"] = os.path.join(out_path, f"{stage}.profile.json")
+	if stage not in IMAGE_STAGES:
+		config["dont download use demo image"] = "../demo.jpg"
+
+	start = time.perf_counter()
+	converter.convert_posts_to_md(args.export)
+	seconds = time.perf_counter() - start
+
+	with open(config["profile report path"], "r", encoding="utf-8") as f:
+		profile = json.load(f)
+	xml_mb = os.path.getsize(args.export) / MB
+	result = {"seconds": seconds, "posts": profile["posts"], "posts per second": profile["posts"] / seconds,
+			  "xml MB": xml_mb, "MB per second": xml_mb / seconds, "phases": profile["phases"]}
+	if stage in IMAGE_STAGES:
+		result["images"] = profile["images"]
+		result["image fetch latency"] = profile["images"].pop("fetch latency", None)
+	return result
+
+
+def run_stage(args):
+	"""runs args.stage in this process and prints its result as JSON"""
+	logging.disable(logging.CRITICAL)
+	import convert_blogger_xml_to_md as converter
+	if args.stage == "generate":
+		result = stage_generate(args)
+	elif args.stage == "html conversion":
+		result = stage_html_conversion(args, converter)
+	else:
+		result = stage_conversion(args, converter, args.stage)
+	result["peak rss MB"] = (converter.get_peak_memory_bytes() or 0) / MB or None
+	print(json.dumps(result))
+
+
+def stage_command(args, stage, image_base_url):
+	command = [sys.executable, os.path.abspath(__file__), "--stage", stage, "--workdir", args.workdir,
+			   "--export", args.export, "--image-base-url", image_base_url, "--jobs", str(args.jobs),
+			   "--posts", str(args.posts), "--post-kb", str(args.post_kb), "--seed", str(args.seed),
+			   "--comments-per-post", str(args.comments_per_post),
+			   "--mix", ",".join(f"{kind}={weight}" for kind, weight in args.mix.items())]
+	return command
+
+
+def git_revision():
+	try:
+		return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=REPO_ROOT,
+							  capture_output=True, text=True, check=True).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+
+def rounded(value):
+	if isinstance(value, float):
+		return round(value, 4)
+	if isinstance(value, dict):
+		return {k: rounded(v) for k, v in value.items()}
+	return value
+
+
+def run_benchmarks(args):
+	stages = [s for s in STAGES if not (args.no_images and s in IMAGE_STAGES)]
+	results = {
+		"revision": git_revision(),
+		"python": platform.python_version(),
+		"platform": platform.platform(),
+		"cpus": os.cpu_count(),
+		"settings": {"posts": args.posts, "post kb": args.post_kb, "mix": args.mix, "seed": args.seed,
+					 "comments per post": args.comments_per_post, "jobs": args.jobs,
+					 "image latency ms": args.image_latency_ms, "image kb": args.image_kb},
+		"stages": {},
+	}
+	with ImageServer(latency=args.image_latency_ms / 1000, image_kb=args.image_kb) as server:
+		for stage in stages:
+			print(f"running '{stage}'...", file=sys.stderr)
+			out = subprocess.run(stage_command(args, stage, server.url), capture_output=True, text=True)
+			if out.returncode != 0:
+				sys.stderr.write(out.stderr)
+				raise SystemExit(f"stage '{stage}' failed")
+			results["stages"][stage] = rounded(json.loads(out.stdout.strip().splitlines()[-1]))
+		results["image server"] = dict(server.stats)
+	return results
+
+
+def compare(results, baseline):
+	"""prints how each stage's throughput changed since baseline"""
+	print(f"{'stage':<34}{'before':>12}{'after':>12}{'change':>10}   (posts per second)")
+	for stage, result in results["stages"].items():
+		before = baseline.get("stages", {}).get(stage, {}).get("posts per second")
+		after = result["posts per second"]
+		change = f"{(after / before - 1) * 100:+.1f}%" if before else "-"
+		print(f"{stage:<34}{before or '-':>12}{after:>12}{change:>10}")
+
+
+def main():
+	parser = argparse.ArgumentParser(description="benchmark conversion throughput on a synthetic export")
+	add_export_arguments(parser)
+	parser.add_argument("-j", "--jobs", type=int, default=1, help="conversion processes, like the converter's --jobs")
+	parser.add_argument("--image-latency-ms", type=float, default=20)
+	parser.add_argument("--image-kb", type=float, default=32, help="size of every served image")
+	parser.add_argument("--no-images", action="store_true", help="skip the stages that download images")
+	parser.add_argument("--workdir", help="where to keep the export and the converted output. a temp folder by default")
+	parser.add_argument("--output", help="write the JSON results here instead of stdout")
+	parser.add_argument("--compare", metavar="BASELINE_JSON", help="print throughput changes since these results")
+	# used when running a single stage in a child process
+	parser.add_argument("--stage", choices=STAGES, help=argparse.SUPPRESS)
+	parser.add_argument("--export", help=argparse.SUPPRESS)
+	parser.add_argument("--image-base-url", help=argparse.SUPPRESS)
+	args = parser.parse_args()
+
+	if args.stage:
+		run_stage(args)
+		return 0
+
+	with tempfile.TemporaryDirectory(prefix="blogger-bench-") as tmp:
+		args.workdir = os.path.abspath(args.workdir or tmp)
+		os.makedirs(args.workdir, exist_ok=True)
+		args.export = os.path.join(args.workdir, "export.xml")
+		results = run_benchmarks(args)
+
+	text = json.dumps(results, indent=1)
+	if args.output:
+		with open(args.output, "w", encoding="utf-8") as f:
+			f.write(text)
+	else:
+		print(text)
+	if args.compare:
+		with open(args.compare, "r", encoding="utf-8") as f:
+			compare(results, json.load(f))
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,199 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+"""
+	generates deterministic Blogger Atom exports for benchmarks. the same arguments always
+	produce the same bytes.
+
+		py benchmarks/synthetic_export.py export.xml --posts 1000 --post-kb 8
+"""
+
+import sys
+import html
+import random
+import argparse
+import datetime
+
+ATOM_HEADER = (
+	"<?xml version='1.0' encoding='UTF-8'?>"
+	"<feed xmlns='http://www.w3.org/2005/Atom' xmlns:openSearch='http://a9.com/-/spec/opensearchrss/1.0/'"
+	" xmlns:gd='http://schemas.google.com/g/2005' xmlns:thr='http://purl.org/syndication/thread/1.0'>"
+	"<id>tag:blogger.com,1999:blog-{blog_id}.archive</id><updated>2021-01-01T00:00:00.000-08:00</updated>"
+	"<title type='text'>Synthetic Blog</title>"
+	"<generator version='7.00' uri='https://www.blogger.com'>Blogger</generator>"
+)
+KIND = "<category scheme='http://schemas.google.com/g/2005#kind' term='http://schemas.google.com/blogger/2008/kind#{kind}'/>"
+
+# how often each kind of block shows up in a post, relative to the others
+DEFAULT_MIX = {
+	"paragraph": 10,
+	"heading": 2,
+	"image": 3,
+	"caption_table": 1,
+	"table": 1,
+	"nested_list": 2,
+	"courier_span": 2,
+	"code": 1,
+	"post_link": 0, # a link to an earlier post, sometimes written another way or to a post that's not in the export
+}
+
+WORDS = ("the of and to in is you that it he was for on are as with his they at be this have from "
+		 "or one had by word but not what all were we when your can said there use an each which she "
+		 "do how their if will up other about out many then them these so some her would make like "
+		 "malloc buffer overflow kernel exploit shell router packet telnet stack heap").split()
+
+
+class SyntheticExport:
+	def __init__(self, posts=100, post_kb=8, mix=None, seed=1, comments_per_post=0,
+				 image_base_url="https://1.bp.blogspot.com", blog_url="https://synthetic.blogspot.com"):
+		self.posts = posts
+		self.post_bytes = int(post_kb * 1024)
+		self.mix = dict(mix or DEFAULT_MIX)
+		self.seed = seed
+		self.comments_per_post = comments_per_post
+		self.image_base_url = image_base_url.rstrip("/")
+		self.blog_url = blog_url.rstrip("/")
+		self.blog_id = 1000 + seed
+		self.image_urls = set() # every image url referenced, filled while generating
+		self.post_urls = [] # of the posts generated so far
+
+	def words(self, rnd, n):
+		return " ".join(rnd.choice(WORDS) for _ in range(n))
+
+	def image_url(self, rnd, size):
+		n = rnd.randrange(self.posts * 4 + 10)
+		url = f"{self.image_base_url}/-img{n % 97}/AAAA{n}/s{size}/photo_{n}.png"
+		self.image_urls.add(url)
+		return url
+
+	def block(self, rnd, kind):
+		if kind == "paragraph":
+			return f"<p>{html.escape(self.words(rnd, rnd.randint(20, 120)))} <b>{self.words(rnd, 2)}</b> " \
+				   f"<i>{self.words(rnd, 2)}</i> <a href=\"https://example.com/{rnd.randrange(10**6)}\">{self.words(rnd, 3)}</a>.</p>"
+		if kind == "heading":
+			level = rnd.randint(2, 4)
+			return f"<h{level}>{self.words(rnd, 4)}</h{level}>"
+		if kind == "image":
+			small = self.image_url(rnd, 320)
+			return ('<div class="separator" style="clear: both; text-align: center;">'
+					f'<a href="{small.replace("/s320/", "/s1600/")}" style="margin-left: 1em; margin-right: 1em;">'
+					f'<img border="0" data-original-height="900" data-original-width="1600" src="{small}" width="320" /></a></div>')
+		if kind == "caption_table":
+			small = self.image_url(rnd, 400)
+			return ('<table align="center" cellpadding="0" cellspacing="0" class="tr-caption-container" '
+					'style="margin-left: auto; margin-right: auto;"><tbody><tr><td style="text-align: center;">'
+					f'<a href="{small.replace("/s400/", "/s1600/")}" style="margin-left: auto; margin-right: auto;">'
+					f'<img alt="{self.words(rnd, 2)}" border="0" src="{small}" width="400" /></a></td></tr>'
+					f'<tr><td class="tr-caption" style="text-align: center;">{self.words(rnd, 6)}</td></tr></tbody></table>')
+		if kind == "table":
+			cols = rnd.randint(2, 5)
+			rows = [("th", [self.words(rnd, 1) for _ in range(cols)])]
+			rows += [("td", [self.words(rnd, rnd.randint(1, 3)) for _ in range(cols)]) for _ in range(rnd.randint(2, 8))]
+			body = "".join("<tr>" + "".join(f"<{cell}>{text}</{cell}>" for text in texts) + "</tr>" for cell, texts in rows)
+			return f'<table style="width:100%"><tbody>{body}</tbody></table>'
+		if kind == "nested_list":
+			inner = "".join(f"<li>{self.words(rnd, 4)}</li>" for _ in range(rnd.randint(1, 3)))
+			outer_tag = rnd.choice(["ul", "ol"])
+			inner_tag = "ol" if outer_tag == "ul" else "ul"
+			items = [f"<li>{self.words(rnd, 5)}</li>" for _ in range(rnd.randint(2, 4))]
+			items.insert(1, f"<li>{self.words(rnd, 3)}<{inner_tag}>{inner}</{inner_tag}></li>")
+			return f"<{outer_tag}>{''.join(items)}</{outer_tag}>"
+		if kind == "courier_span":
+			return f'<p>call <span style="font-family: courier;">{rnd.choice(WORDS)}_{rnd.randrange(100)}(0x{rnd.randrange(4096):x})</span> ' \
+				   f'{self.words(rnd, 10)}</p>'
+		if kind == "code":
+			lines = [f"int {rnd.choice(WORDS)}_{i} = {rnd.randrange(1000)}; // {self.words(rnd, 3)}" for i in range(rnd.randint(2, 10))]
+			return "<code>" + html.escape("\n".join(lines)) + "</code>"
+		if kind == "post_link":
+			if not self.post_urls or rnd.random() < 0.1:
+				url = f"{self.blog_url}/2009/12/not-in-the-export-{rnd.randrange(100)}.html"
+			else:
+				url = rnd.choice(self.post_urls)
+				url = rnd.choice([url, url + "?m=1", url.replace("https://", "http://"), url + "#more"])
+			return f'<p>{self.words(rnd, 5)} <a href="{url}">{self.words(rnd, 3)}</a>.</p>'
+		raise ValueError(f"unknown block kind '{kind}'")
+
+	def post_html(self, rnd):
+		kinds = list(self.mix)
+		weights = [self.mix[k] for k in kinds]
+		blocks = []
+		size = 0
+		while size < self.post_bytes:
+			block = self.block(rnd, rnd.choices(kinds, weights)[0])
+			blocks.append(block)
+			size += len(block)
+		return "".join(blocks)
+
+	def entry(self, kind, entry_id, title, content, published, extra=""):
+		stamp = published.strftime("%Y-%m-%dT%H:%M:%S.000-08:00")
+		return (f"<entry><id>{entry_id}</id><published>{stamp}</published><updated>{stamp}</updated>"
+				f"{KIND.format(kind=kind)}{extra}<title type='text'>{html.escape(title)}</title>"
+				f"<content type='html'>{html.escape(content)}</content>"
+				f"<author><name>Synthetic Author</name><email>noreply@blogger.com</email></author></entry>")
+
+	def iter_chunks(self):
+		"""yields the export's text in pieces, so huge exports never sit in memory"""
+		rnd = random.Random(self.seed)
+		yield ATOM_HEADER.format(blog_id=self.blog_id)
+		yield self.entry("settings", f"tag:blogger.com,1999:blog-{self.blog_id}.settings.BLOG_NAME",
+						 "BLOG_NAME", "Synthetic Blog", datetime.datetime(2021, 1, 1))
+
+		start = datetime.datetime(2010, 1, 1, 8, 0, 0)
+		for i in range(self.posts):
+			published = start + datetime.timedelta(hours=37 * i)
+			title = f"{self.words(rnd, rnd.randint(2, 6)).capitalize()} {i}"
+			slug = "-".join(title.lower().split()[:5])
+			post_id = f"tag:blogger.com,1999:blog-{self.blog_id}.post-{100000 + i}"
+			labels = "".join(f"<category scheme='http://www.blogger.com/atom/ns#' term='{label}'/>"
+							 for label in sorted(set(rnd.sample(WORDS[-12:], rnd.randint(0, 3)))))
+			link = f"<link rel='alternate' type='text/html' href='{self.blog_url}/{published:%Y/%m}/{slug}.html' title='{html.escape(title)}'/>"
+			yield self.entry("post", post_id, title, self.post_html(rnd), published, labels + link)
+			self.post_urls.append(f"{self.blog_url}/{published:%Y/%m}/{slug}.html")
+
+			for c in range(self.comments_per_post):
+				reply = (f"<thr:in-reply-to href='{self.blog_url}/{published:%Y/%m}/{slug}.html' ref='{post_id}' "
+						 f"source='https://www.blogger.com/feeds/{self.blog_id}/posts/default/{100000 + i}' type='text/html'/>")
+				yield self.entry("comment", f"tag:blogger.com,1999:blog-{self.blog_id}.post-{900000 + i * 100 + c}",
+								 self.words(rnd, 3), f"<p>{html.escape(self.words(rnd, 30))}</p>",
+								 published + datetime.timedelta(minutes=5 + c), reply)
+		yield "</feed>"
+
+	def write(self, path):
+		with open(path, "w", encoding="utf-8") as f:
+			for chunk in self.iter_chunks():
+				f.write(chunk)
+		return path
+
+
+def parse_mix(text):
+	"""'paragraph=10,image=3' -> {'paragraph': 10, 'image': 3} on top of the default mix"""
+	mix = dict(DEFAULT_MIX)
+	for part in filter(None, text.split(",")):
+		kind, weight = part.split("=")
+		if kind not in DEFAULT_MIX:
+			raise argparse.ArgumentTypeError(f"unknown block kind '{kind}'. known: {', '.join(DEFAULT_MIX)}")
+		mix[kind] = float(weight)
+	return mix
+
+
+def add_export_arguments(parser):
+	parser.add_argument("--posts", type=int, default=200)
+	parser.add_argument("--post-kb", type=float, default=8, help="approximate html size of each post")
+	parser.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX),
+						help=f"relative weights of post blocks, ie 'table=5,image=0'. kinds: {', '.join(DEFAULT_MIX)}")
+	parser.add_argument("--comments-per-post", type=int, default=0)
+	parser.add_argument("--seed", type=int, default=1)
+
+
+def main():
+	parser = argparse.ArgumentParser(description="generate a synthetic Blogger export")
+	parser.add_argument("output", help="path of the XML to write")
+	add_export_arguments(parser)
+	parser.add_argument("--image-base-url", default="https://1.bp.blogspot.com")
+	args = parser.parse_args()
+
+	SyntheticExport(args.posts, args.post_kb, args.mix, args.seed, args.comments_per_post,
+					args.image_base_url).write(args.output)
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
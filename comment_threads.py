@@ -0,0 +1,177 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+
+import os
+import json
+import array
+import logging
+import datetime
+import tempfile
+import collections
+from fs_utils import write_text_if_changed
+
+converter_logger = logging.getLogger('converter')
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+THREAD = "{http://purl.org/syndication/thread/1.0}"
+COMMENTS_MODES = ["section", "sidecar"]
+# everything after this line of a post is its comments section, replaced on every run
+COMMENTS_MARKER = "<!-- blogger comments -->"
+MAX_ORPHAN_WARNINGS = 10
+
+# what's kept of each comment until it's written. a tuple, there can be millions
+BufferedComment = collections.namedtuple("BufferedComment", ["number", "parent", "author", "published", "md"])
+
+
+def comment_number(id_or_url):
+	"""
+		'tag:blogger.com,1999:blog-1.post-300' or '.../comments/default/300' -> '300'.
+		replies point at their parent comment by url, comments name themselves by atom id
+	"""
+	return id_or_url.rsplit("/", 1)[-1].rsplit("post-", 1)[-1]
+
+
+def extract_comment_data(comment_xml):
+	"""returns the comment's metadata and its html content. a reply has the comment it replies to as parent"""
+	comment_data = {}
+	comment_data["blogger_id"] = comment_xml.find(f"{ATOM}id").text
+	author = comment_xml.find(f"{ATOM}author")
+	comment_data["author"] = author.find(f"{ATOM}name").text if author is not None else None
+	comment_data["published"] = datetime.datetime.strptime(comment_xml.find(f"{ATOM}published").text, '%Y-%m-%dT%H:%M:%S.%f%z')
+	reply_to = comment_xml.find(f"{THREAD}in-reply-to")
+	comment_data["post_id"] = reply_to.attrib.get("ref") if reply_to is not None else None
+	comment_data["parent"] = None
+	for link in comment_xml.findall(f"{ATOM}link"):
+		if link.attrib.get("rel") == "related":
+			comment_data["parent"] = comment_number(link.attrib["href"])
+	content = comment_xml.find(f"{ATOM}content")
+	return comment_data, (content.text if content is not None else None) or ""
+
+
+def quote_lines(md, depth):
+	"""nests md depth blockquotes deep"""
+	if depth == 0:
+		return md
+	prefix = "> " * depth
+	return "\n".join((prefix + line) if line else prefix.rstrip() for line in md.split("\n"))
+
+
+def render_thread(comments):
+	"""
+		markdown of a post's BufferedComments. replies follow what they reply to, quoted one level
+		deeper, siblings oldest first. replies to deleted comments are shown at the top level
+	"""
+	numbers = set(c.number for c in comments)
+	replies = collections.defaultdict(list) # parent number (None for the post) -> replies
+	for c in comments:
+		replies[c.parent if c.parent in numbers and c.parent != c.number else None].append(c)
+	for siblings in replies.values():
+		siblings.sort(key=lambda c: c.published)
+
+	out = ["## Comments\n"]
+	shown = set()
+	# replies that loop back to each other never reach the top level. they're started from too
+	roots = replies[None] + sorted(comments, key=lambda c: c.published)
+	for root in roots:
+		stack = [(root, 0)]
+		while stack: # not recursing, threads can be deeper than python's recursion limit
+			c, depth = stack.pop()
+			if c.number in shown:
+				continue
+			shown.add(c.number)
+			header = f"**{c.author or 'Anonymous'}** on {c.published.strftime('%Y-%m-%d')}:"
+			out.append("\n" + quote_lines(f"{header}\n\n{c.md.strip()}", depth) + "\n")
+			for reply in reversed(replies[c.number]):
+				stack.append((reply, depth + 1))
+	return "".join(out)
+
+
+class CommentThreads:
+	"""
+		joins comments to their posts in the single pass over the export, whatever order the
+		entries come in. comments are indexed by the post they reply to as they're read, and
+		posts only leave behind where they were saved, so nothing is looked up per post and
+		no entry is read twice.
+
+		a comment whose post was already written goes straight to a spool file, only where it
+		is in the spool is kept. comments whose post hasn't been seen yet are the only ones held
+		in memory, until their post is written and they're spooled too.
+
+		once the export is read, write() threads each post's comments and writes them as a
+		section at the end of the post (mode "section") or next to it as '<post>.comments.md'
+		(mode "sidecar"). comments of posts that weren't in the export are reported as orphans.
+	"""
+	def __init__(self, mode):
+		if mode not in COMMENTS_MODES:
+			raise ValueError(f"unknown comments mode '{mode}'. known: {', '.join(COMMENTS_MODES)}")
+		self.mode = mode
+		self.unmatched = collections.defaultdict(list) # post id -> BufferedComments, for posts not written yet
+		self.spooled = collections.defaultdict(lambda: array.array("q")) # post id -> offsets of its comments in spool
+		self.spool = None # temporary file of the spooled comments, a json list each line
+		self.spool_size = 0
+		self.post_outputs = {} # post id -> where the post was saved
+		self.stats = collections.Counter()
+
+	def add_comment(self, comment_data, md):
+		comment = BufferedComment(comment_number(comment_data["blogger_id"]), comment_data["parent"],
+								  comment_data["author"], comment_data["published"], md.strip())
+		post_id = comment_data["post_id"]
+		if self.post_outputs.get(post_id):
+			self._spool(post_id, comment)
+		else:
+			self.unmatched[post_id].append(comment)
+		self.stats["comments"] += 1
+
+	def post_written(self, post_id, output_path):
+		self.post_outputs[post_id] = output_path
+		if output_path:
+			for comment in self.unmatched.pop(post_id, ()):
+				self._spool(post_id, comment)
+
+	def _spool(self, post_id, comment):
+		if self.spool is None:
+			self.spool = tempfile.TemporaryFile()
+		line = json.dumps([comment.number, comment.parent, comment.author, comment.published.isoformat(), comment.md],
+						  ensure_ascii=False).encode("utf-8") + b"\n"
+		self.spooled[post_id].append(self.spool_size)
+		self.spool.write(line)
+		self.spool_size += len(line)
+
+	def spooled_comments(self, post_id):
+		"""the post's BufferedComments, read back from the spool"""
+		comments = []
+		for offset in self.spooled.get(post_id, ()):
+			self.spool.seek(offset)
+			number, parent, author, published, md = json.loads(self.spool.readline())
+			comments.append(BufferedComment(number, parent, author, datetime.datetime.fromisoformat(published), md))
+		return comments
+
+	def orphans(self):
+		"""post id -> its comments, for posts this run didn't write"""
+		return dict(self.unmatched)
+
+	def write(self):
+		for post_id in self.spooled:
+			output_path = self.post_outputs[post_id]
+			thread = render_thread(self.spooled_comments(post_id))
+			if self.mode == "sidecar":
+				write_text_if_changed(os.path.splitext(output_path)[0] + ".comments.md", thread)
+			else:
+				with open(output_path, "r", encoding="utf-8") as f:
+					post = f.read()
+				post = post.split(f"\n\n{COMMENTS_MARKER}\n", 1)[0]
+				write_text_if_changed(output_path, f"{post}\n\n{COMMENTS_MARKER}\n{thread}")
+			self.stats["threads"] += 1
+		if self.spool is not None:
+			self.spool.close()
+			self.spool = None
+			self.spooled.clear()
+
+		orphans = self.orphans()
+		self.stats["orphans"] = sum(len(comments) for comments in orphans.values())
+		converter_logger.info(f"comments: {self.stats['comments']} on {self.stats['threads']} posts, "
+							  f"{self.stats['orphans']} orphans")
+		for post_id, comments in list(orphans.items())[:MAX_ORPHAN_WARNINGS]:
+			converter_logger.warning(f"{len(comments)} comments reply to post '{post_id}', which wasn't converted")
+		if len(orphans) > MAX_ORPHAN_WARNINGS:
+			converter_logger.warning(f"... and comments on {len(orphans) - MAX_ORPHAN_WARNINGS} more posts that weren't converted")
+		return self.stats
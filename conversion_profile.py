@@ -0,0 +1,90 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+
+import json
+import time
+import heapq
+import itertools
+import contextlib
+import collections
+
+
+class ConversionProfile:
+	"""
+		where a conversion run spends its time, written as JSON by write().
+
+		phases are wall seconds of the converting process, except html conversion done by
+		--jobs workers (summed worker seconds) and image io (summed download thread seconds,
+		'image io wait' is how long the run waited for downloads to finish).
+	"""
+	def __init__(self, slowest_posts=20):
+		self.started = time.perf_counter()
+		self.phase_seconds = collections.Counter()
+		self.bytes = collections.Counter()
+		self.tag_counts = collections.Counter()
+		self.tag_seconds = collections.Counter()
+		self.posts = 0
+		self.max_slowest_posts = slowest_posts
+		self._slowest_posts = [] # min heap of the slowest posts' (seconds, seq, details)
+		self._seq = itertools.count()
+
+	@contextlib.contextmanager
+	def phase(self, name):
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.phase_seconds[name] += time.perf_counter() - start
+
+	def timed_iter(self, iterable, phase):
+		"""yields from iterable, counting the time spent producing each item as phase"""
+		it = iter(iterable)
+		while True:
+			start = time.perf_counter()
+			try:
+				item = next(it)
+			except StopIteration:
+				return
+			finally:
+				self.phase_seconds[phase] += time.perf_counter() - start
+			yield item
+
+	def add_post(self, post_data, html_bytes, md_bytes, seconds, tag_counts, tag_seconds):
+		self.posts += 1
+		self.phase_seconds["html conversion"] += seconds
+		self.bytes["html in"] += html_bytes
+		self.bytes["markdown out"] += md_bytes
+		self.tag_counts.update(tag_counts)
+		self.tag_seconds.update(tag_seconds)
+
+		details = {"title": post_data["title"], "blogger_id": post_data["blogger_id"],
+				   "seconds": round(seconds, 6), "html bytes": html_bytes}
+		entry = (seconds, next(self._seq), details)
+		if len(self._slowest_posts) < self.max_slowest_posts:
+			heapq.heappush(self._slowest_posts, entry)
+		else:
+			heapq.heappushpop(self._slowest_posts, entry)
+
+	def report(self, image_stats=None):
+		wall = time.perf_counter() - self.started
+		image_stats = dict(image_stats or {})
+		phases = dict(self.phase_seconds)
+		if "download seconds" in image_stats:
+			phases["image io"] = image_stats.pop("download seconds")
+		if "downloaded bytes" in image_stats:
+			self.bytes["images downloaded"] = image_stats.pop("downloaded bytes")
+
+		return {
+			"wall seconds": round(wall, 6),
+			"posts": self.posts,
+			"posts per second": round(self.posts / wall, 3) if wall else None,
+			"phases": {name: round(seconds, 6) for name, seconds in sorted(phases.items())},
+			"bytes": dict(sorted(self.bytes.items())),
+			"images": image_stats,
+			"tags": {tag: {"count": self.tag_counts[tag], "seconds": round(seconds, 6)}
+					 for tag, seconds in self.tag_seconds.most_common()},
+			"slowest posts": [details for _, _, details in sorted(self._slowest_posts, reverse=True)],
+		}
+
+	def write(self, path, image_stats=None):
+		with open(path, "w", encoding="utf-8") as f:
+			json.dump(self.report(image_stats), f, indent=1)
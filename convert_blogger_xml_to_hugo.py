@@ -0,0 +1,40 @@
+from convert_blogger_xml_to_md import \
+	convert_posts_to_md, convert_posts_to_archive, g_converter_config, converter_logger, HAPPY_LOG, \
+	build_arg_parser, apply_args_to_config
+import os
+
+def hugo_paths(site_root=""):
+	"""where a hugo site at site_root keeps posts and images"""
+	return {
+		"md_file_save_path": os.path.join(site_root, "content/posts"),
+		"image_save_path": os.path.join(site_root, "static/images/posts"),
+		"img_path_relative_to_md": "/images/posts",
+		# hugo reads site.Data.blog from here
+		"site index path": os.path.join(site_root, "data/blog"),
+	}
+
+def main():
+	args = build_arg_parser("convert_blogger_xml_to_hugo.py",
+							"please backup your blogger"
+							" posts (https://support.google.com/blogger/answer/41387)"
+							" and provide the path to the downloaded backup XML").parse_args()
+	apply_args_to_config(args)
+
+	# hugo-specific
+	g_converter_config.update(hugo_paths())
+	g_converter_config["render target"] = "hugo"
+
+	if g_converter_config["archive path"]:
+		convert_posts_to_archive(args.xml_path)
+	else:
+		convert_posts_to_md(args.xml_path)
+	converter_logger.log(HAPPY_LOG, "")
+	converter_logger.log(HAPPY_LOG, "****")
+	converter_logger.log(HAPPY_LOG, "Done converting Blogger posts to Markdown.")
+	converter_logger.log(HAPPY_LOG, "Take care, polar bear")
+	converter_logger.log(HAPPY_LOG, "****")
+	return 0
+
+
+if __name__ == '__main__':
+	main()
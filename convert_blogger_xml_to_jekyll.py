@@ -1,23 +1,16 @@
-import sys
 from convert_blogger_xml_to_md import \
-	convert_posts_to_md, g_converter_config, converter_logger, HAPPY_LOG
-import urllib
+	convert_posts_to_md, convert_posts_to_archive, g_converter_config, converter_logger, HAPPY_LOG, \
+	build_arg_parser, apply_args_to_config
+from render_targets import RENDER_TARGETS
+from fs_utils import write_text_if_changed
 import os
-import string
-import html
+
+# posts are written jekyll style while they're converted, by the render target. the functions
+# below are kept for code that still calls them, and do what the target does
+JEKYLL_TARGET = RENDER_TARGETS["jekyll"]
 
 def make_post_preamble(post_data):
-	preamble = "---\n"
-	preamble += "layout: post\n"
-	preamble += f"title: >\n    {post_data['title']}\n"
-	preamble += "hide_title: false\n"
-	# consider putting first pic automatically
-	# feature-img: "assets/img/sample.png"
-	# thumbnail: "assets/img/thumbnails/sample-th.png"
-	preamble += f"tags: {post_data['categories']}\n"
-	preamble += "excerpt_separator: <!--more-->\n"
-	preamble += "---\n"
-	return preamble
+	return JEKYLL_TARGET.front_matter(post_data)
 
 
 def clean_image_captions(md):
@@ -25,50 +18,59 @@ def clean_image_captions(md):
 		find mardown like
 			![](/assets/img/posts\ssh+file+transfer.jpg)it's not stupid if it works
 		and change it to
-			{% include image.html url="/assets/img/posts\ssh+file+transfer.jpg" description="it's not stupid if it works" alt="some alt text" %}
+			{% include image.html url="/assets/img/posts\ssh+file+transfer.jpg" caption="it's not stupid if it works" alt="some alt text" %}
+		markdown converted with the jekyll render target has no such images left
 	"""
 	new_md = []
 	for md_line in md.split("\n"):
 		if md_line.startswith("![") and ("](" in md_line) and (")" in md_line):
-			alt_text = html.escape(md_line[2:md_line.index("](")])
-			img_path = html.escape(md_line[md_line.index("](")+2:md_line.index(")")])
-			img_capt = html.escape(md_line[md_line.index(")")+1:])
-
-			new_md.append(f'{{% include image.html url="{img_path}" caption="{img_capt}" alt="{alt_text}" %}}')
+			alt_text = md_line[2:md_line.index("](")]
+			img_path = md_line[md_line.index("](")+2:md_line.index(")")]
+			img_capt = md_line[md_line.index(")")+1:]
+			new_md.append(JEKYLL_TARGET.image(alt_text, img_path, img_capt))
 		else:
 			new_md.append(md_line)
 
 	return "\n".join(new_md)
 
-def save_md_file_jekyll_style(post_data):
-
-	preamble = make_post_preamble(post_data)
-	
-	md_file_name = f"{post_data['published'].strftime('%Y-%m-%d')}-{urllib.parse.quote('-'.join(post_data['title'].split(' ')), safe='')}.md"
-	save_path = os.path.join(g_converter_config["md_file_save_path"], md_file_name)
-	converter_logger.log(HAPPY_LOG,f"saving '...{md_file_name}'")
 
-	# change images w/caption to be in the format of
-	# {% include image.html url="/assets/img/posts\telnet+into+router.jpg" description="easy work getting a shell" %}
+def jekyll_paths(site_root=""):
+	"""where a jekyll site at site_root keeps posts and images"""
+	return {
+		"md_file_save_path": os.path.join(site_root, "_posts"),
+		"image_save_path": os.path.join(site_root, "assets/img/posts"),
+		"img_path_relative_to_md": "/assets/img/posts",
+		# jekyll reads site.data.blog from here
+		"site index path": os.path.join(site_root, "_data/blog"),
+	}
 
-	cleaned_md = clean_image_captions(post_data["md"])
+def render_post_jekyll_style(post_data, config=None):
+	"""returns where the post is saved in the jekyll site, and the file's text"""
+	config = g_converter_config if config is None else config
+	save_path = os.path.join(config["md_file_save_path"], JEKYLL_TARGET.post_file_name(post_data))
+	return save_path, make_post_preamble(post_data) + clean_image_captions(post_data["md"])
 
-	open(save_path, "w", encoding="utf-8").write(preamble + cleaned_md)
+def save_md_file_jekyll_style(post_data, config=None):
+	save_path, text = render_post_jekyll_style(post_data, config)
+	converter_logger.log(HAPPY_LOG,f"saving '...{os.path.basename(save_path)}'")
+	write_text_if_changed(save_path, text)
+	return save_path
 
 def main():
-	if len(sys.argv) != 2:
-		print("usage: convert_blogger_xml_to_jekyll.py <path to blogger XML>")
-		print("please backup your blogger"
-			  " posts (https://support.google.com/blogger/answer/41387)"
-			  " and provide the path to the downloaded backup XML")
-		return 1
+	args = build_arg_parser("convert_blogger_xml_to_jekyll.py",
+							"please backup your blogger"
+							" posts (https://support.google.com/blogger/answer/41387)"
+							" and provide the path to the downloaded backup XML").parse_args()
+	apply_args_to_config(args)
 
 	# jekyll-specific
-	g_converter_config["md_file_save_path"] = "_posts"
-	g_converter_config["image_save_path"] = "assets/img/posts" 
-	g_converter_config["img_path_relative_to_md"] = "/assets/img/posts"
+	g_converter_config.update(jekyll_paths())
+	g_converter_config["render target"] = "jekyll"
 
-	convert_posts_to_md(sys.argv[1], save_md_file_jekyll_style)
+	if g_converter_config["archive path"]:
+		convert_posts_to_archive(args.xml_path)
+	else:
+		convert_posts_to_md(args.xml_path)
 	converter_logger.log(HAPPY_LOG, "")
 	converter_logger.log(HAPPY_LOG, "****")
 	converter_logger.log(HAPPY_LOG, "Done converting Blogger posts to Markdown.")
@@ -10,6 +10,34 @@ import urllib.request
 import urllib.parse
 import logging 
 import datetime
+import time
+import argparse
+import collections
+import contextlib
+import concurrent.futures
+import hashlib
+import tempfile
+from image_downloader import ImageDownloader
+from image_cache import ImageCache
+from image_mirror import ImageMirror
+from conversion_profile import ConversionProfile
+from post_manifest import PostManifest, content_hash
+from fs_utils import write_text_if_changed
+from shard_manifest import ShardManifest, shard_of, parse_shard
+from archive_writer import ArchiveWriter, ARCHIVE_FORMATS
+from render_targets import RENDER_TARGETS
+from comment_threads import CommentThreads, COMMENTS_MODES, THREAD, extract_comment_data
+from image_sizes import capped_url, srcset_urls, size_of
+from markdown_tables import Table, CellHtml
+from fast_blogger_html import fast_feed
+from run_journal import CheckpointJournal, RetryQueue
+from feed_source import FeedSource, is_feed_url, read_feed_state, save_feed_state
+from site_indexes import SiteIndexes, index_fields
+from post_links import PostLinkIndex, entry_post_url, post_url_key, MAX_MISSING_LINK_WARNINGS
+try:
+	import resource
+except ImportError:
+	resource = None # not available on Windows
 
 g_converter_config = {}
 
@@ -22,20 +50,155 @@ g_converter_config["image_save_path"] = "fetched_images"
 # path prefix to use in markdown to access downloaded images
 g_converter_config["img_path_relative_to_md"] = "../fetched_images"
 
+# flavor of the output: front matter, file names and how images are written. one of render_targets.RENDER_TARGETS
+g_converter_config["render target"] = "md"
+
 # parse the href around an image and download the highest quality image
 g_converter_config["try using better quality image from link"] = True 
 
+# blogspot/googleusercontent image urls say what size to scale the image to (/s1600/, =w640-h480), and the
+# linked image is often the multi-megabyte original. ask for blogger images at most this wide. None keeps the urls' sizes
+g_converter_config["image max width"] = None
+
+# also download blogger images at these widths (up to "image max width") and reference them with an html srcset,
+# ie [480, 960, 1600]. empty for a single image
+g_converter_config["image srcset widths"] = []
+
 # html to markdown conversion settings
 g_converter_config["images_on_own_line"] = True
 g_converter_config["allow consecutive empty lines"] = False
 g_converter_config["ignore empty head tags"] = True
 g_converter_config["ignore downloaded image cache"] = False
 
+# downloaded images are kept in a content-addressed cache with a manifest of every url.
+# None keeps it in '<image_save_path>/.image-cache'
+g_converter_config["image cache path"] = None
+
+# instead of trusting the cache, ask the server whether cached images changed (cheap conditional requests)
+g_converter_config["revalidate image cache"] = False
+
+# different urls can end with the same file name. adds a short hash of the url to saved images' names
+g_converter_config["unique image names"] = True
+
+# folders that already have the blog's images (photo archives, an earlier conversion's images, a wget mirror).
+# images found in them aren't downloaded. they're indexed into "image mirror index path", by default in the image cache
+g_converter_config["image mirror folders"] = []
+g_converter_config["image mirror index path"] = None
+
+# never go to the network. images that aren't cached or mirrored are reported missing
+g_converter_config["offline"] = False
+
+# images are downloaded on a pool of threads while posts keep converting
+g_converter_config["image download workers"] = 8
+g_converter_config["image downloads per host"] = 4
+g_converter_config["image download retries"] = 3
+g_converter_config["image download timeout"] = 30 # seconds
+
+# parse the XML incrementally, freeing each entry once it's converted.
+# keeps memory flat no matter how large the blogger export is
+g_converter_config["streaming xml parsing"] = True
+
+# read posts' html with fast_blogger_html's tokenizer, which handles what Blogger's editor writes
+# much faster than HTMLParser. posts with anything else in them are read by HTMLParser. same output either way
+g_converter_config["fast html tokenizer"] = True
+
+# reading a blog's atom feed (a url instead of a backup): entries per page (blogger's most is 500),
+# and how many pages are fetched at once
+g_converter_config["feed page size"] = 500
+g_converter_config["feed fetch workers"] = 4
+
+# only fetch the feed's entries updated since the last run that read the whole feed
+g_converter_config["feed delta sync"] = True
+
+# where the newest entry each feed had is kept for delta syncs. None keeps it in '<md_file_save_path>/.feed-state.json'
+g_converter_config["feed state path"] = None
+
+# log the peak memory (resident set size) used once done converting
+g_converter_config["report peak memory"] = False
+
+
+# number of processes converting posts' html in parallel. 1 converts in this process.
+# output files and logs come out the same no matter the number of jobs
+g_converter_config["conversion jobs"] = 1
+
+
+# skip posts that haven't changed since the last run. tracked in a manifest of every converted post
+g_converter_config["incremental conversion"] = False
+
+# where the incremental manifest is kept. None keeps it in '<md_file_save_path>/.post-manifest.json'
+g_converter_config["post manifest path"] = None
+
+# with incremental conversion, delete converted posts that are no longer in the export
+g_converter_config["prune deleted posts"] = False
+
+# point links between the blog's posts (NAME.blogspot.com/YYYY/MM/slug.html) at the converted posts.
+# links to posts that aren't in the export are reported
+g_converter_config["rewrite internal links"] = False
+
+# where the post links are kept for later runs (ie feed delta syncs). None keeps them in '<md_file_save_path>/.post-links.json'
+g_converter_config["post links path"] = None
+
+# write tag, archive and search indexes of the converted posts for a static site (see site_indexes.py).
+# with incremental conversion, only changed posts are indexed again
+g_converter_config["site indexes"] = False
+
+# folder the site indexes are written to. None writes them to '<md_file_save_path>/site-index'
+g_converter_config["site index path"] = None
+
+# write a JSON report of where the run spent its time (phases, tags, slowest posts, bytes) to this path
+g_converter_config["profile report path"] = None
+
+
+# journal each post and image as it's done, so a run that's interrupted or crashes is picked up
+# where it stopped by the next run of the same export and settings
+g_converter_config["checkpoint journal"] = True
+
+# where the journal is kept. None keeps it in '<md_file_save_path>/.checkpoint-journal.jsonl'
+g_converter_config["checkpoint journal path"] = None
+
+# where posts and images that failed are queued with why. None keeps it in '<md_file_save_path>/retry-queue.jsonl'
+g_converter_config["retry queue path"] = None
+
+# only convert the posts and download the images in the retry queue
+g_converter_config["retry failed"] = False
+
+
+# (index, count) to only convert one of count slices of the posts, numbered from 1. None converts every post.
+# posts are assigned to shards by a hash of their id, so hosts converting different shards of the same export never overlap
+g_converter_config["shard"] = None
+
+# where a shard writes what it converted, referenced and failed on. None keeps it in '<md_file_save_path>/.shard-I-of-N.json'
+g_converter_config["shard manifest path"] = None
+
+# several processes (ie shards) use the image cache at once. each image is downloaded by only one of them
+g_converter_config["shared image cache"] = False
+
+
+# convert readers' comments too, threaded under the posts they're on. "section" appends them to the post,
+# "sidecar" writes them next to it as '<post>.comments.md'. None leaves comments out
+g_converter_config["comments"] = None
+
+
+# write every post and image into this one zip/tar archive instead of a file each, laid out like the folders would be.
+# "-" streams the archive to stdout. None writes separate files
+g_converter_config["archive path"] = None
+
+# one of "zip", "tar", "tar.gz". None picks by the archive's name (zip for stdout)
+g_converter_config["archive format"] = None
+
+# 0 (fastest) to 9 (smallest)
+g_converter_config["archive compression level"] = 6
+
 
 # settings to ease debugging
 # g_converter_config["dont download use demo image"] = "../demo.jpg"
 g_converter_config["stop after one conversion"] = False
 
+# the settings above, before anything changes them. see make_converter_config()
+DEFAULT_CONVERTER_CONFIG = dict(g_converter_config)
+# settings that are only looked at when set
+OPTIONAL_CONFIG_KEYS = {"dont download use demo image"}
+
 HAPPY_LOG = 25
 class CustomFormatter(logging.Formatter):
     """Logging Formatter to add colors and count warning / errors"""
@@ -70,28 +233,134 @@ ch.setLevel(logging.INFO)
 ch.setFormatter(formatter)
 
 
+# loggers' levels match the handler's, so disabled messages are dropped before any work.
+# set both (and ch) to DEBUG to trace every tag
 html_logger = logging.getLogger('html parser')
-html_logger.setLevel(logging.DEBUG)
+html_logger.setLevel(logging.INFO)
 html_logger.addHandler(ch)
 
 converter_logger = logging.getLogger('converter')
-converter_logger.setLevel(logging.DEBUG)
+converter_logger.setLevel(logging.INFO)
 converter_logger.addHandler(ch)
 
-class HTMLToMarkdownParser(HTMLParser):
+class MarkdownBuffer:
+	"""
+		the markdown being built. appends go to a list of chunks so building a post is linear
+		in its size, and the queries the parser makes about the end of the output don't
+		re-scan what was already written.
+	"""
 	def __init__(self):
+		self.chunks = []
+		self._last_char = ""
+
+	def write(self, s):
+		if s:
+			self.chunks.append(s)
+			self._last_char = s[-1]
+
+	def write_marker(self, s):
+		"""writes s and returns a handle to take it back out with retract()"""
+		self.write(s)
+		return len(self.chunks) - 1
+
+	def retract(self, marker):
+		self.replace(marker, "")
+
+	def replace(self, marker, s):
+		"""swaps what was written with write_marker() for s"""
+		self.chunks[marker] = s
+		if marker == len(self.chunks) - 1:
+			self._last_char = next((c[-1] for c in reversed(self.chunks) if c), "")
+
+	def is_last(self, marker):
+		"""whether nothing was written since the marker"""
+		return not any(self.chunks[marker + 1:])
+
+	def position(self):
+		return len(self.chunks), self._last_char
+
+	def cut_from(self, position):
+		"""
+			takes out and returns everything written since position(). markers stay valid.
+			the cost is only in what's cut, so cutting every cell of a big table stays linear
+		"""
+		index, last_char = position
+		text = "".join(self.chunks[index:])
+		for i in range(index, len(self.chunks)):
+			self.chunks[i] = ""
+		self._last_char = last_char
+		return text
+
+	def last_chars(self, n):
+		"""same as md[-n:]"""
+		tail = ""
+		for chunk in reversed(self.chunks):
+			tail = chunk + tail
+			if len(tail) >= n:
+				break
+		return tail[-n:]
+
+	def last_char(self):
+		return self._last_char
+
+	def tail_from_last_newline(self):
+		"""same as md[md.rfind("\n"):] - the last line including its newline, or the last char if no newline"""
+		tail = []
+		for chunk in reversed(self.chunks):
+			idx = chunk.rfind("\n")
+			if idx != -1:
+				tail.append(chunk[idx:])
+				return "".join(reversed(tail))
+			tail.append(chunk)
+		return self._last_char
+
+	def getvalue(self):
+		return "".join(self.chunks)
+
+
+class HTMLToMarkdownParser(HTMLParser):
+	"""
+		converts html to markdown tag by tag.
+		each tag's handling is looked up in start_tag_handlers and end_tag_handlers
+		(see register_tag_handler() to add or change tags). tags without handlers are
+		counted in unknown_tags (on their start tag) and otherwise ignored, only their text is kept.
+		settings are read from config, g_converter_config by default.
+		images are written by the config's render target, see render_targets.py.
+	"""
+	start_tag_handlers = {} # tag -> handler(parser, tag, attr_dict)
+	end_tag_handlers = {} # tag -> handler(parser, tag)
+
+	def __init__(self, config=None):
 		HTMLParser.__init__(self)
-		self.md = ""
+		self.config = g_converter_config if config is None else config
+		self.out = MarkdownBuffer()
 		# stacks to keep track of embedded elements
 		self.links = [] 
+		self.link_markers = [] # where each open link's '[' was written, to take it back if needed
 		self.list = [] # saves either last list number or unordered
 		self.spans = [] # tracks spans
 		self.escape_md_data = True # used to temporarily disable escaping (for code)
 
-		self.nested_table_states = [] # each state is one of 'filled-th_%d' 'filling_body' 'ignoring'
+		self.tables = [] # markdown_tables.Table of each open table, innermost last
+		self.cell_html = None # CellHtml of the open cell of the innermost data table, tags and text are recorded into it
+
+		self.target = RENDER_TARGETS[self.config["render target"]]
 
 		self.newline_after_td = False
 		self.last_image_fname = ""
+		self.last_image_marker = None
+		# (marker, alt text, path) of an image in a caption table. it's rewritten with the caption once that's read
+		self.image_to_caption = None
+		self.caption_position = None # where the caption's markdown starts while reading it
+		self.image_refs = [] # urls of images to download, in order of appearance
+		self.post_links = None # PostLinkIndex that links to the blog's posts are rewritten with
+		self.unresolved_links = [] # links to the blog's posts that weren't rewritten
+		self.unknown_tags = collections.Counter() # tags there's no handler for -> times seen
+		self.ignored_markup = collections.Counter() # comments, declarations.. -> times seen
+
+		# checked once, so the per-tag debug messages cost nothing when debug logging is off
+		self.debug_logging = html_logger.isEnabledFor(logging.DEBUG)
+		self.fed_starttag_text = None # the start tag fast_blogger_html.feed_tokens() is feeding
 
 	def ensure_on_newline(self):
 		"""
@@ -103,317 +372,1066 @@ class HTMLToMarkdownParser(HTMLParser):
 
 			this function addresses that issue by making sure h1 and friends are started on a newline
 		"""
-		if (len(self.md) > 0) and (self.md[-1] != "\n"):
-			self.md += "\n"
-			html_logger.debug("adding newline")
-		else:
+		if self.out.last_char() not in ["", "\n"]:
+			self.out.write("\n")
+			if self.debug_logging:
+				html_logger.debug("adding newline")
+		elif self.debug_logging:
 			html_logger.debug("not adding new line")
 
+	def add_image_ref(self, img_src):
+		"""records an image to download later. returns the path markdown should use for it"""
+		if "dont download use demo image" in self.config:
+			return self.config["dont download use demo image"]
+		if img_src not in self.image_refs:
+			self.image_refs.append(img_src)
+		return image_paths_for_src(img_src, self.config)[1]
+
+	def get_starttag_text(self):
+		"""the html of the start tag being handled, as HTMLParser read it or the fast tokenizer fed it"""
+		if self.fed_starttag_text is not None:
+			return self.fed_starttag_text
+		return HTMLParser.get_starttag_text(self)
+
+	@property
+	def md(self):
+		return self.out.getvalue()
+
+	def finish(self):
+		"""writes the tables the html didn't close. call once all of it was fed"""
+		if self.tables:
+			html_logger.warning(f"{len(self.tables)} tables weren't closed")
+		while self.tables:
+			self.end_table("table")
+
+	def enable_tag_profiling(self):
+		"""counts and times every tag's handling into tag_counts and tag_seconds. text is timed as '#text'"""
+		self.tag_counts = collections.Counter()
+		self.tag_seconds = collections.Counter()
+		self.handle_starttag = self._profiled_handle_starttag
+		self.handle_endtag = self._profiled_handle_endtag
+		self.handle_data = self._profiled_handle_data
+
+	def _profiled_handle_starttag(self, tag, attrs):
+		start = time.perf_counter()
+		HTMLToMarkdownParser.handle_starttag(self, tag, attrs)
+		self.tag_counts[tag] += 1
+		self.tag_seconds[tag] += time.perf_counter() - start
+
+	def _profiled_handle_endtag(self, tag):
+		start = time.perf_counter()
+		HTMLToMarkdownParser.handle_endtag(self, tag)
+		self.tag_seconds[tag] += time.perf_counter() - start
+
+	def _profiled_handle_data(self, data):
+		start = time.perf_counter()
+		HTMLToMarkdownParser.handle_data(self, data)
+		self.tag_counts["#text"] += 1
+		self.tag_seconds["#text"] += time.perf_counter() - start
+
 	def handle_starttag(self, tag, attrs):
-		html_logger.debug(f"Start tag: {tag}")	
-		for attr in attrs:
-			html_logger.debug(f"     attr:{attr}")
-		
-		attr_dict = dict(attrs)
-		if tag == "p":
-			# only drop line if not in table
-			if not self.nested_table_states or self.nested_table_states[-1] == "ignoring":
-				self.ensure_on_newline() 
-		elif tag == "i":
-			self.md += "*"
-		elif tag == "blockquote":
-			self.md += "> "	
-		elif tag == "b":
-			self.md += "**"
-		elif tag == "strike":
-			self.md += "~~"
-		elif tag == "hr":
+		if self.debug_logging:
+			html_logger.debug(f"Start tag: {tag}")	
+			for attr in attrs:
+				html_logger.debug(f"     attr:{attr}")
+
+		if self.cell_html is not None:
+			self.cell_html.start_tag(tag)
+		handler = self.start_tag_handlers.get(tag)
+		if handler is None:
+			self.unknown_tags[tag] += 1
+			return
+		handler(self, tag, dict(attrs))
+
+	def handle_endtag(self, tag):
+		if self.debug_logging:
+			html_logger.debug(f"End tag  {tag}")
+
+		if self.cell_html is not None:
+			self.cell_html.end_tag(tag)
+		handler = self.end_tag_handlers.get(tag)
+		if handler is not None:
+			handler(self, tag)
+
+	def ignore_tag(self, tag, attr_dict=None):
+		pass # do nothing
+
+	def passthrough_start(self, tag, attr_dict):
+		self.out.write(f"<{tag}>")
+
+	def passthrough_end(self, tag):
+		self.out.write(f"</{tag}>")
+
+	def start_emphasis(self, tag, attr_dict):
+		self.out.write(EMPHASIS_MARKS[tag])
+
+	def end_emphasis(self, tag):
+		self.out.write(EMPHASIS_MARKS[tag])
+
+	def in_data_table(self):
+		"""whether in a table that's written as a table, ie not a caption table"""
+		return bool(self.tables) and not self.tables[-1].caption
+
+	def start_p(self, tag, attr_dict):
+		# only drop line if not in table
+		if not self.in_data_table():
 			self.ensure_on_newline() 
-			self.md += "***"
-			self.ensure_on_newline() 			
-		elif tag in ["u", "sup", "sub", "iframe", "script", "style"]: # passthrough
-			self.md += f"<{tag}>"
-		elif tag == "a":
-			if ("href" in attr_dict) and (attr_dict["href"] != "https://www.blogger.com/null"):
-				self.md += "["
-				self.links.append(attr_dict["href"])
-			else:
-				self.links.append("unsupported_anchor")
-		elif tag == "img":
-			if g_converter_config["images_on_own_line"]:
-				self.ensure_on_newline()
-			self.last_image_fname = urllib.parse.urlsplit(attr_dict["src"]).path.split("/")[-1]		
-			img_src = attr_dict["src"]
-			if g_converter_config["try using better quality image from link"]:
-				# check if have link to higher quality pic
-				if self.links and "blogspot.com" in self.links[-1] \
-					and self.links[-1].endswith('/' + self.last_image_fname):
-					# nice. found higher quality version of pic
-					html_logger.debug(f"using higher quality {self.links[-1]} instead of {attr_dict['src']}")
-					img_src = self.links[-1]
-			published_img_path = download_img_src(img_src)
-			if "alt" in attr_dict:
-				alt_text = attr_dict["alt"]
-			else:
-				alt_text = ""
-			self.md += f"![{alt_text}]({published_img_path})"
-		elif tag in ["div", "html", "body"]:
-			pass # do nothing
-		elif tag == "h1":
-			self.ensure_on_newline()
-			self.md += "# "
-		elif tag == "h2":
-			self.ensure_on_newline()
-			self.md += "## "
-		elif tag == "h3":
-			self.ensure_on_newline()
-			self.md += "### "
-		elif tag == "h4":
-			self.ensure_on_newline()
-			self.md += "#### "
-		elif tag == "h5":
-			self.ensure_on_newline()
-			self.md += "##### "			
-		elif tag == "ol":
-			self.links.append(0)
-		elif tag == "ul":
-			self.links.append("unordered")
-		elif tag == "li":
+
+	def end_p(self, tag):
+		# only drop line if not in table
+		if not self.in_data_table():
+			# might have had something like </code> that already dropped us a line
 			self.ensure_on_newline()
-			if self.links[-1] == "unordered":
-				self.md += "* " 
-			else:
-				self.links[-1] += 1
-				self.md += str(self.links[-1]) + ". "
-		elif tag == "span":
+
+	def start_blockquote(self, tag, attr_dict):
+		self.out.write("> ")
+
+	def end_blockquote(self, tag):
+		self.out.write("\n")
+
+	def start_hr(self, tag, attr_dict):
+		self.ensure_on_newline() 
+		self.out.write("***")
+		self.ensure_on_newline() 			
+
+	def start_a(self, tag, attr_dict):
+		if self.cell_html is not None:
+			self.cell_html.start_link()
+		if ("href" in attr_dict) and (attr_dict["href"] != "https://www.blogger.com/null"):
+			self.link_markers.append(self.out.write_marker("["))
+			self.links.append(attr_dict["href"])
+		else:
+			self.link_markers.append(None)
+			self.links.append("unsupported_anchor")
+
+	def end_a(self, tag):
+		last_link = self.links.pop()
+		link_marker = self.link_markers.pop()
+		"""
+		algo: each time save name of last image. 
+		if pointing at blogspot AND href is urlencode(last_image), means we're point to that image -> don't want to include the link
+		"""
+		if "blogspot.com" in last_link and last_link.endswith('/' + self.last_image_fname) \
+			and self.last_image_marker is not None and self.out.is_last(self.last_image_marker):
+			# dont want to include this link
 			"""
-				taking care of setting font type as 'Courier' in Blogger.
-				Usually this was to identify a techincal word/function.
-				The md alternative is using backticks. Ie:
-				
-				<span style="font-family: courier;">malloc(0x10)</span>
-				will be converted to
-				`malloc(0x10)`
+			current sitation:
+			...
+			[\n\n
+			![some alt text](/assets/img/posts\trimmed+with+subtitles.gif)WE_ARE_HERE
 
+			need to remove first '[' in the example above
 			"""
-			if "style" in attr_dict.keys() and attr_dict["style"] == "font-family: courier;":
-				self.md += "`"
-				self.spans.append("backtick_span")
-				self.escape_md_data = False
-			else:
-				self.spans.append("ignored_span")
-		elif tag == "code":
+			self.out.retract(link_marker)
+			last_link = None
+		elif last_link != "unsupported_anchor":
+			if self.config["rewrite internal links"] and post_url_key(last_link) is not None:
+				last_link = self.internal_link(last_link)
+			self.out.write(f"]({last_link})")
+		else:
+			last_link = None
+		if self.cell_html is not None:
+			self.cell_html.end_link(last_link)
+
+	def internal_link(self, href):
+		"""where a link to one of the blog's posts points in the output. links not in the index are kept for the run to fix up or report"""
+		target = self.post_links.resolve(href) if self.post_links is not None else None
+		if target is None:
+			self.unresolved_links.append(href)
+			return href
+		return target
+
+	def start_img(self, tag, attr_dict):
+		if self.config["images_on_own_line"]:
 			self.ensure_on_newline()
-			self.md += "```\n"
+		self.last_image_fname = urllib.parse.urlsplit(attr_dict["src"]).path.split("/")[-1]		
+		img_src = attr_dict["src"]
+		if self.config["try using better quality image from link"]:
+			# check if have link to higher quality pic
+			if self.links and "blogspot.com" in self.links[-1] \
+				and self.links[-1].endswith('/' + self.last_image_fname):
+				# nice. found higher quality version of pic
+				if self.debug_logging:
+					html_logger.debug(f"using higher quality {self.links[-1]} instead of {attr_dict['src']}")
+				img_src = self.links[-1]
+		img_src = capped_url(img_src, self.config["image max width"])
+		srcset = None
+		if self.config["image srcset widths"]:
+			srcset = [(self.add_image_ref(url), width) for width, url in
+					  srcset_urls(img_src, self.config["image srcset widths"], self.config["image max width"])] or None
+		# with a srcset, the widest of it is the image's src
+		published_img_path = srcset[-1][0] if srcset else self.add_image_ref(img_src)
+		if "alt" in attr_dict:
+			alt_text = attr_dict["alt"]
+		else:
+			alt_text = ""
+		self.last_image_marker = self.out.write_marker(self.target.image(alt_text, published_img_path, "", srcset))
+		if self.cell_html is not None:
+			self.cell_html.image(alt_text, published_img_path, srcset)
+		if self.tables and self.tables[-1].caption:
+			self.image_to_caption = (self.last_image_marker, alt_text, published_img_path, srcset)
+
+	def start_heading(self, tag, attr_dict):
+		self.ensure_on_newline()
+		self.out.write(HEADING_PREFIXES[tag])
+
+	def end_heading(self, tag):
+		if self.config["ignore empty head tags"]:
+			last_line = self.out.tail_from_last_newline()
+			if last_line.replace("#", "").replace(" ", "") != "":
+				# has text
+				self.out.write("\n")
+		else:
+			self.out.write("\n")
+
+	def start_list(self, tag, attr_dict):
+		self.links.append(0 if tag == "ol" else "unordered")
+
+	def end_list(self, tag):
+		self.links.pop()
+		self.out.write("\n")
+
+	def start_li(self, tag, attr_dict):
+		self.ensure_on_newline()
+		if self.links[-1] == "unordered":
+			self.out.write("* ")
+		else:
+			self.links[-1] += 1
+			self.out.write(str(self.links[-1]) + ". ")
+
+	def end_li(self, tag):
+		self.out.write("\n")
+
+	def start_span(self, tag, attr_dict):
+		"""
+			taking care of setting font type as 'Courier' in Blogger.
+			Usually this was to identify a techincal word/function.
+			The md alternative is using backticks. Ie:
+			
+			<span style="font-family: courier;">malloc(0x10)</span>
+			will be converted to
+			`malloc(0x10)`
+
+		"""
+		if "style" in attr_dict.keys() and attr_dict["style"] == "font-family: courier;":
+			self.out.write("`")
+			self.spans.append("backtick_span")
 			self.escape_md_data = False
-		elif tag == "br":
-			if g_converter_config["allow consecutive empty lines"]:
-				self.md += "\n"
-			else:
-				self.ensure_on_newline()
+			if self.cell_html is not None:
+				self.cell_html.start_tag("tt")
+		else:
+			self.spans.append("ignored_span")
 
-		elif tag == "table":
-			if "class" in attr_dict and "tr-caption-container" in attr_dict["class"]:
-				# this is a table to align the image caption. ignore it
-				self.nested_table_states.append("ignoring")
+	def end_span(self, tag):
+		last_span = self.spans.pop()
+		if last_span == "backtick_span":
+			self.escape_md_data = True
+			self.out.write("`")
+			if self.cell_html is not None:
+				self.cell_html.end_tag("tt")
+		else:
+			pass # ignoring this span
+
+	def start_code(self, tag, attr_dict):
+		self.ensure_on_newline()
+		self.out.write("```\n")
+		self.escape_md_data = False
+
+	def end_code(self, tag):
+		self.ensure_on_newline()
+		self.out.write("```\n")
+		self.escape_md_data = True
+
+	def start_br(self, tag, attr_dict):
+		if self.config["allow consecutive empty lines"]:
+			self.out.write("\n")
+		else:
+			self.ensure_on_newline()
+
+	def start_table(self, tag, attr_dict):
+		if "class" in attr_dict and "tr-caption-container" in attr_dict["class"]:
+			# this is a table to align the image caption. ignore it
+			self.tables.append(Table(None, caption=True))
+			if self.debug_logging:
 				html_logger.debug("found caption table. ignoring")
-			else:
-				self.nested_table_states.append("filled-th_0")
-		elif tag == "tbody":
-			pass # don't care
-		elif tag == "tr":
-			if self.nested_table_states and self.nested_table_states[-1] != "ignoring":
-				self.ensure_on_newline()
-				self.md += "| "
-		elif tag == "td" or tag == "th":
-			if self.nested_table_states and self.nested_table_states[-1] == "ignoring":
-				# ignoring because we're in table of caption.
-
-				# check if this td has caption data 
-				"""
-				html table of caption format:
-					<td class="tr-caption" style="text-align: center;">I am a table caption <br /> </td>
-				"""
-				if "class" in attr_dict and "tr-caption" in attr_dict["class"]:
-					self.newline_after_td = True
+			return
+		if self.in_data_table():
+			# markdown tables can't be nested. both are written as html
+			self.tables[-1].needs_html = True
+		self.tables.append(Table(self.get_starttag_text()))
+		self.track_cell_html()
+
+	def end_table(self, tag):
+		if not self.tables:
+			html_logger.warning("ignoring </table> without a <table>")
+			return
+		table = self.tables[-1]
+		if table.caption:
+			self.tables.pop()
+			self.image_to_caption = None
+			return
+		self.close_cell()
+		self.tables.pop()
+		self.track_cell_html()
+		nested = self.in_data_table()
+		if table.needs_html or nested:
+			if self.debug_logging:
+				html_logger.debug("table can't be written in markdown, writing it as html")
+			text = table.to_html(nested)
 		else:
-			html_logger.warning(f"doing nothing for {tag}")
+			text = table.to_markdown()
+		if not text:
+			return
+		if nested and self.cell_html is not None:
+			self.cell_html.raw(text)
+		if not nested:
+			# a table needs a blank line before and after it, or the lines around it are read as its rows
+			self.ensure_on_newline()
+			if self.out.last_char() and self.out.last_chars(2) != "\n\n":
+				self.out.write("\n")
+			text += "\n"
+		self.out.write(text)
 
-	def handle_endtag(self, tag):
-		html_logger.debug(f"End tag  {tag}")
-
-		if tag == "p":
-			# only drop line if not in table
-			if not self.nested_table_states or self.nested_table_states[-1] == "ignoring":
-				# might have had something like </code> that already dropped us a line
-				self.ensure_on_newline() 
-		elif tag == "i":
-			self.md += "*"
-		elif tag == "blockquote":
-			self.md += "\n"			
-		elif tag == "b":
-			self.md += "**"
-		elif tag == "strike":
-			self.md += "~~"
-		elif tag in ["u", "sup", "sub", "iframe", "script", "style"]: # passthrough
-			self.md += f"</{tag}>"
-		elif tag == "a":
-			last_link = self.links.pop()
+	def start_tr(self, tag, attr_dict):
+		if self.in_data_table():
+			self.close_cell() # its </td> is optional
+			self.tables[-1].start_row(self.get_starttag_text())
+
+	def end_tr(self, tag):
+		if self.in_data_table():
+			self.close_cell()
+
+	def start_cell(self, tag, attr_dict):
+		if self.tables and self.tables[-1].caption:
+			# ignoring because we're in table of caption.
+
+			# check if this td has caption data 
 			"""
-			algo: each time save name of last image. 
-			if pointing at blogspot AND href is urlencode(last_image), means we're point to that image -> don't want to include the link
+			html table of caption format:
+				<td class="tr-caption" style="text-align: center;">I am a table caption <br /> </td>
 			"""
-			if "blogspot.com" in last_link and last_link.endswith('/' + self.last_image_fname):
-				# dont want to include this link
-				# must remove previous '[' already placed
-				try:
-					"""
-					current sitation:
-					self.md = 
-					...
-					[\n\n
-					![some alt text](/assets/img/posts\trimmed+with+subtitles.gif)WE_ARE_HERE
-
-					need to remove first '[' in the example above
-					"""
-					if self.md[-1] != ")":
-						raise KeyError(f"expected ')' have '{self.md[-1]}'")
-					# remove opening bracked of link
-					idx_alt_text_start = self.md.rfind('![')
-					open_bracket_to_delete_idx = self.md[:idx_alt_text_start].rfind("[")
-					self.md = self.md[:open_bracket_to_delete_idx] + self.md[open_bracket_to_delete_idx+1:]
-				except Exception as e:
-					html_logger.warning(f"tried removing all traces of blogger image link, but got exception: {e}")
-					raise
-			elif last_link != "unsupported_anchor":
-				self.md += f"]({last_link})"
-			else:
-				pass # do nothing
-		elif tag in ["div", "html", "body"]:
-			pass # do nothing
-		elif tag == "img":
-			pass # do nothing
-		elif tag in ["h1", "h2", "h3", "h4", "h5"]:
-			if g_converter_config["ignore empty head tags"]:
-				last_line = self.md[self.md.rfind("\n"):]
-				if last_line.replace("#", "").replace(" ", "") != "":
-					# has text
-					self.md += "\n"
-			else:
-				self.md += "\n"
-		elif tag in ["ol", "ul"]:
-			self.links.pop()
-			self.md += "\n"
-		elif tag == "li":
-			self.md += "\n"	
-		elif tag == "span":
-			last_span = self.spans.pop()
-			if last_span == "backtick_span":
-				self.escape_md_data = True
-				self.md += "`"
-			else:
-				pass # ignoring this span
-		elif tag == "code":
-			self.ensure_on_newline()
-			self.md += "```\n"
-			self.escape_md_data = True
-		elif tag == "br":
-			pass				
-
-		elif tag == "table":
-			if self.nested_table_states == [] or (self.nested_table_states[-1] != "filling_body" and self.nested_table_states[-1] != "ignoring"):
-				html_logger.warn(f"reached </table> in impossible state: {self.nested_table_states}")
-				raise Exception("bug in table parsing.")
-			self.nested_table_states.pop()
-		elif tag == "tbody":
-			pass # don't care
-		elif tag == "td" or tag == "th":
-
-			if self.nested_table_states and self.nested_table_states[-1] == "ignoring":
-				if self.newline_after_td:
-					self.md += "\n"
-					self.newline_after_td = False
-			else:
-				if self.nested_table_states[-1].startswith("filled-th_"):
-					filled_already = int(self.nested_table_states[-1].split("_")[1])
-					self.nested_table_states[-1] = "filled-th_" + str(filled_already+1)
-				self.md += " |"
-		elif tag == "tr":
-			if self.nested_table_states and self.nested_table_states[-1] != "ignoring":
-				if self.nested_table_states[-1].startswith("filled-th_"):
-					filled_already = int(self.nested_table_states[-1].split("_")[1])
-					self.md += "\n" + "---".join(["|"]*(filled_already+1))
-					self.nested_table_states[-1] = "filling_body"
-				else:
-					self.ensure_on_newline()
-		else:
-			html_logger.warning(f"doing nothing after {tag}")
+			if "class" in attr_dict and "tr-caption" in attr_dict["class"]:
+				self.newline_after_td = True
+				if self.image_to_caption is not None:
+					self.caption_position = self.out.position()
+				if self.cell_html is not None:
+					self.cell_html.start_tag("br") # the caption goes under the image
+		elif self.tables:
+			self.close_cell()
+			# the cell's markdown is cut out of the output once it's read. its html is kept alongside
+			self.tables[-1].open_cell = (tag, self.get_starttag_text(), attr_dict, self.out.position(), CellHtml())
+			self.track_cell_html()
+
+	def close_cell(self):
+		"""ends the open cell of the current table, if there is one"""
+		table = self.tables[-1]
+		if table.open_cell is not None:
+			tag, start_tag, attr_dict, position, cell_html = table.open_cell
+			table.open_cell = None
+			table.add_cell(self.out.cut_from(position), tag, start_tag, attr_dict, cell_html.text())
+			self.track_cell_html()
+
+	def track_cell_html(self):
+		"""points cell_html at the open cell of the innermost data table. caption tables in it are read into it too"""
+		self.cell_html = None
+		for table in reversed(self.tables):
+			if not table.caption:
+				if table.open_cell is not None:
+					self.cell_html = table.open_cell[4]
+				return
+
+	def end_cell(self, tag):
+		if self.tables and self.tables[-1].caption:
+			if self.caption_position is not None:
+				# the caption belongs to the table's image. let the target write them together
+				caption = self.out.cut_from(self.caption_position)
+				marker, alt_text, img_path, srcset = self.image_to_caption
+				self.out.replace(marker, self.target.image(alt_text, img_path, caption, srcset))
+				self.caption_position = None
+				self.image_to_caption = None
+			if self.newline_after_td:
+				self.out.write("\n")
+				self.newline_after_td = False
+		elif self.tables:
+			self.close_cell()
 
 	def handle_data(self, data):
-		html_logger.debug(f"Data     :{data} (len: {len(data)})")
+		if self.debug_logging:
+			html_logger.debug(f"Data     :{data} (len: {len(data)})")
+		if self.cell_html is not None:
+			self.cell_html.data(data)
 
-		if data.replace("\n", "").replace("\r", "").replace(" ", "").replace("\t", "") == "":
+		if not data.strip(" \t\r\n"):
 			# only new lines
-			html_logger.debug("only whitespaces. skipping")
+			if self.debug_logging:
+				html_logger.debug("only whitespaces. skipping")
 			return
 
 		if self.escape_md_data:
-			self.md += escape_md(data)
+			self.out.write(escape_md(data))
 		else:
-			self.md += data
+			self.out.write(data)
 
 	def handle_comment(self, data):
-		html_logger.debug(f"Comment  :{data}")
-		html_logger.info(f"ignoring html comment '{data}'")
+		if self.debug_logging:
+			html_logger.debug(f"ignoring html comment '{data}'")
+		self.ignored_markup["html comments"] += 1
 
 	def handle_entityref(self, name):
-		c = chr(name2codepoint[name])
-		html_logger.debug(f"Named ent:{c}")
-		html_logger.warning(f"entity ref handeling unsupported. Ignoring ent: {c}")
+		if self.debug_logging:
+			html_logger.debug(f"entity ref handeling unsupported. Ignoring ent: {chr(name2codepoint[name])}")
+		self.ignored_markup["entity refs"] += 1
 
 	def handle_charref(self, name):
-		if name.startswith('x'):
-			c = chr(int(name[1:], 16))
-		else:
-			c = chr(int(name))
-		html_logger.debug(f"Num ent  :{c}")
-		html_logger.warning(f"char ref handeling unsupported. Ignoring ent: {c}")
+		if self.debug_logging:
+			c = chr(int(name[1:], 16)) if name.startswith('x') else chr(int(name))
+			html_logger.debug(f"char ref handeling unsupported. Ignoring ent: {c}")
+		self.ignored_markup["char refs"] += 1
 
 	def handle_decl(self, data):
-		html_logger.debug(f"Decl     :{data}")
-		html_logger.info(f"ignoring decl '{data}'")
-
-
-def download_img_src(src_url):
-	if "dont download use demo image" in g_converter_config:
-		return g_converter_config["dont download use demo image"]
+		if self.debug_logging:
+			html_logger.debug(f"ignoring decl '{data}'")
+		self.ignored_markup["declarations"] += 1
+
+
+EMPHASIS_MARKS = {"i": "*", "b": "**", "strike": "~~"}
+HEADING_PREFIXES = {"h1": "# ", "h2": "## ", "h3": "### ", "h4": "#### ", "h5": "##### "}
+
+
+def register_tag_handler(tag, start_handler=None, end_handler=None):
+	"""
+		makes HTMLToMarkdownParser call start_handler(parser, tag, attr_dict) on <tag>
+		and end_handler(parser, tag) on </tag>, replacing the current handling of that side.
+		a handler left as None keeps what that side does today.
+		handlers write markdown with parser.out.write(). ie:
+
+			register_tag_handler("figure", lambda parser, tag, attrs: parser.ensure_on_newline())
+
+		when converting with --jobs on Windows/macOS, register at import time of your module
+		so worker processes have the same handlers.
+	"""
+	if start_handler is not None:
+		HTMLToMarkdownParser.start_tag_handlers[tag] = start_handler
+	if end_handler is not None:
+		HTMLToMarkdownParser.end_tag_handlers[tag] = end_handler
+
+
+def _register_default_tag_handlers():
+	P = HTMLToMarkdownParser
+	for tag in EMPHASIS_MARKS:
+		register_tag_handler(tag, P.start_emphasis, P.end_emphasis)
+	for tag in ["u", "sup", "sub", "iframe", "script", "style"]:
+		register_tag_handler(tag, P.passthrough_start, P.passthrough_end)
+	for tag in ["div", "html", "body", "tbody", "thead", "tfoot"]:
+		register_tag_handler(tag, P.ignore_tag, P.ignore_tag)
+	for tag in HEADING_PREFIXES:
+		register_tag_handler(tag, P.start_heading, P.end_heading)
+	for tag in ["ol", "ul"]:
+		register_tag_handler(tag, P.start_list, P.end_list)
+	for tag in ["td", "th"]:
+		register_tag_handler(tag, P.start_cell, P.end_cell)
+	register_tag_handler("p", P.start_p, P.end_p)
+	register_tag_handler("blockquote", P.start_blockquote, P.end_blockquote)
+	register_tag_handler("hr", P.start_hr, P.ignore_tag)
+	register_tag_handler("a", P.start_a, P.end_a)
+	register_tag_handler("img", P.start_img, P.ignore_tag)
+	register_tag_handler("li", P.start_li, P.end_li)
+	register_tag_handler("span", P.start_span, P.end_span)
+	register_tag_handler("code", P.start_code, P.end_code)
+	register_tag_handler("br", P.start_br, P.ignore_tag)
+	register_tag_handler("table", P.start_table, P.end_table)
+	register_tag_handler("tr", P.start_tr, P.end_tr)
+
+
+_register_default_tag_handlers()
+
+
+def log_ignored_html(unknown_tags, ignored_markup):
+	if unknown_tags:
+		counts = ", ".join(f"{tag} ({n})" for tag, n in unknown_tags.most_common())
+		html_logger.warning(f"doing nothing for tags without a handler: {counts}")
+	if ignored_markup:
+		counts = ", ".join(f"{n} {kind}" for kind, n in sorted(ignored_markup.items()))
+		html_logger.info(f"ignored {counts}")
+
+
+def image_paths_for_src(src_url, config=None):
+	"""returns where to save the image at src_url, and the path markdown uses to reference it"""
+	config = g_converter_config if config is None else config
 	img_name = urllib.parse.unquote(src_url[src_url.rfind("/")+1:])
-	converter_logger.debug('img_name:' + img_name)
-	save_name = os.path.join(g_converter_config["image_save_path"], img_name)
-	converter_logger.debug("saving @" + save_name)
-
-	if g_converter_config["ignore downloaded image cache"] or not os.path.isfile(save_name):
-		converter_logger.info(f"downloading '{src_url}'")
-		urllib.request.urlretrieve(src_url, save_name)  # using this instead of requests because it's preinstalled
-	else:
-		converter_logger.info("found image in cache")
-	
-	return os.path.join(g_converter_config["img_path_relative_to_md"], img_name)
+	size = size_of(src_url) if config["image srcset widths"] else None
+	if size and not src_url.endswith("=" + size):
+		# the sizes of an image have the same file name, unless the size is in it (ie '...=w480')
+		stem, ext = os.path.splitext(img_name)
+		img_name = f"{stem}-{size}{ext}"
+	if config["unique image names"]:
+		stem, ext = os.path.splitext(img_name)
+		img_name = f"{stem}-{hashlib.sha1(src_url.encode('utf-8')).hexdigest()[:8]}{ext}"
+	save_name = os.path.join(config["image_save_path"], img_name)
+	return save_name, os.path.join(config["img_path_relative_to_md"], img_name)
+
+
+def get_image_cache_path(config=None):
+	config = g_converter_config if config is None else config
+	return config["image cache path"] or os.path.join(config["image_save_path"], ".image-cache")
+
+
+def make_image_downloader(config=None):
+	config = g_converter_config if config is None else config
+	cache = ImageCache(get_image_cache_path(config), shared=config["shared image cache"])
+	mirror = None
+	if config["image mirror folders"]:
+		index_path = config["image mirror index path"] or os.path.join(get_image_cache_path(config), "mirror-index.json")
+		mirror = ImageMirror(config["image mirror folders"], index_path)
+	return ImageDownloader(workers=config["image download workers"],
+						   per_host=config["image downloads per host"],
+						   retries=config["image download retries"],
+						   timeout=config["image download timeout"],
+						   ignore_cache=config["ignore downloaded image cache"],
+						   cache=cache,
+						   revalidate=config["revalidate image cache"],
+						   mirror=mirror,
+						   offline=config["offline"])
+
+
+def download_image_refs(image_refs, image_downloader, config=None):
+	for src_url in image_refs:
+		image_downloader.submit(src_url, image_paths_for_src(src_url, config)[0])
+
+
+# settings that don't change what a post converts to, so changing them doesn't invalidate the post manifest
+RUN_ONLY_CONFIG_KEYS = {
+	"streaming xml parsing", "fast html tokenizer", "report peak memory", "conversion jobs", "profile report path",
+	"incremental conversion", "post manifest path", "prune deleted posts", "stop after one conversion",
+	"image cache path", "revalidate image cache", "ignore downloaded image cache",
+	"image download workers", "image downloads per host", "image download retries", "image download timeout",
+	"shard", "shard manifest path", "shared image cache",
+	"archive path", "archive format", "archive compression level",
+	"image mirror folders", "image mirror index path", "offline",
+	"checkpoint journal", "checkpoint journal path", "retry queue path", "retry failed",
+	"feed page size", "feed fetch workers", "feed delta sync", "feed state path",
+	"site indexes", "site index path", "post links path",
+}
+
+
+def config_fingerprint(output_md_formatter=None, config=None):
+	"""hash of everything besides the post itself that decides a post's output: settings, formatter, render target and code"""
+	config = g_converter_config if config is None else config
+	# a functools.partial formatter is identified by the function it wraps
+	formatter_func = getattr(output_md_formatter, "func", output_md_formatter)
+	sources = [__file__]
+	modules = ["markdown_tables", "post_links", type(RENDER_TARGETS[config["render target"]]).__module__]
+	if formatter_func is not None:
+		modules.append(formatter_func.__module__)
+	for module in modules:
+		if hasattr(sys.modules.get(module), "__file__") and sys.modules[module].__file__ not in sources:
+			sources.append(sys.modules[module].__file__)
+	code = []
+	for source in sources:
+		with open(source, "rb") as f:
+			code.append(f.read())
+
+	settings = sorted((k, repr(v)) for k, v in config.items() if k not in RUN_ONLY_CONFIG_KEYS)
+	formatter = f"{formatter_func.__module__}.{formatter_func.__qualname__}" if formatter_func else None
+	return content_hash(code, settings, formatter)
+
+
+def get_post_manifest_path(config=None):
+	config = g_converter_config if config is None else config
+	if config["post manifest path"]:
+		return config["post manifest path"]
+	# shards sharing an output folder keep separate manifests, so pruning one doesn't touch the others' posts
+	shard = config["shard"]
+	name = f".post-manifest-shard-{shard[0]}-of-{shard[1]}.json" if shard else ".post-manifest.json"
+	return os.path.join(config["md_file_save_path"], name)
+
+
+def _output_file_path(config, path_key, name, ext):
+	"""config[path_key], or name in md_file_save_path. shards sharing an output folder each get their own"""
+	if config[path_key]:
+		return config[path_key]
+	shard = config["shard"]
+	return os.path.join(config["md_file_save_path"], f"{name}-shard-{shard[0]}-of-{shard[1]}{ext}" if shard else name + ext)
+
+
+def get_checkpoint_journal_path(config=None):
+	config = g_converter_config if config is None else config
+	return _output_file_path(config, "checkpoint journal path", ".checkpoint-journal", ".jsonl")
+
+
+def get_retry_queue_path(config=None):
+	config = g_converter_config if config is None else config
+	return _output_file_path(config, "retry queue path", "retry-queue", ".jsonl")
+
+
+def get_feed_state_path(config=None):
+	config = g_converter_config if config is None else config
+	return _output_file_path(config, "feed state path", ".feed-state", ".json")
+
+
+def get_post_links_path(config=None):
+	config = g_converter_config if config is None else config
+	return _output_file_path(config, "post links path", ".post-links", ".json")
+
+
+def get_site_index_path(config=None):
+	config = g_converter_config if config is None else config
+	path = config["site index path"] or os.path.join(config["md_file_save_path"], "site-index")
+	shard = config["shard"]
+	return f"{path}-shard-{shard[0]}-of-{shard[1]}" if shard else path
+
+
+def get_shard_manifest_path(config=None):
+	config = g_converter_config if config is None else config
+	index, count = config["shard"]
+	return config["shard manifest path"] or \
+		os.path.join(config["md_file_save_path"], f".shard-{index}-of-{count}.json")
+
+
+class ConversionRun:
+	"""
+		state shared by all the posts converted in one run. finish() once done converting.
+
+		settings are read from config, g_converter_config by default. runs converting several
+		blogs can share one image_downloader (and its cache) and one process_pool, which
+		the run then leaves open when finishing.
+
+		a run over a whole export (see start_checkpoints()) journals what it finished and queues
+		what failed, so it can be resumed and its failures retried.
+	"""
+	def __init__(self, output_md_formatter=None, config=None, image_downloader=None, process_pool=None):
+		self.config = config = g_converter_config if config is None else config
+		self.output_md_formatter = output_md_formatter
+		self.owns_image_downloader = image_downloader is None
+		self.image_downloader = make_image_downloader(config) if image_downloader is None else image_downloader
+		self.process_pool = process_pool
+		self.unknown_tags = collections.Counter()
+		self.ignored_markup = collections.Counter()
+		self.converted_posts = 0
+		self.profile = ConversionProfile() if config["profile report path"] else None
+		self.shard_manifest = None
+		if config["shard"]:
+			self.shard_manifest = ShardManifest(config["shard"], config["md_file_save_path"], config["image_save_path"])
+
+		self.comment_threads = CommentThreads(config["comments"]) if config["comments"] else None
+		self.site_indexes = SiteIndexes(get_site_index_path(config), config["md_file_save_path"]) if config["site indexes"] else None
+		self.post_links = None
+		self.deferred_links = {} # output path -> (title, links to the blog's posts that weren't rewritten while converting)
+
+		self.source = None
+		self.partial_source = False
+		self.journal = None
+		self.retry_queue = None
+		self.requested_images = set() # urls this run downloaded or looked up
+		self.retry_posts = None # ids of the posts a retry run converts
+		self.resumed_posts = 0
+		self.failed_posts = 0
+		self.failed_comments = 0
+		self.comment_failed_posts = set() # posts to convert again because one of their comments failed
+		self.failed_seconds = 0.0 # spent on posts that then failed
+
+		self.post_manifest = None
+		self.saw_every_post = False # set once every entry in the export was looked at
+		self.unchanged_posts = 0
+		self._post_versions = {} # post id -> (updated, content hash) of posts being converted
+		if config["incremental conversion"]:
+			self.post_manifest = PostManifest(get_post_manifest_path(config))
+			self.config_fingerprint = config_fingerprint(output_md_formatter, config)
+
+	def skip_unchanged(self, post_xml, post_data, content_html):
+		"""returns True if the post is the same as when it was last converted, so doesn't need converting"""
+		if self.post_manifest is None:
+			return False
+		updated = post_xml.find("{http://www.w3.org/2005/Atom}updated")
+		updated = updated.text if updated is not None else None
+		post_hash = content_hash(post_data["title"], post_data["author"], post_data["published"].isoformat(),
+								 post_data["categories"], content_html)
+		if self.post_links is not None: # a post is converted again when a post it links to moved
+			post_hash = content_hash(post_hash, self.post_links.resolve_html(content_html))
+		# a post the site indexes don't have yet is converted again to index it
+		if self.post_manifest.is_unchanged(post_data["blogger_id"], updated, post_hash, self.config_fingerprint) \
+				and (self.site_indexes is None or self.site_indexes.has(post_data["blogger_id"])):
+			self.unchanged_posts += 1
+			output_path = self.post_manifest.posts[post_data["blogger_id"]]["output_path"]
+			if self.shard_manifest is not None:
+				self.shard_manifest.post_written(post_data["blogger_id"], post_data["title"], output_path)
+			if self.comment_threads is not None:
+				self.comment_threads.post_written(post_data["blogger_id"], output_path)
+			return True
+		self._post_versions[post_data["blogger_id"]] = (updated, post_hash)
+		return False
+
+	def start_checkpoints(self, source):
+		"""
+			opens the checkpoint journal of converting source (an export's path or a FeedSource),
+			resuming the last run if it was interrupted, and the retry queue. with "retry failed",
+			the run is limited to the queue and the queued images are downloaded again.
+		"""
+		config = self.config
+		retrying = config["retry failed"]
+		self.source = source
+		# a delta sync of a feed doesn't have the posts that didn't change
+		self.partial_source = isinstance(source, FeedSource) and source.updated_min is not None
+		if config["checkpoint journal"] and not retrying:
+			if isinstance(source, FeedSource):
+				source_key = (source.url, source.updated_min)
+			else:
+				stat = os.stat(source)
+				source_key = (os.path.abspath(source), stat.st_size, stat.st_mtime)
+			run_key = content_hash(config_fingerprint(self.output_md_formatter, config), *source_key)
+			self.journal = CheckpointJournal(get_checkpoint_journal_path(config), run_key)
+		# failures stay queued until a run gets past them, ie a post an incremental run skips keeps its failed images
+		self.retry_queue = RetryQueue(get_retry_queue_path(config))
+		if retrying:
+			self.retry_posts = self.retry_queue.keys("post")
+			images = [(key, entry) for (kind, key), entry in self.retry_queue.entries.items() if kind == "image"]
+			converter_logger.info(f"retrying {len(self.retry_posts)} posts and {len(images)} images")
+			for url, entry in images:
+				self.requested_images.add(url)
+				self.image_downloader.submit(url, entry["path"])
+
+	def start_post_links(self, source):
+		"""
+			with "rewrite internal links", indexes where links to the blog's posts point. an export
+			is read through once before converting. a feed isn't fetched twice: its posts are
+			indexed as they're read, on top of the posts earlier runs saw, and links to posts
+			further on are fixed up once done
+		"""
+		if not self.config["rewrite internal links"]:
+			return
+		if isinstance(source, FeedSource):
+			self.post_links = PostLinkIndex.load(get_post_links_path(self.config))
+		else:
+			with self.phase("xml parsing"):
+				self.post_links = build_post_link_index(source, self.config)
+			converter_logger.info(f"indexed the links of {len(self.post_links.targets)} posts")
 
+	def add_post_link(self, entry, post_data):
+		if self.post_links is not None and not self.post_links.complete:
+			target = RENDER_TARGETS[self.config["render target"]]
+			self.post_links.add(entry_post_url(entry), target.post_link(target.post_file_name(post_data)))
 
-def escape_md(s):
-	return s.replace("#", "\\#").replace("_", "\\_").replace("{", "\\{").replace("}", "\\}")\
-			.replace("[", "\\[").replace("]", "\\]").replace("-", "\\-").replace("!", "\\!")\
-			.replace("(", "\\(").replace(")", "\\)").replace("+", "\\+").replace("*", "\\*")
+	def in_shard(self, entry):
+		"""whether entry is in the slice of posts this run converts"""
+		shard = self.config["shard"]
+		return shard is None or shard_of(entry.find("{http://www.w3.org/2005/Atom}id").text, shard[1]) == shard[0]
 
+	def in_scope(self, entry):
+		"""whether this run converts the post entry: it's in the run's shard, and in the retry queue when retrying"""
+		return self.in_shard(entry) and (self.retry_posts is None or entry.find("{http://www.w3.org/2005/Atom}id").text in self.retry_posts)
 
-def convert_html_to_md(html):
-	parser = HTMLToMarkdownParser()
-	parser.feed(html)
-	return parser.md
+	def skip_done(self, post_data):
+		"""
+			returns True if the interrupted run this one resumes already finished the post (or failed on it).
+			the post's images it didn't get to are queued again
+		"""
+		if self.journal is None or not self.journal.resumed:
+			return False
+		post_id = post_data["blogger_id"]
+		record = self.journal.posts.get(post_id)
+		if record is None:
+			if post_id in self.journal.failed:
+				if self.post_manifest is not None:
+					self.post_manifest.keep(post_id) # it's queued to retry, not deleted
+				return True
+			return False
+		if self.site_indexes is not None:
+			if record.get("index") is None:
+				return False # the interrupted run didn't index it
+			self.site_indexes.add(post_id, record["index"])
+		self.resumed_posts += 1
+		image_refs = record.get("images", [])
+		self.download_images(image_refs)
+		if self.shard_manifest is not None:
+			self.shard_manifest.post_written(post_id, post_data["title"], record["output"])
+			for src_url in image_refs:
+				self.shard_manifest.image_referenced(src_url, image_paths_for_src(src_url, self.config)[0])
+		if self.comment_threads is not None:
+			self.comment_threads.post_written(post_id, record["output"])
+		if self.post_manifest is not None:
+			if record.get("content_hash"):
+				self.post_manifest.record(post_id, record["updated"], record["content_hash"], self.config_fingerprint, record["output"])
+			else:
+				# converted by a run that wasn't incremental, so there's nothing to record. it still isn't deleted
+				self.post_manifest.keep(post_id)
+		return True
+
+	def post_failed(self, post_data, reason):
+		self.failed_posts += 1
+		if self.journal is not None:
+			self.journal.post_failed(post_data["blogger_id"])
+		if self.site_indexes is not None:
+			self.site_indexes.has(post_data["blogger_id"]) # its last conversion stays indexed
+		if self.shard_manifest is not None:
+			self.shard_manifest.post_failed(post_data["blogger_id"], reason)
+		if self.retry_queue is not None:
+			self.retry_queue.add("post", post_data["blogger_id"], reason, title=post_data["title"])
+
+	def entry_failed(self, entry, error, seconds, kind="post"):
+		"""
+			an entry's conversion raised error after seconds. it's logged and queued to retry, and
+			the run goes on. for a comment, its post is queued, which brings back its comments
+		"""
+		entry_id = entry.find("{http://www.w3.org/2005/Atom}id")
+		title = entry.find("{http://www.w3.org/2005/Atom}title")
+		post_data = {"blogger_id": entry_id.text if entry_id is not None else None, "title": title.text if title is not None else None}
+		if kind == "comment":
+			reply_to = entry.find(f"{THREAD}in-reply-to")
+			post_id = reply_to.attrib.get("ref") if reply_to is not None else None
+			self.conversion_failed(post_data, error, seconds, queue=False)
+			self.failed_comments += 1
+			if post_id is not None and self.retry_queue is not None:
+				self.comment_failed_posts.add(post_id)
+				self.retry_queue.add("post", post_id, f"its comment '{post_data['blogger_id']}' failed")
+		else:
+			self.conversion_failed(post_data, error, seconds)
+
+	def conversion_failed(self, post_data, error, seconds, queue=True):
+		reason = f"{type(error).__name__}: {error}"
+		converter_logger.error(f"skipping '{post_data['title'] or post_data['blogger_id']}' because exception '{reason}'")
+		converter_logger.debug("", exc_info=error)
+		self.failed_seconds += seconds
+		if queue:
+			self.post_failed(post_data, reason)
+
+	def post_saved(self, post_data, output_path):
+		if post_data.get("unresolved_links"):
+			self.deferred_links[output_path] = (post_data["title"], post_data["unresolved_links"])
+		if self.shard_manifest is not None:
+			self.shard_manifest.post_written(post_data["blogger_id"], post_data["title"], output_path)
+		if self.comment_threads is not None:
+			self.comment_threads.post_written(post_data["blogger_id"], output_path)
+		updated, post_hash = None, None
+		if self.post_manifest is not None:
+			updated, post_hash = self._post_versions.pop(post_data["blogger_id"])
+			self.post_manifest.record(post_data["blogger_id"], updated, post_hash, self.config_fingerprint, output_path)
+		index_record = None
+		if self.site_indexes is not None:
+			index_record = self.site_indexes.make_record(post_data, output_path, post_data["index"])
+			self.site_indexes.add(post_data["blogger_id"], index_record)
+		if self.journal is not None:
+			self.journal.post_done(post_data["blogger_id"], output=output_path, updated=updated, content_hash=post_hash,
+								   images=post_data["image_refs"], index=index_record)
+		if self.retry_queue is not None and post_data["blogger_id"] not in self.comment_failed_posts:
+			self.retry_queue.resolve("post", post_data["blogger_id"])
+
+	def download_images(self, image_refs):
+		"""queues the images' downloads. images the resumed run downloaded already aren't looked at again"""
+		for src_url in image_refs:
+			self.requested_images.add(src_url)
+			save_path = image_paths_for_src(src_url, self.config)[0]
+			if self.journal is None or not self.owns_image_downloader:
+				self.image_downloader.submit(src_url, save_path)
+			elif src_url not in self.journal.images or not os.path.isfile(save_path):
+				future = self.image_downloader.submit(src_url, save_path)
+				future.add_done_callback(lambda f, url=src_url: f.result() is not None and self.journal.image_done(url))
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.finish()
+
+	def phase(self, name):
+		"""times the block as part of phase name when profiling"""
+		if self.profile is None:
+			return contextlib.nullcontext()
+		return self.profile.phase(name)
+
+	def timed_entries(self, entries):
+		if self.profile is None:
+			return entries
+		return self.profile.timed_iter(entries, "xml parsing")
+
+	def add_comment(self, comment_xml):
+		"""converts a comment and files it under its post, to be written by finish()"""
+		comment_data, content_html = extract_comment_data(comment_xml)
+		shard = self.config["shard"]
+		if shard is not None and comment_data["post_id"] and shard_of(comment_data["post_id"], shard[1]) != shard[0]:
+			return # the post's shard has it
+		if self.retry_posts is not None and comment_data["post_id"] not in self.retry_posts:
+			return # its post isn't retried, it has its comments
+		converted = convert_post_html(content_html, config=self.config, post_links=self.post_links)
+		self.download_images(converted["image_refs"])
+		self.unknown_tags.update(converted["unknown_tags"])
+		self.ignored_markup.update(converted["ignored_markup"])
+		self.comment_threads.add_comment(comment_data, converted["md"])
+
+	def add_converted_html(self, post_data, converted):
+		self.converted_posts += 1
+		self.download_images(converted["image_refs"])
+		if self.shard_manifest is not None:
+			for src_url in converted["image_refs"]:
+				self.shard_manifest.image_referenced(src_url, image_paths_for_src(src_url, self.config)[0])
+		self.unknown_tags.update(converted["unknown_tags"])
+		self.ignored_markup.update(converted["ignored_markup"])
+		if self.profile is not None:
+			self.profile.add_post(post_data, converted["html bytes"], len(converted["md"].encode("utf-8")),
+								  converted["seconds"], converted["tag_counts"], converted["tag_seconds"])
+
+	def finish(self):
+		if self.comment_threads is not None:
+			with self.phase("file writes"):
+				self.comment_threads.write()
+		if self.post_links is not None:
+			with self.phase("file writes"):
+				self.fix_up_links()
+		if self.owns_image_downloader:
+			with self.phase("image io wait"):
+				self.image_downloader.close()
+		log_ignored_html(self.unknown_tags, self.ignored_markup)
+		if self.retry_queue is not None:
+			self.finish_checkpoints()
+
+		if self.post_manifest is not None:
+			converter_logger.info(f"{self.unchanged_posts} posts unchanged since the last run")
+			if self.config["prune deleted posts"] and self.saw_every_post and not self.partial_source \
+					and self.retry_posts is None:
+				pruned = self.post_manifest.prune_unseen()
+				converter_logger.info(f"pruned {len(pruned)} posts no longer in the export")
+			self.post_manifest.save()
+		if self.site_indexes is not None:
+			if self.saw_every_post and not self.partial_source and self.retry_posts is None:
+				self.site_indexes.prune_unseen()
+			with self.phase("file writes"):
+				self.site_indexes.save()
+		if self.shard_manifest is not None:
+			self.shard_manifest.images_failed(self.image_downloader.failed)
+			self.shard_manifest.save(get_shard_manifest_path(self.config))
+			converter_logger.info(f"shard {self.shard_manifest.shard[0]}/{self.shard_manifest.shard[1]}: "
+								  f"{len(self.shard_manifest.posts)} posts, wrote '{get_shard_manifest_path(self.config)}'")
+		if self.profile is not None:
+			image_stats = dict(self.image_downloader.stats, **{"fetch latency": self.image_downloader.fetch_latency()})
+			self.profile.write(self.config["profile report path"], image_stats)
+			converter_logger.info(f"wrote profile report to '{self.config['profile report path']}'")
+
+
+	def fix_up_links(self):
+		"""
+			rewrites the links to the blog's posts that weren't in the index while converting, now
+			that it has every post. links to posts that aren't in it still are reported
+		"""
+		missing = collections.defaultdict(list) # link -> titles of the posts with it
+		fixed = 0
+		for output_path, (title, hrefs) in self.deferred_links.items():
+			targets = {}
+			for href in set(hrefs):
+				target = self.post_links.resolve(href)
+				if target is not None:
+					targets[href] = target
+				elif self.post_links.is_internal(href):
+					missing[href].append(title)
+			if targets and output_path:
+				with open(output_path, "r", encoding="utf-8") as f:
+					md = f.read()
+				for href, target in targets.items():
+					md = md.replace(f"]({href})", f"]({target})")
+				write_text_if_changed(output_path, md)
+				fixed += len(targets)
+		self.post_links.save(get_post_links_path(self.config))
+		if fixed:
+			converter_logger.info(f"fixed up {fixed} links to posts converted after the posts linking to them")
+		for href, titles in list(missing.items())[:MAX_MISSING_LINK_WARNINGS]:
+			converter_logger.warning(f"'{href}' links to a post that isn't in the export, from '{titles[0]}'"
+									 + (f" and {len(titles) - 1} more posts" if len(titles) > 1 else ""))
+		if len(missing) > MAX_MISSING_LINK_WARNINGS:
+			converter_logger.warning(f"... and {len(missing) - MAX_MISSING_LINK_WARNINGS} more links to posts that aren't in the export")
+
+	def finish_checkpoints(self):
+		"""queues the images that failed, closes the journal and queue, and sums up what failed"""
+		# a downloader shared with other runs may still be downloading: queue_shared_image_failures() once it's closed
+		failed_images = self.queue_failed_images() if self.owns_image_downloader else {}
+		if self.journal is not None:
+			self.journal.close(complete=self.saw_every_post)
+		source = self.source
+		if isinstance(source, FeedSource) and self.saw_every_post and not self.config["retry failed"] and source.latest_updated:
+			save_feed_state(get_feed_state_path(self.config), source.url, source.latest_updated)
+		self.retry_queue.close()
+
+		lost_seconds = self.failed_seconds + self.image_downloader.stats["retry seconds"]
+		resumed = f"{self.resumed_posts} done by the interrupted run, " if self.resumed_posts else ""
+		failed_comments = f", {self.failed_comments} comments" if self.failed_comments else ""
+		converter_logger.info(f"{self.converted_posts} posts converted, {resumed}{self.failed_posts} failed{failed_comments}, "
+							  f"{len(failed_images)} images failed. {lost_seconds:.1f}s lost to failures and retries")
+		if self.retry_queue.entries:
+			converter_logger.warning(f"{len(self.retry_queue.entries)} failures queued in '{self.retry_queue.path}'. "
+									 "convert them again with --retry-failed")
+
+
+	def queue_failed_images(self):
+		"""takes the images this run got off the retry queue and queues the ones that failed. returns those, url -> reason"""
+		failed_images = {url: reason for url, reason in self.image_downloader.failed.items() if url in self.requested_images}
+		for (kind, url), entry in list(self.retry_queue.entries.items()):
+			if kind == "image" and url in self.requested_images and url not in failed_images:
+				self.retry_queue.resolve("image", url)
+		for url, reason in failed_images.items():
+			self.retry_queue.add("image", url, reason, path=image_paths_for_src(url, self.config)[0])
+		return failed_images
+
+	def queue_shared_image_failures(self):
+		"""queue_failed_images() of a finished run that shared its image downloader, once that's closed"""
+		if self.retry_queue is None:
+			return {}
+		self.retry_queue = RetryQueue(self.retry_queue.path)
+		failed_images = self.queue_failed_images()
+		self.retry_queue.close()
+		if failed_images:
+			converter_logger.warning(f"{len(failed_images)} images failed, queued in '{self.retry_queue.path}'. "
+									 "download them again with --retry-failed")
+		return failed_images
+
+
+def download_img_src(src_url, config=None):
+	"""downloads a single image right away. returns the path markdown uses to reference it"""
+	config = g_converter_config if config is None else config
+	if "dont download use demo image" in config:
+		return config["dont download use demo image"]
+	with make_image_downloader(config) as image_downloader:
+		download_image_refs([src_url], image_downloader, config)
+	return image_paths_for_src(src_url, config)[1]
+
+
+MD_ESCAPES = str.maketrans({c: "\\" + c for c in "#_{}[]-!()+*"})
 
 
-def convert_post_to_md(post_xml, output_md_formatter=None):
+def escape_md(s):
+	return s.translate(MD_ESCAPES)
+
+
+def convert_html_to_md(html, config=None):
+	return convert_post_html(html, config=config)["md"]
+
+
+def convert_post_html(html, profile=False, config=None, post_links=None):
+	"""
+		converts a post's html. returns its markdown and everything the run needs to know about it.
+		post_links is the PostLinkIndex links to the blog's posts are rewritten with
+	"""
+	start = time.perf_counter()
+	parser = HTMLToMarkdownParser(config)
+	parser.post_links = post_links
+	if profile:
+		parser.enable_tag_profiling()
+	if not parser.config["fast html tokenizer"] or not fast_feed(parser, html):
+		parser.feed(html)
+	parser.finish()
+	converted = {
+		"md": parser.md,
+		"image_refs": parser.image_refs,
+		"unknown_tags": parser.unknown_tags,
+		"ignored_markup": parser.ignored_markup,
+		"unresolved_links": parser.unresolved_links,
+	}
+	if profile:
+		converted["seconds"] = time.perf_counter() - start
+		converted["html bytes"] = len(html.encode("utf-8"))
+		converted["tag_counts"] = parser.tag_counts
+		converted["tag_seconds"] = parser.tag_seconds
+	return converted
+
+
+def extract_post_data(post_xml):
+	"""returns the post's metadata and its html content. metadata that's missing is left as None"""
 	post_data = {}
 	post_data["blogger_id"] = post_xml.find("{http://www.w3.org/2005/Atom}id").text
 	post_data["author"] = post_xml.find("{http://www.w3.org/2005/Atom}author").find("{http://www.w3.org/2005/Atom}name").text
@@ -422,22 +1440,83 @@ def convert_post_to_md(post_xml, output_md_formatter=None):
 	post_data["categories"] = [c.attrib["term"] for c in post_xml.findall("{http://www.w3.org/2005/Atom}category") \
 									if "http://schemas.google.com/blogger/2008/kind#post" != c.attrib["term"]]
 
+	return post_data, post_xml.find("{http://www.w3.org/2005/Atom}content").text
+
+
+def ensure_complete_post_data(post_data):
 	# Ensure have everything. Otherweise can't proceeed because will error later
 	for k,v in post_data.items():
 		if v == None:
 			converter_logger.error(f"skipping post '{post_data['title'] or post_data['blogger_id']}' because don't have post's '{k}' element")
-			return
+			return False
+	return True
+
+
+def render_post_md(post_data, config=None):
+	"""returns where the post is saved, and the file's text, as the config's render target lays them out"""
+	config = g_converter_config if config is None else config
+	target = RENDER_TARGETS[config["render target"]]
+	save_path = os.path.join(config["md_file_save_path"], target.post_file_name(post_data))
+	return save_path, target.front_matter(post_data) + post_data["md"]
 
-	converter_logger.info(f"converting '{post_data['title']}'")
-	post_data["md"] = convert_html_to_md(post_xml.find("{http://www.w3.org/2005/Atom}content").text)
 
+def save_post_md(post_data, output_md_formatter=None, config=None):
+	"""saves the post with output_md_formatter, or as plain markdown. returns the saved file's path if known"""
 	if output_md_formatter:
-		output_md_formatter(post_data)
+		return output_md_formatter(post_data)
+
+	save_path, md = render_post_md(post_data, config)
+	converter_logger.log(HAPPY_LOG,f"saving '...{os.path.basename(save_path)}'")
+	write_text_if_changed(save_path, md)
+	return save_path
+
+
+def convert_post_to_md(post_xml, output_md_formatter=None, run=None):
+	"""
+		converts and saves one post as part of run. without a run,
+		the post's images are downloaded before returning.
+	"""
+	post_data, content_html = extract_post_data(post_xml)
+	if not ensure_complete_post_data(post_data):
+		if run is not None:
+			run.post_failed(post_data, "incomplete post data")
+		return
+	if run is not None:
+		run.add_post_link(post_xml, post_data)
+		if run.skip_done(post_data) or run.skip_unchanged(post_xml, post_data, content_html):
+			return
+
+	converter_logger.info(f"converting '{post_data['title']}'")
+	if run is None:
+		with ConversionRun(output_md_formatter) as run:
+			_convert_and_save_post(post_data, content_html, output_md_formatter, run)
 	else:
-		md_file_name = urllib.parse.quote('-'.join(post_data['title'].split(' ')), safe='') + ".md"
-		save_path = os.path.join(g_converter_config["md_file_save_path"], md_file_name)
-		converter_logger.log(HAPPY_LOG,f"saving '...{md_file_name}'")
-		open(save_path, "w", encoding="utf-8").write(post_data["md"])
+		_convert_and_save_post(post_data, content_html, output_md_formatter, run)
+
+
+def _convert_post_for_run(html, profile, config, post_links=None):
+	"""convert_post_html() of a post, with what the run's site indexes need of it"""
+	converted = convert_post_html(html, profile, config, post_links)
+	if config["site indexes"]:
+		converted["index"] = index_fields(converted["md"])
+	return converted
+
+
+def _convert_and_save_post(post_data, content_html, output_md_formatter, run):
+	converted = _convert_post_for_run(content_html, run.profile is not None, run.config, run.post_links)
+	_save_converted_post(post_data, converted, output_md_formatter, run)
+
+
+def _save_converted_post(post_data, converted, output_md_formatter, run):
+	post_data["md"] = converted["md"]
+	post_data["image_refs"] = converted["image_refs"]
+	if "index" in converted:
+		post_data["index"] = converted["index"]
+	post_data["unresolved_links"] = converted["unresolved_links"]
+	run.add_converted_html(post_data, converted)
+	with run.phase("file writes"):
+		output_path = save_post_md(post_data, output_md_formatter, run.config)
+	run.post_saved(post_data, output_path)
 	
 
 def extract_entry_kind(e):
@@ -455,41 +1534,533 @@ def ensure_have_folder(f):
 		os.makedirs(f)
 
 
-def convert_posts_to_md(xml_path, output_md_formatter=None):
-	ensure_have_folder(g_converter_config["md_file_save_path"])
-	ensure_have_folder(g_converter_config["image_save_path"])
+def check_xml_generator(xml_gen):
+	if xml_gen is None:
+		converter_logger.warning("Expected 'Blogger' XML generator. Didn't find a generator element")
+		return
 
-	root = ET.parse(xml_path).getroot()
-	# root is currently point at the 'feed' elemtn
-
-	xml_gen = root.find('{http://www.w3.org/2005/Atom}generator')
 	if xml_gen.text != "Blogger":
 		converter_logger.warning(f"Expected 'Blogger' XML generator. Found generator {xml_gen.text}")
 
-	if xml_gen.attrib["version"] != "7.00":
-		converter_logger.warning(f"Only tested on Blogger XML generator version 7.00. Found version: {xml_gen.attrib['version']}")
+	if xml_gen.attrib.get("version") != "7.00":
+		converter_logger.warning(f"Only tested on Blogger XML generator version 7.00. Found version: {xml_gen.attrib.get('version')}")
+
+
+def build_post_link_index(xml_path, config=None):
+	"""a complete PostLinkIndex of the export's posts, read without converting them"""
+	config = g_converter_config if config is None else config
+	target = RENDER_TARGETS[config["render target"]]
+	post_links = PostLinkIndex(complete=True)
+	for entry in iter_blogger_entries(xml_path, config):
+		if extract_entry_kind(entry) != "post":
+			continue
+		url = entry_post_url(entry)
+		if url is None:
+			continue # a draft
+		post_data, _ = extract_post_data(entry)
+		if None not in post_data.values():
+			post_links.add(url, target.post_link(target.post_file_name(post_data)))
+	return post_links
+
+
+def open_feed_source(url, config=None):
+	"""a FeedSource of the feed at url. with delta sync, of the entries updated since the last sync"""
+	config = g_converter_config if config is None else config
+	updated_min = None
+	if config["feed delta sync"] and not config["retry failed"]: # failures to retry can be older
+		updated_min = read_feed_state(get_feed_state_path(config), url)
+	return FeedSource(url, config["feed page size"], config["feed fetch workers"], updated_min,
+					  config["image download timeout"], config["image download retries"])
+
+
+def iter_blogger_entries(xml_path, config=None):
+	"""
+		yields the feed's <entry> elements in document order. xml_path can also be a blog's
+		feed url, or a FeedSource.
+
+		when streaming, each entry is yielded as soon as its closing tag is parsed and is
+		freed once the caller asks for the next one, so only one entry is in memory at a time.
+		callers must not hold on to an entry after moving to the next.
+	"""
+	config = g_converter_config if config is None else config
+	if is_feed_url(xml_path):
+		xml_path = FeedSource(xml_path, config["feed page size"], config["feed fetch workers"])
+	if isinstance(xml_path, FeedSource):
+		for entry in xml_path.entries():
+			yield entry
+			entry.clear()
+		return
+	if not config["streaming xml parsing"]:
+		root = ET.parse(xml_path).getroot()
+		# root is currently point at the 'feed' elemtn
+		check_xml_generator(root.find("{http://www.w3.org/2005/Atom}generator"))
+		yield from root.findall("{http://www.w3.org/2005/Atom}entry")
+		return
+
+	feed = None
+	depth = 0
+	found_generator = False
+	for event, elem in ET.iterparse(xml_path, events=("start", "end")):
+		if event == "start":
+			if feed is None:
+				feed = elem
+			depth += 1
+			continue
+
+		depth -= 1
+		if depth != 1:
+			continue # only direct children of the feed are interesting
+
+		if elem.tag == "{http://www.w3.org/2005/Atom}generator":
+			found_generator = True
+			check_xml_generator(elem)
+		elif elem.tag == "{http://www.w3.org/2005/Atom}entry":
+			yield elem
+
+		# done with this child of the feed. drop it so the tree never grows
+		elem.clear()
+		feed.remove(elem)
+
+	if not found_generator:
+		check_xml_generator(None)
+
+
+def get_peak_memory_bytes():
+	"""returns the peak resident set size of this process, or None if the platform can't tell"""
+	if resource is None:
+		return None
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# macOS reports bytes, everyone else kilobytes
+	return peak if sys.platform == "darwin" else peak * 1024
+
+
+def report_peak_memory():
+	peak = get_peak_memory_bytes()
+	if peak is None:
+		converter_logger.info("peak memory reporting isn't supported on this platform")
+	else:
+		converter_logger.info(f"peak memory: {peak / (1024 * 1024):.1f} MiB")
+
+
+class _LogRecordCollector(logging.Handler):
+	"""keeps a conversion worker's log records so the parent process can emit them in post order"""
+	def __init__(self, level):
+		logging.Handler.__init__(self, level)
+		self.records = []
+
+	def emit(self, record):
+		# flatten into a plain message so the record survives pickling back to the parent
+		record.msg = record.getMessage()
+		record.args = None
+		record.exc_info = None
+		self.records.append(record)
+
+
+_g_worker_log_collector = None
+_g_worker_post_links = None
+
+
+def _init_conversion_worker(config, log_level, post_links=None):
+	global _g_worker_log_collector, _g_worker_post_links
+	_g_worker_post_links = post_links
+	# with the spawn start method (Windows, macOS) workers don't inherit the parent's config changes
+	g_converter_config.clear()
+	g_converter_config.update(config)
+
+	_g_worker_log_collector = _LogRecordCollector(log_level)
+	for logger in [html_logger, converter_logger]:
+		logger.removeHandler(ch)
+		logger.addHandler(_g_worker_log_collector)
+
+
+def _convert_html_in_worker(html, profile, config):
+	_g_worker_log_collector.records = []
+	start = time.perf_counter()
+	try:
+		return _convert_post_for_run(html, profile, config, _g_worker_post_links), _g_worker_log_collector.records, None
+	except Exception as e:
+		e.seconds = time.perf_counter() - start # lost to the failure
+		return None, _g_worker_log_collector.records, e
 
-	for entry in root.findall("{http://www.w3.org/2005/Atom}entry"):
-		if "post" == extract_entry_kind(entry):
+
+def _finish_parallel_post(post_data, future, output_md_formatter, run):
+	"""does in the parent, in post order, everything convert_post_to_md does around the html conversion"""
+	if future is None:
+		ensure_complete_post_data(post_data) # logs why the post is skipped
+		run.post_failed(post_data, "incomplete post data")
+		return
+
+	converter_logger.info(f"converting '{post_data['title']}'")
+	converted, log_records, error = future.result()
+	for record in log_records:
+		logging.getLogger(record.name).handle(record)
+	if error is not None:
+		raise error
+
+	_save_converted_post(post_data, converted, output_md_formatter, run)
+
+
+def make_conversion_pool(jobs, config=None, post_links=None):
+	"""
+		process pool converting posts' html. can be shared by runs with different configs.
+		post_links is sent to the workers once, a shared pool's runs fix up their links afterwards
+	"""
+	config = g_converter_config if config is None else config
+	return concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=_init_conversion_worker,
+												  initargs=(dict(config), ch.level, post_links))
+
+
+def _convert_posts_in_parallel(xml_path, output_md_formatter, run, jobs):
+	"""
+		converts posts' html on a process pool. entries are still read (and freed) one at a time
+		and only a bounded window of posts is in flight, so memory stays flat.
+		results are consumed in submission order, which keeps output and logs deterministic.
+	"""
+	max_in_flight = jobs * 4
+	in_flight = collections.deque()
+
+	def finish_oldest():
+		post_data, future = in_flight.popleft()
+		start = time.perf_counter()
+		try:
+			_finish_parallel_post(post_data, future, output_md_formatter, run)
+		except concurrent.futures.BrokenExecutor:
+			raise # every post after it would fail too. the journal resumes the run
+		except Exception as e:
+			run.conversion_failed(post_data, e, time.perf_counter() - start + getattr(e, "seconds", 0))
+
+	with contextlib.ExitStack() as stack:
+		pool = run.process_pool
+		if pool is None:
+			pool = stack.enter_context(make_conversion_pool(jobs, run.config, run.post_links))
+		for entry in run.timed_entries(iter_blogger_entries(xml_path, run.config)):
+			start = time.perf_counter()
+			kind = None
 			try:
-				convert_post_to_md(entry, output_md_formatter)
-			except NotImplementedError as e:
-				converter_logger.error(f"skipping '{entry.find('{http://www.w3.org/2005/Atom}title').text or entry.find('{http://www.w3.org/2005/Atom}id').text}' because exception '{str(e)}'")
-			
-			if g_converter_config["stop after one conversion"]:
-				converter_logger.info("stopping after one conversion")
-				return
+				kind = extract_entry_kind(entry)
+				if kind == "comment" and run.comment_threads is not None:
+					run.add_comment(entry)
+				if "post" != kind or not run.in_scope(entry):
+					continue
+				post_data, content_html = extract_post_data(entry)
+				future = None
+				if None not in post_data.values():
+					run.add_post_link(entry, post_data)
+					if run.skip_done(post_data) or run.skip_unchanged(entry, post_data, content_html):
+						continue
+					future = pool.submit(_convert_html_in_worker, content_html, run.profile is not None, run.config)
+			except Exception as e:
+				run.entry_failed(entry, e, time.perf_counter() - start, kind)
+				continue
+			in_flight.append((post_data, future))
+
+			while len(in_flight) >= max_in_flight:
+				finish_oldest()
+
+		while in_flight:
+			finish_oldest()
+	run.saw_every_post = True
+
+
+def convert_posts_to_md(xml_path, output_md_formatter=None, config=None, image_downloader=None, process_pool=None):
+	"""
+		converts every post in the export at xml_path, or of the blog's feed if it's a url.
+		returns the finished ConversionRun. config, image_downloader and process_pool are as in ConversionRun
+	"""
+	config = g_converter_config if config is None else config
+	ensure_have_folder(config["md_file_save_path"])
+	ensure_have_folder(config["image_save_path"])
+
+	jobs = config["conversion jobs"]
+	with ConversionRun(output_md_formatter, config, image_downloader, process_pool) as run:
+		if is_feed_url(xml_path):
+			xml_path = open_feed_source(xml_path, config)
+		run.start_checkpoints(xml_path)
+		run.start_post_links(xml_path)
+		if run.profile is not None and not isinstance(xml_path, FeedSource):
+			run.profile.bytes["xml in"] = os.path.getsize(xml_path)
+		if (jobs > 1 or process_pool is not None) and not config["stop after one conversion"]:
+			_convert_posts_in_parallel(xml_path, output_md_formatter, run, jobs)
+		else:
+			for entry in run.timed_entries(iter_blogger_entries(xml_path, config)):
+				start = time.perf_counter()
+				kind = None
+				converting = False
+				try:
+					kind = extract_entry_kind(entry)
+					if kind == "comment" and run.comment_threads is not None:
+						run.add_comment(entry)
+					elif "post" == kind and run.in_scope(entry):
+						converting = True
+						convert_post_to_md(entry, output_md_formatter, run)
+				except Exception as e:
+					# one entry's failure doesn't stop the run
+					run.entry_failed(entry, e, time.perf_counter() - start, kind)
+
+				if converting and config["stop after one conversion"]:
+					converter_logger.info("stopping after one conversion")
+					break
+			else:
+				run.saw_every_post = True
+
+	if config["report peak memory"]:
+		report_peak_memory()
+	return run
+
+
+def make_converter_config(overrides=None):
+	"""a fresh config with the default settings, updated with overrides. unknown settings raise KeyError"""
+	config = dict(DEFAULT_CONVERTER_CONFIG)
+	for key, value in (overrides or {}).items():
+		if key not in config and key not in OPTIONAL_CONFIG_KEYS:
+			raise KeyError(f"unknown converter setting '{key}'")
+		config[key] = value
+	return config
+
+
+class MarkdownFileSink:
+	"""iter_posts() sink saving each post's markdown, like convert_posts_to_md() does"""
+	def __init__(self, config, output_md_formatter=None):
+		self.config = config
+		self.output_md_formatter = output_md_formatter
+		self.saved_paths = []
+		ensure_have_folder(config["md_file_save_path"])
+
+	def add_post(self, post_data):
+		self.saved_paths.append(save_post_md(post_data, self.output_md_formatter, self.config))
+
+	def close(self):
+		pass
+
+
+class ImageDownloadSink:
+	"""iter_posts() sink downloading each post's images in the background. close() waits for them"""
+	def __init__(self, config, image_downloader=None):
+		self.config = config
+		self.owns_image_downloader = image_downloader is None
+		ensure_have_folder(config["image_save_path"])
+		self.image_downloader = make_image_downloader(config) if image_downloader is None else image_downloader
+
+	def add_post(self, post_data):
+		download_image_refs(post_data["image_refs"], self.image_downloader, self.config)
+
+	def close(self):
+		if self.owns_image_downloader:
+			self.image_downloader.close()
+
+
+class ArchiveSink:
+	"""
+		iter_posts() sink writing each post, and its images, into an ArchiveWriter under the
+		paths they'd be saved at. render_post(post_data, config) returns a post's path and text,
+		render_post_md by default.
+
+		images are downloaded into a temporary staging folder (through the image cache, which
+		lives there too unless "image cache path" is set) and moved into the archive as each
+		download finishes.
+	"""
+	def __init__(self, config, archive, render_post=None):
+		self.config = config
+		self.archive = archive
+		self.render_post = render_post or render_post_md
+		self.image_downloader = None
+		self._queued_images = set()
+		if "dont download use demo image" not in config:
+			self._staging = tempfile.TemporaryDirectory(prefix="blogger-images-")
+			image_config = dict(config)
+			if not image_config["image cache path"]:
+				image_config["image cache path"] = os.path.join(self._staging.name, ".image-cache")
+			self.image_downloader = make_image_downloader(image_config)
+
+	def add_post(self, post_data):
+		save_path, text = self.render_post(post_data, self.config)
+		self.archive.add_text(save_path, text)
+		if self.image_downloader is None:
+			return
+		for src_url in post_data["image_refs"]:
+			save_path = image_paths_for_src(src_url, self.config)[0]
+			if save_path in self._queued_images:
+				continue
+			self._queued_images.add(save_path)
+			staged_path = os.path.join(self._staging.name, hashlib.sha1(save_path.encode("utf-8")).hexdigest())
+			future = self.image_downloader.submit(src_url, staged_path)
+			future.add_done_callback(lambda f, save_path=save_path: self._archive_image(f, save_path))
+
+	def _archive_image(self, future, save_path):
+		if future.result() is not None:
+			self.archive.add_file(save_path, future.result(), remove_after=True)
+
+	def close(self):
+		if self.image_downloader is not None:
+			self.image_downloader.close() # every finished download is queued for the archive by now
+			self.archive.flush()
+			self._staging.cleanup()
+
+
+# an archive is written in one pass over the whole export, by one process: there's no manifest,
+# checkpoint journal or retry queue for it, so these settings don't apply
+ARCHIVE_IGNORED_CONFIG_KEYS = ["conversion jobs", "incremental conversion", "prune deleted posts", "retry failed",
+							   "shard", "comments", "site indexes", "rewrite internal links"]
+# the options setting them, which --archive can't be used with ("jobs" only warns, its default isn't 1)
+ARCHIVE_CONFLICTING_ARGS = ["incremental", "prune_deleted", "retry_failed", "shard", "comments", "site_indexes",
+							"rewrite_internal_links"]
+
+
+def convert_posts_to_archive(xml_path, render_post=None, config=None):
+	"""converts every post in the export into the archive at config's "archive path" """
+	config = g_converter_config if config is None else config
+	for key in ARCHIVE_IGNORED_CONFIG_KEYS:
+		if config[key] and config[key] != DEFAULT_CONVERTER_CONFIG[key]:
+			converter_logger.warning(f"'{key}' doesn't apply when writing an archive. ignoring it")
+
+	with ArchiveWriter(config["archive path"], config["archive format"], config["archive compression level"]) as archive:
+		for post_data in iter_posts(xml_path, config, [ArchiveSink(config, archive, render_post)]):
+			converter_logger.info(f"archived '{post_data['title']}'")
+	converter_logger.info(f"wrote {archive.files} files ({archive.bytes / (1024 * 1024):.1f} MB before compression) "
+						  f"to '{config['archive path']}'")
+
+
+def iter_posts(source, config=None, sinks=()):
+	"""
+		lazily converts the posts of a blogger export, yielding each post's record once converted:
+			{"blogger_id", "author", "published", "title", "categories", "md", "image_refs"}
+
+		source is a path or a file-like object of the export. settings come from config (see
+		make_converter_config()), and nothing is read from or written to g_converter_config, so
+		conversions can run side by side in one process. nothing touches the disk or network
+		unless sinks ask to: each sink's add_post(record) is called before the record is
+		yielded, and its close() once the export is done (or the generator is closed).
+
+			config = make_converter_config({"dont download use demo image": "demo.jpg"})
+			for post in iter_posts(open("backup.xml", "rb"), config):
+				db.insert(post["blogger_id"], post["md"])
+
+		with streaming xml parsing (the default) memory stays flat no matter the export's size.
+	"""
+	config = make_converter_config() if config is None else config
+	unknown_tags = collections.Counter()
+	ignored_markup = collections.Counter()
+	try:
+		for entry in iter_blogger_entries(source, config):
+			if "post" != extract_entry_kind(entry):
+				continue
+			post_data, content_html = extract_post_data(entry)
+			if not ensure_complete_post_data(post_data):
+				continue
+			converted = convert_post_html(content_html, config=config)
+			unknown_tags.update(converted["unknown_tags"])
+			ignored_markup.update(converted["ignored_markup"])
+			post_data["md"] = converted["md"]
+			post_data["image_refs"] = converted["image_refs"]
+			for sink in sinks:
+				sink.add_post(post_data)
+			yield post_data
+	finally:
+		for sink in sinks:
+			sink.close()
+		log_ignored_html(unknown_tags, ignored_markup)
+
+
+def build_arg_parser(prog, backup_hint):
+	parser = argparse.ArgumentParser(prog=prog, epilog=backup_hint)
+	parser.add_argument("xml_path", help="path to blogger XML, or the blog's atom feed url (ie https://NAME.blogspot.com/feeds/posts/default)")
+	add_conversion_arguments(parser)
+	return parser
+
+
+def add_conversion_arguments(parser):
+	parser.add_argument("-j", "--jobs", type=int, default=g_converter_config["conversion jobs"],
+						help="number of processes converting posts in parallel. 0 uses every core")
+	parser.add_argument("--profile", metavar="REPORT_PATH",
+						help="write a JSON report of where the conversion spent its time")
+	parser.add_argument("--incremental", action="store_true",
+						help="only convert posts that changed since the last --incremental run")
+	parser.add_argument("--prune-deleted", action="store_true",
+						help="with --incremental, delete converted posts that are no longer in the export")
+	parser.add_argument("--retry-failed", action="store_true",
+						help="only convert the posts and download the images the last runs failed on (their retry queue)")
+	parser.add_argument("--rewrite-internal-links", action="store_true",
+						help="point links between the blog's posts at the converted posts, and report links to posts not in the export")
+	parser.add_argument("--site-indexes", action="store_true",
+						help="also write tag, archive and search indexes of the posts as json (see site_indexes.py)")
+	parser.add_argument("--full-sync", action="store_true",
+						help="when converting from a feed url, read all of it instead of only what was updated since the last run")
+	parser.add_argument("--shard", metavar="I/N", type=parse_shard,
+						help="only convert the I-th of N slices of the posts, ie to split a conversion across hosts. "
+							 "combine the results with 'py shard_manifest.py merge'")
+	parser.add_argument("--image-max-width", type=int, metavar="PIXELS",
+						help="download blogspot/googleusercontent images at most this wide instead of the full size original")
+	parser.add_argument("--srcset", metavar="WIDTHS", type=lambda text: [int(w) for w in text.split(",")],
+						help="download blogger images at each of these widths, ie '480,960,1600', and reference them with a srcset")
+	parser.add_argument("--image-mirror", metavar="FOLDER", action="append",
+						help="folder that already has the blog's images, taken from it instead of downloaded. can be repeated")
+	parser.add_argument("--offline", action="store_true",
+						help="don't download anything. images that aren't cached or mirrored are reported missing")
+	parser.add_argument("--comments", choices=COMMENTS_MODES,
+						help="convert readers' comments too, as a section at the end of each post or a file next to it")
+	parser.add_argument("--archive", metavar="PATH",
+						help="write posts and images into this one zip/tar archive instead of separate files. '-' for stdout. "
+							 "always converts the whole export in one process: can't be used with --incremental, "
+							 "--prune-deleted, --retry-failed, --shard, --comments, --site-indexes or --rewrite-internal-links, "
+							 "and an interrupted run starts over")
+	parser.add_argument("--archive-format", choices=ARCHIVE_FORMATS,
+						help="by default picked by the archive's name (zip for stdout)")
+	parser.add_argument("--compression-level", type=int, choices=range(10), metavar="0-9",
+						default=g_converter_config["archive compression level"])
+	return parser
+
+
+def apply_args_to_config(args, config=None):
+	config = g_converter_config if config is None else config
+	if args.archive:
+		conflicts = ["--" + name.replace("_", "-") for name in ARCHIVE_CONFLICTING_ARGS if getattr(args, name)]
+		if conflicts:
+			raise SystemExit(f"--archive can't be used with {', '.join(conflicts)}")
+	config["conversion jobs"] = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+	if args.profile:
+		config["profile report path"] = args.profile
+	if args.incremental:
+		config["incremental conversion"] = True
+	if args.prune_deleted:
+		config["prune deleted posts"] = True
+	if args.retry_failed:
+		config["retry failed"] = True
+	if args.full_sync:
+		config["feed delta sync"] = False
+	if args.site_indexes:
+		config["site indexes"] = True
+	if args.rewrite_internal_links:
+		config["rewrite internal links"] = True
+	if args.shard:
+		config["shard"] = args.shard
+		config["shared image cache"] = True
+	if args.image_max_width:
+		config["image max width"] = args.image_max_width
+	if args.srcset:
+		config["image srcset widths"] = args.srcset
+	if args.image_mirror:
+		config["image mirror folders"] = args.image_mirror
+	if args.offline:
+		config["offline"] = True
+	if args.comments:
+		config["comments"] = args.comments
+	if args.archive:
+		config["archive path"] = args.archive
+		config["archive format"] = args.archive_format
+	config["archive compression level"] = args.compression_level
 
 
 def main():
-	if len(sys.argv) != 2:
-		print("usage: convert_blogger_xml_to_md.py <path to blogger XML>")
-		print("please create a backup of your blogger"
-			  " posts (https://support.google.com/blogger/answer/41387)"
-			  " and provide the path to the generated XML")
-		return 1
-
-	convert_posts_to_md(sys.argv[1])
+	args = build_arg_parser("convert_blogger_xml_to_md.py",
+							"please create a backup of your blogger"
+							" posts (https://support.google.com/blogger/answer/41387)"
+							" and provide the path to the generated XML").parse_args()
+	apply_args_to_config(args)
+
+	if g_converter_config["archive path"]:
+		convert_posts_to_archive(args.xml_path)
+	else:
+		convert_posts_to_md(args.xml_path)
 	converter_logger.log(HAPPY_LOG, "")
 	converter_logger.log(HAPPY_LOG, "****")
 	converter_logger.log(HAPPY_LOG, "Done converting Blogger posts to Markdown.")
@@ -0,0 +1,202 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+"""
+	a fast tokenizer for the html Blogger's editor writes: tags with quoted attributes, text,
+	comments and doctypes. it finds tags with one regex and calls the parser's handle_* methods, the
+	same calls html.parser.HTMLParser would make, so conversions come out the same while
+	skipping HTMLParser's character by character scanning.
+
+	html outside that subset (anything in script/style and other raw text tags, other declarations,
+	a '<' that isn't a tag, unquoted attribute values...) raises OutsideSubset before the parser sees anything, and
+	is left to HTMLParser. to check both give the same markdown on an export and time them:
+
+		py fast_blogger_html.py backup.xml
+"""
+
+import re
+import sys
+import html
+import time
+import argparse
+import difflib
+import collections
+
+NAME = r"[a-zA-Z][-a-zA-Z0-9:._]*"
+TAG_RE = re.compile(
+	rf"<(?:(?P<start>{NAME})(?P<attrs>(?:\s+{NAME}(?:\s*=\s*(?:\"[^\"]*\"|'[^']*'))?)*)\s*(?P<self_closing>/?)>"
+	rf"|/(?P<end>{NAME})\s*>"
+	r"|!--(?P<comment>.*?)-->"
+	r"|!(?P<decl>[dD][oO][cC][tT][yY][pP][eE][^>]*)>)", re.DOTALL)
+ATTR_RE = re.compile(rf"({NAME})(\s*=\s*(?:\"([^\"]*)\"|'([^']*)'))?")
+# HTMLParser reads what's in these as text, not tags (which ones depends on the python version)
+RAW_TEXT_TAGS = {"script", "style", "textarea", "title", "xmp", "iframe", "noembed", "noframes", "noscript", "plaintext"}
+
+
+class OutsideSubset(Exception):
+	"""the html has something the fast tokenizer doesn't read exactly like HTMLParser"""
+
+
+def _attrs(text):
+	"""[(name, value)] like HTMLParser gives them: lowercase names, unescaped values, None without a value"""
+	attrs = []
+	for name, has_value, double_quoted, single_quoted in ATTR_RE.findall(text):
+		value = (double_quoted or single_quoted) if has_value else None
+		if value and "&" in value:
+			value = html.unescape(value)
+		attrs.append((name.lower(), value))
+	return attrs
+
+
+def tokenize(text):
+	"""
+		[(kind, ...)] of text, kind being "data", "start", "startend", "end", "comment" or "decl".
+		raises OutsideSubset if text isn't all in the subset
+	"""
+	tokens = []
+	append = tokens.append
+	find = text.find
+	match = TAG_RE.match
+	pos = 0
+	raw_text_tag = None
+	while True:
+		i = find("<", pos)
+		if i < 0:
+			break
+		if i > pos:
+			if raw_text_tag is not None:
+				# HTMLParser keeps script/style content as is, and reads other raw text tags' like any text
+				raise OutsideSubset(f"<{raw_text_tag}> with content")
+			data = text[pos:i]
+			append(("data", html.unescape(data) if "&" in data else data))
+		m = match(text, i)
+		if m is None:
+			raise OutsideSubset("a '<' that isn't a tag the fast tokenizer reads")
+		tag = m.group("start")
+		if raw_text_tag is not None and (m.group("end") or "").lower() != raw_text_tag:
+			raise OutsideSubset(f"<{raw_text_tag}> with content")
+		raw_text_tag = None
+		if tag is not None:
+			tag = tag.lower()
+			attrs = _attrs(m.group("attrs")) if m.group("attrs") else []
+			if m.group("self_closing"):
+				append(("startend", tag, attrs, m.group(0)))
+			else:
+				append(("start", tag, attrs, m.group(0)))
+				if tag in RAW_TEXT_TAGS:
+					raw_text_tag = tag
+		elif m.group("end") is not None:
+			append(("end", m.group("end").lower()))
+		elif m.group("decl") is not None:
+			append(("decl", m.group("decl")))
+		else:
+			comment = m.group("comment")
+			if "--" in comment or comment.startswith((">", "->")):
+				raise OutsideSubset("comment HTMLParser might end elsewhere")
+			append(("comment", comment))
+		pos = m.end()
+	if raw_text_tag is not None:
+		raise OutsideSubset(f"<{raw_text_tag}> isn't closed")
+	if pos < len(text):
+		if "&" in text[pos:]:
+			raise OutsideSubset("HTMLParser keeps back text ending with '&' until it's fed more")
+		append(("data", text[pos:]))
+	return tokens
+
+
+def feed_tokens(parser, tokens):
+	"""
+		makes the calls HTMLParser.feed() would make on parser for tokens. each start tag's html
+		is set as parser.fed_starttag_text first: parser's get_starttag_text() should return it
+	"""
+	for token in tokens:
+		kind = token[0]
+		if kind == "data":
+			parser.handle_data(token[1])
+		elif kind == "end":
+			parser.handle_endtag(token[1])
+		elif kind == "comment":
+			parser.handle_comment(token[1])
+		elif kind == "decl":
+			parser.handle_decl(token[1])
+		else:
+			parser.fed_starttag_text = token[3]
+			if kind == "start":
+				parser.handle_starttag(token[1], token[2])
+			else:
+				parser.handle_startendtag(token[1], token[2])
+
+
+def fast_feed(parser, text):
+	"""feeds text to an HTMLParser through the fast tokenizer. returns False, having fed nothing, if text is outside its subset"""
+	try:
+		tokens = tokenize(text)
+	except OutsideSubset:
+		return False
+	feed_tokens(parser, tokens)
+	return True
+
+
+def compare_on_export(xml_path, converter, max_diffs=5):
+	"""
+		converts every post and comment of the export with and without the fast tokenizer.
+		returns the stats and a diff of each post (up to max_diffs) that came out differently
+	"""
+	stats = collections.Counter()
+	fallbacks = collections.Counter()
+	diffs = []
+	fast_config = converter.make_converter_config({"fast html tokenizer": True})
+	slow_config = converter.make_converter_config({"fast html tokenizer": False})
+	for entry in converter.iter_blogger_entries(xml_path, fast_config):
+		if converter.extract_entry_kind(entry) not in ("post", "comment"):
+			continue
+		content = entry.find("{http://www.w3.org/2005/Atom}content")
+		content_html = (content.text if content is not None else None) or ""
+		try:
+			tokenize(content_html)
+		except OutsideSubset as e:
+			fallbacks[str(e)] += 1
+		timings = []
+		results = []
+		for config in (slow_config, fast_config):
+			start = time.perf_counter()
+			results.append(converter.convert_post_html(content_html, config=config))
+			timings.append(time.perf_counter() - start)
+		stats["entries"] += 1
+		stats["html bytes"] += len(content_html.encode("utf-8"))
+		stats["htmlparser seconds"] += timings[0]
+		stats["fast seconds"] += timings[1]
+		if results[0] != results[1]:
+			stats["different"] += 1
+			if len(diffs) < max_diffs:
+				entry_id = entry.find("{http://www.w3.org/2005/Atom}id").text
+				diffs.append((entry_id, "".join(difflib.unified_diff(
+					results[0]["md"].splitlines(True), results[1]["md"].splitlines(True), "htmlparser", "fast"))))
+	stats["fell back"] = sum(fallbacks.values())
+	return stats, fallbacks, diffs
+
+
+def main():
+	parser = argparse.ArgumentParser(prog="fast_blogger_html.py",
+									 description="check the fast html tokenizer converts an export like HTMLParser does, and time both")
+	parser.add_argument("xml_path", help="blogger backup xml")
+	args = parser.parse_args()
+
+	import logging
+	import convert_blogger_xml_to_md as converter
+	logging.disable(logging.WARNING) # the conversions' own warnings, twice over
+
+	stats, fallbacks, diffs = compare_on_export(args.xml_path, converter)
+	for entry_id, diff in diffs:
+		print(f"{entry_id} differs:\n{diff}")
+	print(f"{stats['entries']} posts and comments, {stats['html bytes'] / 1024 / 1024:.1f} MB of html")
+	print(f"{stats['entries'] - stats['fell back']} on the fast path, {stats['fell back']} fell back to HTMLParser")
+	for reason, n in fallbacks.most_common():
+		print(f"    {n:>6} {reason}")
+	print(f"{stats['different']} converted differently")
+	if stats["fast seconds"]:
+		print(f"HTMLParser {stats['htmlparser seconds']:.2f}s, fast {stats['fast seconds']:.2f}s: "
+			  f"{stats['htmlparser seconds'] / stats['fast seconds']:.2f}x")
+	return 1 if stats["different"] else 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,153 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+
+import os
+import json
+import time
+import http.client
+import logging
+import datetime
+import collections
+import urllib.error
+import urllib.parse
+import urllib.request
+import concurrent.futures
+import xml.etree.ElementTree as ET
+from fs_utils import atomic_write_text
+
+converter_logger = logging.getLogger('converter')
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+# blogger's feeds have used both versions of the namespace
+OPEN_SEARCH_TOTALS = ["{http://a9.com/-/spec/opensearchrss/1.0/}totalResults", "{http://a9.com/-/spec/opensearch/1.1/}totalResults"]
+KIND_SCHEME = "http://schemas.google.com/g/2005#kind"
+POST_KIND = "http://schemas.google.com/blogger/2008/kind#post"
+MAX_PAGE_SIZE = 500 # the most blogger returns per page
+USER_AGENT = "Blogger-To-Markdown"
+RETRY_BACKOFF_SECONDS = 0.5
+STATE_VERSION = 1
+
+
+def is_feed_url(source):
+	return isinstance(source, str) and source.startswith(("http://", "https://"))
+
+
+def _updated_time(text):
+	try:
+		return datetime.datetime.strptime(text, '%Y-%m-%dT%H:%M:%S.%f%z')
+	except ValueError:
+		return datetime.datetime.strptime(text, '%Y-%m-%dT%H:%M:%S%z')
+
+
+class FeedSource:
+	"""
+		the entries of a blog's atom feed (ie 'https://NAME.blogspot.com/feeds/posts/default'),
+		read page by page with start-index/max-results, for converting a blog without a backup.
+		once the first page tells how many entries there are, the other pages are fetched by
+		workers at once, and entries are yielded in feed order with at most workers pages in memory.
+
+		with updated_min (an atom timestamp) only entries updated since are fetched. latest_updated
+		is the newest entry's timestamp, to save with save_feed_state() for the next sync.
+
+		feed entries are the same as a backup's, except public feeds leave out which kind
+		each entry is. those are posts.
+	"""
+	def __init__(self, url, page_size=MAX_PAGE_SIZE, workers=4, updated_min=None, timeout=30, retries=3):
+		self.url = url
+		self.page_size = min(page_size, MAX_PAGE_SIZE)
+		self.workers = workers
+		self.updated_min = updated_min
+		self.timeout = timeout
+		self.retries = retries
+		self.latest_updated = None
+		self.stats = collections.Counter()
+
+	def page_url(self, start_index):
+		parts = urllib.parse.urlsplit(self.url)
+		query = dict(urllib.parse.parse_qsl(parts.query))
+		query.update({"start-index": str(start_index), "max-results": str(self.page_size)})
+		if self.updated_min:
+			query.update({"updated-min": self.updated_min, "orderby": "updated"})
+		return urllib.parse.urlunsplit(parts._replace(query=urllib.parse.urlencode(query)))
+
+	def _fetch_page(self, start_index):
+		"""the page's feed element, fetched with retries"""
+		url = self.page_url(start_index)
+		for attempt in range(self.retries + 1):
+			try:
+				request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+				with urllib.request.urlopen(request, timeout=self.timeout) as resp:
+					feed = ET.fromstring(resp.read())
+				self.stats["pages"] += 1
+				return feed
+			except (OSError, http.client.HTTPException, ET.ParseError) as e:
+				if attempt == self.retries or (isinstance(e, urllib.error.HTTPError) and e.code < 500):
+					raise
+				delay = RETRY_BACKOFF_SECONDS * (2 ** attempt)
+				converter_logger.warning(f"retrying feed page '{url}' in {delay}s because: {e}")
+				time.sleep(delay)
+
+	def _page_entries(self, feed):
+		entries = feed.findall(f"{ATOM}entry")
+		for entry in entries:
+			if not any(c.attrib.get("scheme") == KIND_SCHEME for c in entry.findall(f"{ATOM}category")):
+				ET.SubElement(entry, f"{ATOM}category", {"scheme": KIND_SCHEME, "term": POST_KIND})
+			updated = entry.find(f"{ATOM}updated")
+			if updated is not None and (self.latest_updated is None or
+										_updated_time(updated.text) > _updated_time(self.latest_updated)):
+				self.latest_updated = updated.text
+		self.stats["entries"] += len(entries)
+		return entries
+
+	def entries(self):
+		first = self._fetch_page(1)
+		first_entries = self._page_entries(first)
+		total = next((int(first.find(t).text) for t in OPEN_SEARCH_TOTALS if first.find(t) is not None), None)
+		converter_logger.info(f"reading {total if total is not None else 'the'} entries of '{self.url}'"
+							  + (f" updated since {self.updated_min}" if self.updated_min else ""))
+		yield from first_entries
+
+		next_start = 1 + self.page_size
+		last_page_full = len(first_entries) == self.page_size
+		if total is not None and next_start <= total:
+			with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="feed-page") as pool:
+				in_flight = collections.deque()
+				def fetch_next():
+					nonlocal next_start
+					in_flight.append(pool.submit(self._fetch_page, next_start))
+					next_start += self.page_size
+				while next_start <= total and len(in_flight) < self.workers:
+					fetch_next()
+				while in_flight:
+					page_entries = self._page_entries(in_flight.popleft().result())
+					last_page_full = len(page_entries) == self.page_size
+					if next_start <= total:
+						fetch_next()
+					yield from page_entries
+
+		# no total, or more entries than it said: the rest page by page until one isn't full
+		while last_page_full:
+			page_entries = self._page_entries(self._fetch_page(next_start))
+			yield from page_entries
+			next_start += self.page_size
+			last_page_full = len(page_entries) == self.page_size
+
+
+def read_feed_state(path, url):
+	"""the newest entry's timestamp the last sync of url saw, or None"""
+	if not path or not os.path.isfile(path):
+		return None
+	with open(path, "r", encoding="utf-8") as f:
+		state = json.load(f)
+	if state.get("version") != STATE_VERSION:
+		converter_logger.warning(f"ignoring feed state of unknown version {state.get('version')}")
+		return None
+	return state["feeds"].get(url, {}).get("updated")
+
+
+def save_feed_state(path, url, updated):
+	state = {"version": STATE_VERSION, "feeds": {}}
+	if os.path.isfile(path):
+		with open(path, "r", encoding="utf-8") as f:
+			state = json.load(f)
+	state["feeds"][url] = {"updated": updated}
+	atomic_write_text(path, json.dumps(state, indent=1, sort_keys=True))
@@ -0,0 +1,113 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+
+import os
+import time
+import hashlib
+import shutil
+import threading
+import tempfile
+import contextlib
+
+_default_file_mode = None
+
+
+def default_file_mode(folder):
+	"""
+		the mode a plain open() gives new files, 0666 less the umask. temp files are created
+		private (0600), files renamed into place get this one. it's read off a file created in
+		folder the first time it's needed: os.umask() can't read the umask without setting it,
+		which races with other threads creating files
+	"""
+	global _default_file_mode
+	if _default_file_mode is None:
+		probe_path = os.path.join(folder or ".", f".tmp-mode-{os.getpid()}-{threading.get_ident()}")
+		fd = os.open(probe_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666)
+		try:
+			_default_file_mode = os.fstat(fd).st_mode & 0o777
+		finally:
+			os.close(fd)
+			os.unlink(probe_path)
+	return _default_file_mode
+
+
+def atomic_write_text(path, text):
+	"""writes text to path so readers only ever see the old or the complete new file"""
+	fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp-")
+	try:
+		with os.fdopen(fd, "w", encoding="utf-8") as f:
+			f.write(text)
+		os.chmod(tmp_path, default_file_mode(os.path.dirname(tmp_path)))
+		os.replace(tmp_path, path)
+	except:
+		os.unlink(tmp_path)
+		raise
+
+
+def write_text_if_changed(path, text):
+	"""atomically writes text to path, unless path already holds it. returns whether it wrote"""
+	try:
+		with open(path, "r", encoding="utf-8") as f:
+			if f.read() == text:
+				return False
+	except (FileNotFoundError, UnicodeDecodeError):
+		pass
+	atomic_write_text(path, text)
+	return True
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+	digest = hashlib.sha256()
+	with open(path, "rb") as f:
+		while True:
+			chunk = f.read(chunk_size)
+			if not chunk:
+				return digest.hexdigest()
+			digest.update(chunk)
+
+
+def link_or_copy(src_path, dest_path):
+	"""makes dest_path a hard link of src_path (a copy where links aren't supported), replacing it atomically"""
+	tmp_dest = os.path.join(os.path.dirname(dest_path) or ".", f".tmp-{os.getpid()}-{threading.get_ident()}")
+	try:
+		os.link(src_path, tmp_dest)
+	except OSError:
+		shutil.copyfile(src_path, tmp_dest) # no hard links on this filesystem
+	os.replace(tmp_dest, dest_path)
+
+
+def try_create_lock_file(path, stale_seconds):
+	"""
+		creates path if it doesn't exist, atomically, also across hosts sharing the folder.
+		returns whether this process created it. a lock file older than stale_seconds was left
+		by a process that died, so it's taken over.
+	"""
+	for _ in range(2):
+		try:
+			os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+			return True
+		except FileExistsError:
+			try:
+				if time.time() - os.stat(path).st_mtime < stale_seconds:
+					return False
+				os.unlink(path)
+			except FileNotFoundError:
+				pass # released meanwhile. try again
+	return False
+
+
+def remove_lock_file(path):
+	try:
+		os.unlink(path)
+	except FileNotFoundError:
+		pass
+
+
+@contextlib.contextmanager
+def exclusive_lock_file(path, stale_seconds=60, poll_seconds=0.05):
+	"""holds the lock file at path for the duration of the block, waiting for other holders"""
+	while not try_create_lock_file(path, stale_seconds):
+		time.sleep(poll_seconds)
+	try:
+		yield
+	finally:
+		remove_lock_file(path)
@@ -0,0 +1,311 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+import tempfile
+import threading
+from fs_utils import atomic_write_text, default_file_mode, try_create_lock_file, remove_lock_file, exclusive_lock_file, \
+	link_or_copy, file_sha256
+from image_sizes import image_variant
+
+converter_logger = logging.getLogger('converter')
+
+MANIFEST_VERSION = 1
+CLAIM_POLL_SECONDS = 0.1
+
+
+class ImageCache:
+	"""
+		content-addressed store of downloaded images, with a manifest describing each url.
+
+			<cache_path>/manifest.json       url -> sha256, size, etag, last-modified, published paths, variant
+			<cache_path>/objects/ab/ab12...  the image bytes, named by their sha256
+			<cache_path>/tmp/                downloads in progress
+
+		images are published to the image folder as hard links of their object (copies where
+		links aren't supported), so the same bytes behind different urls are stored once.
+		every file is written to a temp file first and renamed into place, so a crashed run
+		never leaves a half-written image that looks cached.
+
+		a blogger image url's variant is which image it is and at what size (see image_sizes.py).
+		a url missing from the cache is found under another url of the same variant, ie the
+		same image and size served by 2.bp.blogspot.com instead of 1.bp.blogspot.com.
+
+		a shared cache is used by several processes at once (ie shards on hosts sharing the
+		folder). a url is claimed by whoever downloads it first, <cache_path>/claims/<sha1 of url>,
+		and others wait for its entry instead of downloading it again. the manifest is merged
+		with what's on disk when saved instead of overwriting it.
+	"""
+	def __init__(self, cache_path, shared=False):
+		self.cache_path = cache_path
+		self.shared = shared
+		self.objects_path = os.path.join(cache_path, "objects")
+		self.tmp_path = os.path.join(cache_path, "tmp")
+		self.claims_path = os.path.join(cache_path, "claims")
+		self.manifest_path = os.path.join(cache_path, "manifest.json")
+		os.makedirs(self.objects_path, exist_ok=True)
+		os.makedirs(self.tmp_path, exist_ok=True)
+		if shared:
+			os.makedirs(self.claims_path, exist_ok=True)
+
+		self._lock = threading.Lock()
+		self._dirty = False
+		self.entries = self._read_manifest()
+		self.variants = {} # (image, size) -> a url of that variant
+		for url, entry in self.entries.items():
+			self._index_variant(url, entry)
+
+	def _read_manifest(self):
+		if not os.path.isfile(self.manifest_path):
+			return {}
+		with open(self.manifest_path, "r", encoding="utf-8") as f:
+			manifest = json.load(f)
+		if manifest.get("version") != MANIFEST_VERSION:
+			converter_logger.warning(f"ignoring image cache manifest of unknown version {manifest.get('version')}")
+			return {}
+		return manifest["urls"]
+
+	def _index_variant(self, url, entry):
+		if entry.get("variant"):
+			self.variants.setdefault((entry["variant"]["of"], entry["variant"]["size"]), url)
+
+	def _same_variant_entry(self, url):
+		variant = image_variant(url)
+		if variant is None:
+			return None
+		with self._lock:
+			return self.entries.get(self.variants.get((variant["of"], variant["size"])))
+
+	def object_path(self, sha256):
+		return os.path.join(self.objects_path, sha256[:2], sha256)
+
+	def lookup(self, url):
+		"""returns the manifest entry of url if its bytes are in the cache, otherwise None"""
+		with self._lock:
+			entry = self.entries.get(url)
+		if entry is None and self.shared:
+			entry = self._read_claimed_entry(url)
+		if entry is None:
+			entry = self._same_variant_entry(url)
+		if entry is None:
+			return None
+		try:
+			if os.stat(self.object_path(entry["sha256"])).st_size == entry["size"]:
+				return entry
+		except FileNotFoundError:
+			pass
+		return None
+
+	def validators(self, url):
+		"""returns headers making a request for url conditional on it having changed"""
+		headers = {}
+		entry = self.lookup(url)
+		if entry is not None:
+			if entry.get("etag"):
+				headers["If-None-Match"] = entry["etag"]
+			if entry.get("last_modified"):
+				headers["If-Modified-Since"] = entry["last_modified"]
+		return headers
+
+	def new_temp_file(self):
+		"""returns an open binary file and its path for downloading into"""
+		fd, path = tempfile.mkstemp(dir=self.tmp_path, suffix=".part")
+		os.chmod(path, default_file_mode(self.tmp_path))
+		return os.fdopen(fd, "wb"), path
+
+	def store(self, url, temp_path, sha256, size, etag=None, last_modified=None):
+		"""moves a finished download into the store and records it. returns url's entry"""
+		object_path = self.object_path(sha256)
+		if os.path.isfile(object_path) and os.stat(object_path).st_size == size:
+			os.unlink(temp_path) # same bytes as another url
+		else:
+			os.makedirs(os.path.dirname(object_path), exist_ok=True)
+			os.replace(temp_path, object_path)
+
+		with self._lock:
+			published = self.entries.get(url, {}).get("published", [])
+			self.entries[url] = {"sha256": sha256, "size": size, "etag": etag, "last_modified": last_modified,
+								 "published": published, "last_used": int(time.time()), "variant": image_variant(url)}
+			self._index_variant(url, self.entries[url])
+			self._dirty = True
+			entry = self.entries[url]
+		if self.shared:
+			# other processes waiting on url's claim find it here before this process saves the manifest
+			atomic_write_text(self._claim_path(url) + ".json", json.dumps(dict(entry, published=[])))
+		return entry
+
+	def _claim_path(self, url):
+		return os.path.join(self.claims_path, hashlib.sha1(url.encode("utf-8")).hexdigest())
+
+	def _read_claimed_entry(self, url):
+		try:
+			with open(self._claim_path(url) + ".json", "r", encoding="utf-8") as f:
+				entry = json.load(f)
+		except FileNotFoundError:
+			return None
+		with self._lock:
+			entry = self.entries.setdefault(url, entry)
+			self._index_variant(url, entry)
+			return entry
+
+	def claim(self, url, stale_seconds):
+		"""in a shared cache, makes this process the one downloading url. returns False if another process is"""
+		return try_create_lock_file(self._claim_path(url), stale_seconds)
+
+	def release(self, url):
+		remove_lock_file(self._claim_path(url))
+
+	def wait_for_claim(self, url, stale_seconds):
+		"""waits for the process that claimed url. returns url's entry, or None if that process failed or died"""
+		claim_path = self._claim_path(url)
+		while True:
+			entry = self.lookup(url)
+			if entry is not None:
+				return entry
+			try:
+				if time.time() - os.stat(claim_path).st_mtime >= stale_seconds:
+					return None
+			except FileNotFoundError:
+				return self.lookup(url) # released, either stored or given up on
+			time.sleep(CLAIM_POLL_SECONDS)
+
+	def mark_used(self, url, etag=None, last_modified=None):
+		entry = self.lookup(url)
+		with self._lock:
+			entry["last_used"] = int(time.time())
+			if etag:
+				entry["etag"] = etag
+			if last_modified:
+				entry["last_modified"] = last_modified
+			self._dirty = True
+
+	def publish(self, url, entry, dest_path):
+		"""
+			makes dest_path hold url's image. costs a couple of stat calls if it's already linked
+			there, and reading it back if it's a copy (where hard links aren't supported)
+		"""
+		object_path = self.object_path(entry["sha256"])
+		try:
+			dest_stat = os.stat(dest_path)
+			object_stat = os.stat(object_path)
+			if os.path.samestat(dest_stat, object_stat) or \
+					(dest_stat.st_size == entry["size"] and file_sha256(dest_path) == entry["sha256"]):
+				self._record_published(url, entry, dest_path)
+				return
+		except FileNotFoundError:
+			pass
+
+		link_or_copy(object_path, dest_path)
+		self._record_published(url, entry, dest_path)
+
+	def _record_published(self, url, entry, dest_path):
+		dest_path = os.path.abspath(dest_path)
+		with self._lock:
+			entry["last_used"] = int(time.time())
+			self._dirty = True
+			if dest_path not in entry["published"]:
+				entry["published"].append(dest_path)
+
+	def save(self):
+		if not self.shared:
+			with self._lock:
+				if not self._dirty:
+					return
+				text = json.dumps({"version": MANIFEST_VERSION, "urls": self.entries}, indent=1, sort_keys=True)
+				self._dirty = False
+			atomic_write_text(self.manifest_path, text)
+			return
+
+		with exclusive_lock_file(self.manifest_path + ".lock"):
+			on_disk = self._read_manifest()
+			with self._lock:
+				if not self._dirty:
+					return
+				self._merge_entries(on_disk)
+				text = json.dumps({"version": MANIFEST_VERSION, "urls": self.entries}, indent=1, sort_keys=True)
+				self._dirty = False
+			atomic_write_text(self.manifest_path, text)
+
+	def _merge_entries(self, others):
+		"""adds what other processes saved. for urls both know, this process' bytes win"""
+		for url, theirs in others.items():
+			ours = self.entries.get(url)
+			if ours is None:
+				self.entries[url] = theirs
+				self._index_variant(url, theirs)
+				continue
+			ours["published"] += [p for p in theirs["published"] if p not in ours["published"]]
+			ours["last_used"] = max(ours.get("last_used", 0), theirs.get("last_used", 0))
+
+	def gc(self, image_folders=(), max_age_days=None, dry_run=False):
+		"""
+			evicts urls unused for max_age_days, then deletes objects no url refers to, leftover
+			temp files, and files in image_folders that no url is published as.
+			returns the paths deleted.
+		"""
+		deleted = []
+
+		def delete(path):
+			deleted.append(path)
+			if not dry_run:
+				os.unlink(path)
+
+		if max_age_days is not None:
+			too_old = time.time() - max_age_days * 24 * 60 * 60
+			for url in [u for u, e in self.entries.items() if e.get("last_used", 0) < too_old]:
+				for published in self.entries.pop(url)["published"]:
+					if os.path.isfile(published):
+						delete(published)
+				self._dirty = True
+
+		referenced = set(e["sha256"] for e in self.entries.values())
+		for dirpath, _, filenames in os.walk(self.objects_path):
+			for fname in filenames:
+				if fname not in referenced:
+					delete(os.path.join(dirpath, fname))
+
+		for fname in os.listdir(self.tmp_path):
+			delete(os.path.join(self.tmp_path, fname))
+		if os.path.isdir(self.claims_path):
+			for fname in os.listdir(self.claims_path):
+				delete(os.path.join(self.claims_path, fname))
+
+		published = set(p for e in self.entries.values() for p in e["published"])
+		for folder in image_folders:
+			for fname in os.listdir(folder):
+				path = os.path.abspath(os.path.join(folder, fname))
+				if os.path.isfile(path) and path not in published:
+					delete(path)
+
+		if not dry_run:
+			self.save()
+		return deleted
+
+
+def main():
+	parser = argparse.ArgumentParser(prog="image_cache.py", description="maintain the downloaded image cache")
+	subcommands = parser.add_subparsers(dest="command", required=True)
+	gc_parser = subcommands.add_parser("gc", help="delete cached and published images nothing refers to")
+	gc_parser.add_argument("cache_path", help="image cache folder, by default '<image save path>/.image-cache'")
+	gc_parser.add_argument("--image-folder", action="append", default=[],
+						   help="folder images are published to. files in it the cache doesn't know are deleted")
+	gc_parser.add_argument("--max-age-days", type=float, help="also evict images no run used for this many days")
+	gc_parser.add_argument("--dry-run", action="store_true", help="only list what would be deleted")
+	args = parser.parse_args()
+
+	logging.basicConfig(level=logging.INFO, format="%(message)s")
+	cache = ImageCache(args.cache_path)
+	deleted = cache.gc(args.image_folder, args.max_age_days, args.dry_run)
+	for path in deleted:
+		converter_logger.info(f"{'would delete' if args.dry_run else 'deleted'} '{path}'")
+	converter_logger.info(f"{len(deleted)} files {'to delete' if args.dry_run else 'deleted'}")
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,368 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+
+import os
+import time
+import shutil
+import hashlib
+import logging
+import threading
+import collections
+import concurrent.futures
+import http.client
+import urllib.parse
+import urllib.request
+from fs_utils import link_or_copy
+
+converter_logger = logging.getLogger('converter')
+
+USER_AGENT = "Blogger-To-Markdown"
+RETRY_BACKOFF_SECONDS = 0.5
+MAX_REDIRECTS = 5
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class ImageDownloadError(Exception):
+	def __init__(self, message, retryable=True):
+		Exception.__init__(self, message)
+		self.retryable = retryable
+
+
+class ImageDownloader:
+	"""
+		downloads images on a bounded pool of threads, decoupled from html parsing.
+
+		- a url is fetched at most once per downloader, no matter how many posts reference it
+		- at most `per_host` downloads talk to the same host at once
+		- connections are kept alive and reused (one per thread and host)
+		- failed downloads are retried with exponential backoff
+
+		with an ImageCache, downloads go through its content-addressed store and a cached
+		url costs a couple of stat calls. with revalidate, cached urls are re-requested
+		conditionally (If-None-Match/If-Modified-Since) and only re-downloaded if changed.
+		with a shared cache, a url another process is already downloading is waited for
+		rather than downloaded again.
+
+		with an ImageMirror, images it has are taken from it before going to the network.
+		offline, nothing is downloaded. images that aren't cached or mirrored fail as missing.
+
+		a failed download is logged and counted, it doesn't stop the conversion.
+	"""
+	def __init__(self, workers=8, per_host=4, retries=3, timeout=30, ignore_cache=False, cache=None, revalidate=False,
+				 mirror=None, offline=False):
+		self.per_host = per_host
+		self.retries = retries
+		self.timeout = timeout
+		self.ignore_cache = ignore_cache
+		self.cache = cache
+		self.revalidate = revalidate and not offline # can't ask the server whether anything changed
+		self.mirror = mirror
+		self.offline = offline
+		self.stats = collections.Counter()
+		self.failed = {} # url -> reason
+		self.fetch_seconds = [] # how long each request took, not counting the wait for a host slot
+
+		self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-download")
+		self._lock = threading.Lock()
+		self._futures = {} # url -> (save path, future) of the url's download
+		self._copies = {} # (url, another save path) -> future of the url's download copied there
+		self._host_slots = {} # netloc -> semaphore
+		self._thread_state = threading.local()
+		self._all_connections = []
+		self._proxies = urllib.request.getproxies()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+	def submit(self, src_url, save_path):
+		"""
+			queues src_url to be saved at save_path. returns a future of the saved path (None on failure).
+			a url wanted at several paths (ie by several blogs) is still downloaded once, then copied
+		"""
+		with self._lock:
+			if src_url in self._futures:
+				first_save_path, future = self._futures[src_url]
+				if first_save_path != save_path:
+					if (src_url, save_path) not in self._copies:
+						# queued after the download it waits for, so that download is always running first
+						self._copies[(src_url, save_path)] = self._pool.submit(self._copy_download, src_url, future, save_path)
+					future = self._copies[(src_url, save_path)]
+				self.stats["deduplicated"] += 1
+				return future
+			future = self._pool.submit(self._download, src_url, save_path)
+			self._futures[src_url] = (save_path, future)
+			return future
+
+	def close(self):
+		"""waits for every queued download and closes the kept-alive connections"""
+		self._pool.shutdown(wait=True)
+		for conn in self._all_connections:
+			conn.close()
+		self._all_connections = []
+		if self.cache is not None:
+			self.cache.save()
+		if self._futures:
+			converter_logger.info(self.summary())
+		return self.stats
+
+	def summary(self):
+		shared = ""
+		if self.stats["downloaded by another process"]:
+			shared = f"{self.stats['downloaded by another process']} downloaded by another process, "
+		if self.mirror is not None:
+			shared += f"{self.stats['mirrored']} from the mirror, "
+		if self.offline:
+			shared += f"{self.stats['missing offline']} missing offline, "
+		return (f"images: {self.stats['downloaded']} downloaded, {self.stats['cached']} from cache, {shared}"
+				f"{self.stats['revalidated']} revalidated, {self.stats['deduplicated']} duplicate references, "
+				f"{self.stats['failed']} failed")
+
+	def fetch_latency(self):
+		"""percentiles of fetch_seconds, or None if nothing was fetched"""
+		with self._lock:
+			seconds = sorted(self.fetch_seconds)
+		if not seconds:
+			return None
+		def percentile(p):
+			return round(seconds[min(len(seconds) - 1, int(p * len(seconds)))], 6)
+		return {"fetches": len(seconds), "p50": percentile(0.5), "p90": percentile(0.9),
+				"p99": percentile(0.99), "max": round(seconds[-1], 6)}
+
+	def _count(self, stat, amount=1):
+		with self._lock:
+			self.stats[stat] += amount
+
+	def _host_slot(self, netloc):
+		with self._lock:
+			if netloc not in self._host_slots:
+				self._host_slots[netloc] = threading.BoundedSemaphore(self.per_host)
+			return self._host_slots[netloc]
+
+	def _connection(self, scheme, netloc):
+		conns = getattr(self._thread_state, "connections", None)
+		if conns is None:
+			conns = self._thread_state.connections = {}
+		key = (scheme, netloc)
+		if key not in conns:
+			conns[key] = self._new_connection(scheme, netloc)
+			with self._lock:
+				self._all_connections.append(conns[key])
+		return conns[key]
+
+	def _new_connection(self, scheme, netloc):
+		conn_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+		proxy = self._proxies.get(scheme)
+		if proxy and not urllib.request.proxy_bypass(netloc.split(":")[0]):
+			proxy_netloc = urllib.parse.urlsplit(proxy).netloc or proxy
+			if scheme == "https":
+				conn = http.client.HTTPSConnection(proxy_netloc, timeout=self.timeout)
+				conn.set_tunnel(netloc)
+				return conn
+			return http.client.HTTPConnection(proxy_netloc, timeout=self.timeout)
+		return conn_class(netloc, timeout=self.timeout)
+
+	def _drop_connection(self, scheme, netloc):
+		conn = self._thread_state.connections.pop((scheme, netloc), None)
+		if conn is not None:
+			conn.close()
+
+	def _download(self, src_url, save_path):
+		start = time.perf_counter()
+		try:
+			if self.cache is not None and self.cache.shared and not self.ignore_cache and not self.revalidate:
+				return self._download_once_across_processes(src_url, save_path)
+			return self._download_or_reuse(src_url, save_path)
+		finally:
+			self._count("download seconds", time.perf_counter() - start)
+
+	def _copy_download(self, src_url, download, save_path):
+		downloaded_path = download.result()
+		if downloaded_path is None:
+			return None
+		if os.path.abspath(downloaded_path) == os.path.abspath(save_path):
+			return save_path
+		entry = self.cache.lookup(src_url) if self.cache is not None else None
+		if entry is not None:
+			self.cache.publish(src_url, entry, save_path)
+		else:
+			tmp_path = f"{save_path}.{os.getpid()}-{threading.get_ident()}.part"
+			shutil.copyfile(downloaded_path, tmp_path)
+			os.replace(tmp_path, save_path)
+		return save_path
+
+	def _download_once_across_processes(self, src_url, save_path):
+		"""downloads src_url unless another process sharing the cache already is, then reuses its download"""
+		stale_seconds = self.timeout * (self.retries + 2)
+		while True:
+			entry = self.cache.lookup(src_url)
+			if entry is not None:
+				self.cache.publish(src_url, entry, save_path)
+				self._count("cached")
+				return save_path
+			if self.cache.claim(src_url, stale_seconds):
+				break
+			entry = self.cache.wait_for_claim(src_url, stale_seconds)
+			if entry is None:
+				continue # the other process failed or died. try claiming it
+			self.cache.publish(src_url, entry, save_path)
+			self._count("downloaded by another process")
+			return save_path
+		try:
+			return self._download_or_reuse(src_url, save_path)
+		finally:
+			self.cache.release(src_url)
+
+	def _download_or_reuse(self, src_url, save_path):
+		headers = {}
+		if self.cache is not None and not self.ignore_cache:
+			if self.revalidate:
+				headers = self.cache.validators(src_url)
+			else:
+				entry = self.cache.lookup(src_url)
+				if entry is not None:
+					self.cache.publish(src_url, entry, save_path)
+					self._count("cached")
+					return save_path
+		elif self.cache is None and not self.ignore_cache and os.path.isfile(save_path):
+			converter_logger.debug(f"found image in cache '{save_path}'")
+			self._count("cached")
+			return save_path
+
+		if self.mirror is not None and not headers:
+			known_sha256 = self.cache.entries.get(src_url, {}).get("sha256") if self.cache is not None else None
+			mirror_path = self.mirror.resolve(src_url, known_sha256)
+			if mirror_path is not None:
+				converter_logger.debug(f"found '{src_url}' in the mirror at '{mirror_path}'")
+				if self.cache is not None:
+					# kept like a download, so the cache knows where it's published and gc keeps it
+					f, tmp_path = self.cache.new_temp_file()
+					f.close()
+					link_or_copy(mirror_path, tmp_path)
+					mirrored = self.mirror.files[mirror_path]
+					self.cache.publish(src_url, self.cache.store(src_url, tmp_path, mirrored["sha256"], mirrored["size"]), save_path)
+				else:
+					link_or_copy(mirror_path, save_path)
+				self._count("mirrored")
+				return save_path
+		if self.offline:
+			converter_logger.error(f"'{src_url}' isn't cached or in the image mirror, and not downloading while offline")
+			with self._lock:
+				self.stats["failed"] += 1
+				self.stats["missing offline"] += 1
+				self.failed[src_url] = "missing offline"
+			return None
+
+		for attempt in range(self.retries + 1):
+			attempt_start = time.perf_counter()
+			try:
+				converter_logger.debug(f"downloading '{src_url}'")
+				self._fetch(src_url, save_path, headers)
+				return save_path
+			except (OSError, http.client.HTTPException, ImageDownloadError) as e:
+				retryable = getattr(e, "retryable", True)
+				if attempt == self.retries or not retryable:
+					converter_logger.error(f"failed downloading '{src_url}': {e}")
+					with self._lock:
+						self.stats["failed"] += 1
+						self.stats["retry seconds"] += time.perf_counter() - attempt_start
+						self.failed[src_url] = str(e)
+					return None
+				delay = RETRY_BACKOFF_SECONDS * (2 ** attempt)
+				converter_logger.warning(f"retrying '{src_url}' in {delay}s because: {e}")
+				self._count("retries")
+				# the failed attempt and the wait before the next, lost to retrying
+				self._count("retry seconds", time.perf_counter() - attempt_start + delay)
+				time.sleep(delay)
+
+	def _fetch(self, src_url, save_path, headers):
+		url = src_url
+		for _ in range(MAX_REDIRECTS + 1):
+			location = self._fetch_once(src_url, url, save_path, headers)
+			if location is None:
+				return
+			url = urllib.parse.urljoin(url, location)
+		raise ImageDownloadError("too many redirects", retryable=False)
+
+	def _fetch_once(self, src_url, url, save_path, headers):
+		"""saves url to save_path. returns where to go next if redirected, otherwise None"""
+		parts = urllib.parse.urlsplit(url)
+		if parts.scheme not in ["http", "https"]:
+			raise ImageDownloadError(f"unsupported url scheme '{parts.scheme}'", retryable=False)
+		target = url if (parts.scheme == "http" and self._proxies.get("http")) else \
+			urllib.parse.urlunsplit(("", "", parts.path or "/", parts.query, ""))
+
+		with self._host_slot(parts.netloc):
+			start = time.perf_counter()
+			try:
+				resp = self._request(parts.scheme, parts.netloc, target, headers)
+				if resp.status in [301, 302, 303, 307, 308] and resp.getheader("Location"):
+					resp.read()
+					return resp.getheader("Location")
+				if resp.status == 304 and self.cache is not None and self.cache.lookup(src_url) is not None:
+					resp.read()
+					self.cache.mark_used(src_url, resp.getheader("ETag"), resp.getheader("Last-Modified"))
+					self.cache.publish(src_url, self.cache.lookup(src_url), save_path)
+					self._count("revalidated")
+					return None
+				if resp.status != 200:
+					resp.read()
+					raise ImageDownloadError(f"HTTP {resp.status} {resp.reason}",
+											 retryable=(resp.status >= 500 or resp.status == 429))
+				self._save_response(src_url, resp, save_path)
+			except:
+				# connection is in an unknown state. next request gets a fresh one
+				self._drop_connection(parts.scheme, parts.netloc)
+				raise
+			finally:
+				with self._lock:
+					self.fetch_seconds.append(time.perf_counter() - start)
+		self._count("downloaded")
+		return None
+
+	def _save_response(self, src_url, resp, save_path):
+		if self.cache is not None:
+			f, tmp_path = self.cache.new_temp_file()
+		else:
+			tmp_path = f"{save_path}.{os.getpid()}-{threading.get_ident()}.part"
+			f = open(tmp_path, "wb")
+
+		try:
+			digest = hashlib.sha256()
+			size = 0
+			with f:
+				while True:
+					chunk = resp.read(READ_CHUNK_SIZE)
+					if not chunk:
+						break
+					digest.update(chunk)
+					size += len(chunk)
+					f.write(chunk)
+		except:
+			os.unlink(tmp_path)
+			raise
+		self._count("downloaded bytes", size)
+
+		if self.cache is None:
+			os.replace(tmp_path, save_path)
+			return
+		entry = self.cache.store(src_url, tmp_path, digest.hexdigest(), size,
+								 resp.getheader("ETag"), resp.getheader("Last-Modified"))
+		self.cache.publish(src_url, entry, save_path)
+
+	def _request(self, scheme, netloc, target, extra_headers):
+		headers = {"User-Agent": USER_AGENT, "Host": netloc, **extra_headers}
+		reused = (scheme, netloc) in getattr(self._thread_state, "connections", {})
+		conn = self._connection(scheme, netloc)
+		try:
+			conn.request("GET", target, headers=headers)
+			return conn.getresponse()
+		except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+			if not reused:
+				raise
+			# the server closed the kept-alive connection while idle. that's not a failure
+			self._drop_connection(scheme, netloc)
+			conn = self._connection(scheme, netloc)
+			conn.request("GET", target, headers=headers)
+			return conn.getresponse()
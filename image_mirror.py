@@ -0,0 +1,186 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+
+import os
+import re
+import sys
+import json
+import logging
+import argparse
+import collections
+import urllib.parse
+from fs_utils import atomic_write_text, file_sha256
+from image_sizes import image_variant
+
+converter_logger = logging.getLogger('converter')
+
+INDEX_VERSION = 1
+# the short url hash "unique image names" adds to saved images
+UNIQUE_NAME_SUFFIX_RE = re.compile(r"-[0-9a-f]{8}$")
+SHA256_NAME_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def normalized_name(name):
+	"""
+		'Other%20Pic-5af9c5d5.PNG' -> 'other pic.png'. the same image's name as it is in a blogger url,
+		saved by an earlier conversion and in a photo archive
+	"""
+	stem, ext = os.path.splitext(urllib.parse.unquote_plus(name).lower())
+	return UNIQUE_NAME_SUFFIX_RE.sub("", stem) + ext
+
+
+class ImageMirror:
+	"""
+		an index over folders that already have the blog's images, ie photo archives or an
+		earlier conversion's image folder, so images are taken from them instead of the network.
+		an image url is looked up, in order, by:
+
+		- content hash, for urls an image cache manifest found in the folders knows
+		- blogger path without its size, for folders laid out like the image hosts
+		  ('1.bp.blogspot.com/-a/b/c/d/s1600/pic.png', as wget mirrors them) and urls in those manifests
+		- normalized file name, when all the files of that name are the same image
+
+		the index (every file's size, mtime and sha256, by its path in its folder) is saved at
+		index_path, so later runs only hash files that are new or changed, also after the folders
+		were copied to another host. refresh() re-reads the folders.
+	"""
+	def __init__(self, folders, index_path):
+		self.folders = [os.path.abspath(f) for f in folders]
+		self.index_path = index_path
+		self.files = {} # path -> {"size", "mtime", "sha256"}
+		self.stats = collections.Counter()
+		self._by_sha256 = {}
+		self._by_blogger_path = {}
+		self._by_name = collections.defaultdict(set) # normalized name -> sha256s
+		self._url_sha256 = {} # url -> sha256, from image cache manifests in the folders
+		self.refresh()
+
+	def _read_index(self):
+		"""[{path in folder: entry}], a dict per folder"""
+		if not self.index_path or not os.path.isfile(self.index_path):
+			return []
+		with open(self.index_path, "r", encoding="utf-8") as f:
+			index = json.load(f)
+		if index.get("version") != INDEX_VERSION:
+			converter_logger.warning(f"ignoring image mirror index of unknown version {index.get('version')}")
+			return []
+		return index["files"]
+
+	def refresh(self):
+		"""indexes the folders. files unchanged since the saved index aren't read again"""
+		known = self._read_index()
+		self.files = {}
+		manifests = []
+		for i, folder in enumerate(self.folders):
+			known_in_folder = known[i] if i < len(known) else {}
+			if not os.path.isdir(folder):
+				converter_logger.warning(f"image mirror folder '{folder}' doesn't exist")
+				continue
+			for dir_path, dir_names, file_names in os.walk(folder):
+				if os.path.basename(dir_path) == ".image-cache":
+					dir_names[:] = [d for d in dir_names if d == "objects"] # not downloads in progress
+				for name in file_names:
+					path = os.path.join(dir_path, name)
+					if name == "manifest.json" and os.path.basename(dir_path) == ".image-cache":
+						manifests.append(path)
+						continue
+					if name.endswith(".part") or name.startswith(".tmp-") or \
+							(self.index_path and os.path.abspath(path) == os.path.abspath(self.index_path)):
+						continue
+					self._index_file(folder, path, known_in_folder.get(os.path.relpath(path, folder).replace(os.sep, "/")))
+
+		for path in manifests:
+			self._index_cache_manifest(path)
+		self.save()
+		converter_logger.info(f"image mirror: {len(self.files)} files indexed, {self.stats['hashed']} hashed")
+
+	def _index_file(self, folder, path, known):
+		stat = os.stat(path)
+		if known is not None and known["size"] == stat.st_size and known["mtime"] == stat.st_mtime:
+			entry = known
+		elif SHA256_NAME_RE.match(os.path.basename(path)) and os.path.basename(os.path.dirname(os.path.dirname(path))) == "objects":
+			entry = {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": os.path.basename(path)} # an image cache object
+		else:
+			entry = {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": file_sha256(path)}
+			self.stats["hashed"] += 1
+		self.files[path] = entry
+
+		sha256 = entry["sha256"]
+		self._by_sha256.setdefault(sha256, path)
+		self._by_name[normalized_name(os.path.basename(path))].add(sha256)
+		# a folder named after an image host, ie a wget mirror
+		variant = image_variant("https://" + os.path.relpath(path, folder).replace(os.sep, "/"))
+		if variant is not None:
+			self._add_blogger_path(variant["of"], sha256)
+
+	def _add_blogger_path(self, of, sha256):
+		"""of the sizes of an image, the biggest is kept"""
+		current = self._by_blogger_path.get(of)
+		if current is None or self.files[self._by_sha256[sha256]]["size"] > self.files[self._by_sha256[current]]["size"]:
+			self._by_blogger_path[of] = sha256
+
+	def _index_cache_manifest(self, path):
+		with open(path, "r", encoding="utf-8") as f:
+			manifest = json.load(f)
+		for url, entry in manifest.get("urls", {}).items():
+			if entry["sha256"] not in self._by_sha256:
+				continue # an image this mirror doesn't have
+			self._url_sha256[url] = entry["sha256"]
+			variant = image_variant(url)
+			if variant is not None:
+				self._add_blogger_path(variant["of"], entry["sha256"])
+
+	def save(self):
+		if not self.index_path:
+			return
+		files = [{} for _ in self.folders]
+		for path, entry in self.files.items():
+			for i, folder in enumerate(self.folders):
+				if path.startswith(folder + os.sep):
+					files[i][os.path.relpath(path, folder).replace(os.sep, "/")] = entry
+					break
+		atomic_write_text(self.index_path, json.dumps({"version": INDEX_VERSION, "folders": self.folders,
+													   "files": files}, indent=1, sort_keys=True))
+
+	def resolve(self, url, sha256=None):
+		"""path of a file that has url's image, or None. sha256 is the image's hash if known, ie from the image cache"""
+		sha256 = sha256 or self._url_sha256.get(url)
+		if sha256 is None:
+			variant = image_variant(url)
+			if variant is not None:
+				sha256 = self._by_blogger_path.get(variant["of"])
+		if sha256 is None:
+			same_name = self._by_name.get(normalized_name(urllib.parse.urlsplit(url).path.rsplit("/", 1)[-1]), ())
+			if len(same_name) == 1:
+				sha256 = next(iter(same_name))
+			elif len(same_name) > 1:
+				converter_logger.debug(f"{len(same_name)} different images in the mirror are named like '{url}'")
+		return self._by_sha256.get(sha256) if sha256 else None
+
+
+def main():
+	parser = argparse.ArgumentParser(prog="image_mirror.py", description="index folders of images for offline conversions")
+	subcommands = parser.add_subparsers(dest="command", required=True)
+	index_parser = subcommands.add_parser("index", help="build or refresh the index, ie before copying to an offline host")
+	index_parser.add_argument("folders", nargs="+", help="folders with the blog's images")
+	index_parser.add_argument("--index", required=True, help="where to save the index")
+	lookup_parser = subcommands.add_parser("lookup", help="show which file each image url resolves to")
+	lookup_parser.add_argument("urls", nargs="+")
+	lookup_parser.add_argument("--folder", action="append", required=True)
+	lookup_parser.add_argument("--index", required=True)
+	args = parser.parse_args()
+
+	logging.basicConfig(level=logging.INFO, format="%(message)s")
+	if args.command == "index":
+		ImageMirror(args.folders, args.index)
+		return 0
+	mirror = ImageMirror(args.folder, args.index)
+	missing = 0
+	for url in args.urls:
+		path = mirror.resolve(url)
+		missing += path is None
+		converter_logger.info(f"{url} -> {path or 'not in the mirror'}")
+	return 1 if missing else 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,114 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+"""
+	blogspot and googleusercontent image urls say what size the server should scale the image
+	to, either as a path segment before the file name or as a suffix after '=':
+
+		https://1.bp.blogspot.com/-a/b/c/d/s1600/pic.png           longest side 1600
+		https://blogger.googleusercontent.com/img/b/R29v/w640-h480/pic.png
+		https://lh3.googleusercontent.com/abc=s0                   the original upload
+
+	so any resolution of the image can be downloaded by rewriting that part of the url.
+"""
+
+import re
+import urllib.parse
+
+SIZE = r"(?:s(?P<s>\d+)|w(?P<w>\d+)(?:-h\d+)?|h\d+)(?:-[\w-]*)?"
+SIZE_SEGMENT_RE = re.compile(f"^{SIZE}$")
+SIZE_SUFFIX_RE = re.compile(f"={SIZE}$")
+# the same image is served by 1.bp.blogspot.com, 2.bp.blogspot.com...
+NUMBERED_HOST_RE = re.compile(r"^\d+\.bp\.blogspot\.com$")
+
+
+def is_sizable(url):
+	host = urllib.parse.urlsplit(url).hostname or ""
+	return host.endswith(".bp.blogspot.com") or host.endswith("googleusercontent.com")
+
+
+def _find_size(url):
+	"""(url parts, path segments, index of the size segment or None, suffix match or None)"""
+	parts = urllib.parse.urlsplit(url)
+	segments = parts.path.split("/")
+	suffix = SIZE_SUFFIX_RE.search(segments[-1])
+	if suffix is not None:
+		return parts, segments, None, suffix
+	if len(segments) >= 3 and SIZE_SEGMENT_RE.match(segments[-2]):
+		return parts, segments, len(segments) - 2, None
+	return parts, segments, None, None
+
+
+def size_of(url):
+	"""
+		the size part of a blogger image url, ie 's1600' or 'w640-h480', or None if it doesn't
+		have one (or isn't a blogger image)
+	"""
+	if not is_sizable(url):
+		return None
+	_, segments, index, suffix = _find_size(url)
+	if suffix is not None:
+		return suffix.group(0)[1:]
+	return segments[index] if index is not None else None
+
+
+def requested_width(size):
+	"""how wide at most the image of a size part is. None if it's the original or can't tell"""
+	match = SIZE_SEGMENT_RE.match(size)
+	if match is None:
+		return None
+	if match.group("s") is not None:
+		return int(match.group("s")) or None # s0 is the original
+	if match.group("w") is not None:
+		return int(match.group("w"))
+	return None
+
+
+def with_size(url, size):
+	"""url asking for size (ie 'w1600') instead of what it asks for now. unchanged if it can't be resized"""
+	if not is_sizable(url):
+		return url
+	parts, segments, index, suffix = _find_size(url)
+	if suffix is not None:
+		segments[-1] = segments[-1][:suffix.start()] + "=" + size
+	elif index is not None:
+		segments[index] = size
+	else:
+		return url
+	return urllib.parse.urlunsplit(parts._replace(path="/".join(segments)))
+
+
+def capped_url(url, max_width):
+	"""url asking for at most max_width pixels wide. images already smaller are left as they are"""
+	size = size_of(url)
+	if size is None or max_width is None:
+		return url
+	width = requested_width(size)
+	if width is not None and width <= max_width:
+		return url
+	return with_size(url, f"w{max_width}")
+
+
+def srcset_urls(url, widths, max_width=None):
+	"""[(width, url)] of every width of the image in widths (up to max_width), or [] if it can't be resized"""
+	if size_of(url) is None:
+		return []
+	return [(width, with_size(url, f"w{width}")) for width in sorted(set(widths))
+			if max_width is None or width <= max_width]
+
+
+def image_variant(url):
+	"""
+		which image and size a blogger image url is, ie {"of": "bp.blogspot.com/-a/b/c/d/pic.png", "size": "w1600"}.
+		urls of the same image on different hosts or schemes are the same image. None for other urls
+	"""
+	size = size_of(url)
+	if size is None:
+		return None
+	parts, segments, index, suffix = _find_size(url)
+	if suffix is not None:
+		segments[-1] = segments[-1][:suffix.start()]
+	else:
+		del segments[index]
+	host = parts.hostname
+	if NUMBERED_HOST_RE.match(host):
+		host = "bp.blogspot.com"
+	return {"of": host + "/".join(segments), "size": size}
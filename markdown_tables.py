@@ -0,0 +1,213 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+
+import re
+import html
+import collections
+from render_targets import srcset_text
+
+# spans wider than this are taken as this wide, so a broken colspan="100000" can't blow up the output
+MAX_SPAN = 1000
+ALIGN_RE = re.compile(r"text-align\s*:\s*(left|center|right)")
+SEPARATORS = {None: "---", "left": ":---", "center": ":---:", "right": "---:"}
+WHITESPACE_RE = re.compile(r"\s+")
+# tags a cell's html keeps, and what they're written as. other tags are left out, keeping their text
+CELL_HTML_TAGS = {
+	"b": "strong", "strong": "strong", "i": "em", "em": "em", "u": "u", "s": "s", "strike": "s", "del": "del",
+	"tt": "code", "code": "code", "pre": "pre", "sub": "sub", "sup": "sup", "p": "p", "blockquote": "blockquote",
+	"ul": "ul", "ol": "ol", "li": "li", "h1": "h1", "h2": "h2", "h3": "h3", "h4": "h4", "h5": "h5", "h6": "h6",
+}
+CELL_HTML_VOID_TAGS = {"br": "<br>", "hr": "<hr>"}
+
+# html is the cell's contents as html (see CellHtml), for when the table is written as html
+TableCell = collections.namedtuple("TableCell", ["text", "tag", "start_tag", "colspan", "rowspan", "align", "html"],
+								   defaults=[None])
+
+
+def _span(attr_dict, name):
+	try:
+		return min(max(int(attr_dict.get(name) or 1), 1), MAX_SPAN)
+	except ValueError:
+		return 1
+
+
+def cell_alignment(attr_dict):
+	"""'left', 'center', 'right' or None, from the cell's align attribute or text-align style"""
+	align = (attr_dict.get("align") or "").lower()
+	if align in SEPARATORS:
+		return align
+	match = ALIGN_RE.search(attr_dict.get("style") or "")
+	return match.group(1) if match else None
+
+
+class Table:
+	"""
+		an html table being read, as rows of TableCells. the parser collects each cell's
+		markdown and the table is written once it's complete:
+
+		- as a GFM table. the first row is the header, column alignment comes from the first
+		  cell of each column that has one, and rowspan/colspan cells are laid out on a grid,
+		  leaving the cells they cover empty
+		- as html, when markdown can't express it: it has tables in it or code blocks in cells
+
+		a caption table is blogger's way of putting a caption under an image. it isn't a table
+		of data and isn't written.
+	"""
+	__slots__ = ["start_tag", "caption", "rows", "open_cell", "needs_html"]
+
+	def __init__(self, start_tag, caption=False):
+		self.start_tag = start_tag
+		self.caption = caption
+		self.rows = [] # [(tr start tag, [TableCell])]
+		self.open_cell = None # (tag, start tag, attr dict, buffer position, CellHtml) of the cell being read
+		self.needs_html = False
+
+	def start_row(self, start_tag):
+		self.rows.append((start_tag, []))
+
+	def add_cell(self, text, tag, start_tag, attr_dict, html=None):
+		if not self.rows:
+			self.start_row("<tr>") # a cell without a <tr>
+		if "```" in text:
+			self.needs_html = True
+		self.rows[-1][1].append(TableCell(text.strip(), tag, start_tag, _span(attr_dict, "colspan"),
+										  _span(attr_dict, "rowspan"), cell_alignment(attr_dict), html))
+
+	def grid(self):
+		"""the cells' texts placed on a grid, spanned over cells left empty, and each column's alignment"""
+		grid = []
+		alignments = []
+		covered = {} # column -> rows a rowspan above still covers
+		for _, cells in self.rows:
+			line = []
+			def fill_covered():
+				while covered.get(len(line)):
+					covered[len(line)] -= 1
+					line.append("")
+			for cell in cells:
+				fill_covered()
+				column = len(line)
+				line.append(cell.text)
+				line += [""] * (cell.colspan - 1)
+				if cell.rowspan > 1:
+					for c in range(column, column + cell.colspan):
+						covered[c] = cell.rowspan - 1
+				while len(alignments) < len(line):
+					alignments.append(None)
+				if alignments[column] is None:
+					alignments[column] = cell.align
+			fill_covered()
+			grid.append(line)
+		columns = max(len(line) for line in grid)
+		alignments += [None] * (columns - len(alignments))
+		return [line + [""] * (columns - len(line)) for line in grid], alignments
+
+	def to_markdown(self):
+		if not any(cells for _, cells in self.rows):
+			return ""
+		grid, alignments = self.grid()
+		lines = [markdown_row(grid[0]), "| " + " | ".join(SEPARATORS[a] for a in alignments) + " |"]
+		lines += [markdown_row(line) for line in grid[1:]]
+		return "\n".join(lines) + "\n"
+
+	def to_html(self, nested=False):
+		"""
+			the table as html, each row on a line so it's one html block, or all on one line when
+			it's nested in another table's cell. cells keep their attributes. markdown isn't read in
+			html blocks, so cells are written from their html, not their markdown
+		"""
+		lines = [self.start_tag]
+		for row_start_tag, cells in self.rows:
+			lines.append(row_start_tag + "".join(f"{cell.start_tag}{html_cell_text(cell)}</{cell.tag}>"
+												  for cell in cells) + "</tr>")
+		lines.append("</table>")
+		return "".join(lines) if nested else "\n".join(lines) + "\n"
+
+
+def html_cell_text(cell):
+	"""the cell's html. a cell added without it gets its text, escaped"""
+	if cell.html is not None:
+		return cell.html
+	return html.escape(cell.text, quote=False).replace("\n", "<br>")
+
+
+class CellHtml:
+	"""
+		a table cell's contents as html, read alongside its markdown in case the table is
+		written as html. only formatting tags (CELL_HTML_TAGS), links and images are kept,
+		text is escaped, and it's all on one line so the table stays one html block.
+		tags the cell leaves open are closed at its end.
+	"""
+	__slots__ = ["parts", "open_tags"]
+
+	def __init__(self):
+		self.parts = []
+		self.open_tags = [] # (tag, index of its start tag in parts, html that closes it), innermost last
+
+	def _open(self, tag, start_html, end_html):
+		self.open_tags.append((tag, len(self.parts), end_html))
+		self.parts.append(start_html)
+
+	def _close(self, tag):
+		"""closes the innermost open tag and the tags opened in it. returns where its start tag is in parts"""
+		while True:
+			open_tag, index, end_html = self.open_tags.pop()
+			self.parts.append(end_html)
+			if open_tag == tag:
+				return index
+
+	def _is_open(self, tag):
+		return any(open_tag == tag for open_tag, _, _ in self.open_tags)
+
+	def _in_pre(self):
+		return any(end_html.endswith("</pre>") for _, _, end_html in self.open_tags)
+
+	def start_tag(self, tag):
+		if tag in CELL_HTML_VOID_TAGS:
+			self.parts.append(CELL_HTML_VOID_TAGS[tag])
+		elif tag == "code" and not self._in_pre():
+			# the markdown has <code> as a code block
+			self._open("code", "<pre><code>", "</code></pre>")
+		elif tag in CELL_HTML_TAGS:
+			name = CELL_HTML_TAGS[tag]
+			self._open(name, f"<{name}>", f"</{name}>")
+
+	def end_tag(self, tag):
+		tag = CELL_HTML_TAGS.get(tag)
+		if tag is not None and self._is_open(tag):
+			self._close(tag)
+
+	def start_link(self):
+		self._open("a", "", "</a>") # filled in by end_link(), once the link's target is known
+
+	def end_link(self, href):
+		"""closes the open link, pointing it at href. with href None the link is left out, but not its contents"""
+		if not self._is_open("a"):
+			return
+		index = self._close("a")
+		if href is None:
+			self.parts[index] = ""
+			self.parts.pop() # its </a>
+		else:
+			self.parts[index] = f'<a href="{html.escape(href)}">'
+
+	def image(self, alt_text, path, srcset=None):
+		srcset_attr = f' srcset="{html.escape(srcset_text(srcset))}"' if srcset else ""
+		self.parts.append(f'<img src="{html.escape(path)}"{srcset_attr} alt="{html.escape(alt_text)}">')
+
+	def data(self, text):
+		if self._in_pre():
+			self.parts.append(html.escape(text, quote=False).replace("\r", "").replace("\n", "&#10;"))
+		else:
+			self.parts.append(html.escape(WHITESPACE_RE.sub(" ", text), quote=False))
+
+	def raw(self, text):
+		"""html to put in the cell as is, like a table nested in it"""
+		self.parts.append(text)
+
+	def text(self):
+		closing = [end_html for _, _, end_html in reversed(self.open_tags)]
+		return "".join(self.parts + closing).strip()
+
+
+def markdown_row(texts):
+	return "| " + " | ".join(text.replace("|", "\\|").replace("\n", "<br>") for text in texts) + " |"
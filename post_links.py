@@ -0,0 +1,108 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+
+import os
+import re
+import json
+import logging
+import urllib.parse
+from fs_utils import atomic_write_text
+
+converter_logger = logging.getLogger('converter')
+
+LINKS_VERSION = 1
+MAX_MISSING_LINK_WARNINGS = 10
+# blogger's post urls: /YYYY/MM/slug.html
+POST_PATH_RE = re.compile(r"/\d{4}/\d{2}/[^/]+\.html")
+# blogspot serves blogs under country domains too (NAME.blogspot.co.uk)
+BLOGSPOT_HOST_RE = re.compile(r"\.blogspot\.[a-z]{2,3}(?:\.[a-z]{2})?$")
+HREF_RE = re.compile(r"""href\s*=\s*["']([^"']*\.html[^"']*)["']""", re.IGNORECASE)
+
+
+def post_url_key(url):
+	"""
+		'host/YYYY/MM/slug.html' of a link to a blog post, the same for every way of writing the
+		url (scheme, www., country domain, ?m=1 and other queries, #fragment). None if it isn't one.
+		a link without a host is '/YYYY/MM/slug.html'
+	"""
+	if ".html" not in url:
+		return None
+	parts = urllib.parse.urlsplit(url.strip())
+	if parts.scheme not in ("http", "https", ""):
+		return None
+	path = urllib.parse.unquote(parts.path)
+	if not POST_PATH_RE.fullmatch(path):
+		return None
+	host = (parts.hostname or "").lower()
+	if host.startswith("www."):
+		host = host[4:]
+	return BLOGSPOT_HOST_RE.sub(".blogspot.com", host) + path
+
+
+def entry_post_url(entry):
+	"""the url blogger published the post entry at, from its alternate link. drafts have none"""
+	for link in entry.findall("{http://www.w3.org/2005/Atom}link"):
+		if link.attrib.get("rel") == "alternate":
+			return link.attrib.get("href")
+	return None
+
+
+class PostLinkIndex:
+	"""
+		where links to the blog's posts point in the output: post_url_key() of each post's
+		url -> its link target (see MarkdownTarget.post_link()). resolving a link is a dict lookup.
+		complete is set when it was built from the whole export before converting.
+	"""
+	def __init__(self, targets=None, complete=False):
+		self.targets = {}
+		self.paths = {} # '/YYYY/MM/slug.html' -> link target, for links without a host
+		self.hosts = set()
+		self.complete = complete
+		for key, target in (targets or {}).items():
+			self._add_key(key, target)
+
+	def _add_key(self, key, target):
+		host, _, path = key.partition("/")
+		self.targets[key] = target
+		self.paths["/" + path] = target
+		self.hosts.add(host)
+
+	def add(self, url, target):
+		key = post_url_key(url) if url else None
+		if key is not None:
+			self._add_key(key, target)
+
+	def resolve(self, href):
+		"""href's link target, keeping its #fragment, or None if it isn't a link to a post in the index"""
+		key = post_url_key(href)
+		if key is None:
+			return None
+		target = self.targets.get(key) if not key.startswith("/") else self.paths.get(key)
+		if target is None:
+			return None
+		fragment = href.partition("#")[2]
+		return f"{target}#{fragment}" if fragment else target
+
+	def is_internal(self, href):
+		"""whether href links to a post of the blog, whether it's in the index or not"""
+		key = post_url_key(href)
+		return key is not None and (key.startswith("/") or key.partition("/")[0] in self.hosts)
+
+	def resolve_html(self, html):
+		"""[(href, target)] of every link to a post in html, so a post's output can be told apart by where its links go"""
+		return [(href, self.resolve(href)) for href in HREF_RE.findall(html) if post_url_key(href) is not None]
+
+	@classmethod
+	def load(cls, path):
+		"""the index an earlier run saved, or an empty one"""
+		if not os.path.isfile(path):
+			return cls()
+		with open(path, "r", encoding="utf-8") as f:
+			saved = json.load(f)
+		if saved.get("version") != LINKS_VERSION:
+			converter_logger.warning(f"ignoring post links of unknown version {saved.get('version')}")
+			return cls()
+		return cls(saved["links"])
+
+	def save(self, path):
+		atomic_write_text(path, json.dumps({"version": LINKS_VERSION, "links": self.targets},
+										   ensure_ascii=False, indent=1, sort_keys=True))
@@ -0,0 +1,82 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+
+import os
+import json
+import hashlib
+import logging
+from fs_utils import atomic_write_text
+
+converter_logger = logging.getLogger('converter')
+
+MANIFEST_VERSION = 1
+
+
+def content_hash(*parts):
+	digest = hashlib.sha1()
+	for part in parts:
+		digest.update(repr(part).encode("utf-8"))
+		digest.update(b"\0")
+	return digest.hexdigest()
+
+
+class PostManifest:
+	"""
+		what earlier runs wrote for each post, keyed by the post's Atom id:
+			{"updated": ..., "content_hash": ..., "config": <config fingerprint>, "output_path": ...}
+
+		a post whose updated timestamp, content and config fingerprint all match its entry,
+		and whose output file still exists, doesn't need converting again.
+	"""
+	def __init__(self, path):
+		self.path = path
+		self.posts = {}
+		self.seen = set()
+		self._dirty = False
+		if os.path.isfile(path):
+			with open(path, "r", encoding="utf-8") as f:
+				manifest = json.load(f)
+			if manifest.get("version") == MANIFEST_VERSION:
+				self.posts = manifest["posts"]
+			else:
+				converter_logger.warning(f"ignoring post manifest of unknown version {manifest.get('version')}")
+
+	def is_unchanged(self, post_id, updated, post_hash, config_fingerprint):
+		self.seen.add(post_id)
+		entry = self.posts.get(post_id)
+		return entry is not None and entry["updated"] == updated and entry["content_hash"] == post_hash \
+			and entry["config"] == config_fingerprint \
+			and (entry["output_path"] is None or os.path.isfile(entry["output_path"]))
+
+	def record(self, post_id, updated, post_hash, config_fingerprint, output_path):
+		"""records what was written for post_id. a post that moved to a new file has its old file removed"""
+		old_output_path = self.posts.get(post_id, {}).get("output_path")
+		if old_output_path and output_path and os.path.abspath(old_output_path) != os.path.abspath(output_path) \
+				and os.path.isfile(old_output_path):
+			converter_logger.info(f"removing '{old_output_path}', post moved to '{output_path}'")
+			os.unlink(old_output_path)
+
+		self.seen.add(post_id)
+		self.posts[post_id] = {"updated": updated, "content_hash": post_hash,
+							   "config": config_fingerprint, "output_path": output_path}
+		self._dirty = True
+
+	def keep(self, post_id):
+		"""marks post_id as seen without checking it, ie a post an interrupted run already converted. it isn't pruned"""
+		self.seen.add(post_id)
+
+	def prune_unseen(self):
+		"""forgets posts this run didn't see and deletes their output. returns the pruned post ids"""
+		pruned = [post_id for post_id in self.posts if post_id not in self.seen]
+		for post_id in pruned:
+			output_path = self.posts.pop(post_id)["output_path"]
+			if output_path and os.path.isfile(output_path):
+				converter_logger.info(f"removing '{output_path}', post is no longer in the export")
+				os.unlink(output_path)
+			self._dirty = True
+		return pruned
+
+	def save(self):
+		if self._dirty:
+			atomic_write_text(self.path, json.dumps({"version": MANIFEST_VERSION, "posts": self.posts},
+													indent=1, sort_keys=True))
+			self._dirty = False
@@ -0,0 +1,111 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+
+import os
+import html
+import json
+import urllib.parse
+
+
+class MarkdownTarget:
+	"""
+		decides how a converted post looks in the output: its front matter, file name and how
+		images are written. HTMLToMarkdownParser calls image() while converting, so a post is
+		produced in one pass, already in the target's flavor.
+		the plain target writes markdown without front matter.
+	"""
+	def front_matter(self, post_data):
+		return ""
+
+	def post_file_name(self, post_data):
+		return urllib.parse.quote('-'.join(post_data['title'].split(' ')), safe='') + ".md"
+
+	def post_link(self, file_name):
+		"""where a link to the post saved as file_name points. posts are saved side by side"""
+		return urllib.parse.quote(file_name)
+
+	def image(self, alt_text, path, caption, srcset=None):
+		"""
+			markdown of an image. caption is what blogger's caption table has under the
+			image, already converted to markdown, or "" if there's none. srcset is
+			[(path, width)] of the image at several widths, or None.
+		"""
+		if srcset:
+			# markdown images have no srcset
+			return f'<img src="{html.escape(path)}" srcset="{html.escape(srcset_text(srcset))}" alt="{html.escape(alt_text)}">{caption}'
+		return f"![{alt_text}]({path}){caption}"
+
+
+def srcset_text(srcset):
+	return ", ".join(f"{path} {width}w" for path, width in srcset)
+
+
+def single_line(caption):
+	"""a caption with <br>s in it, on one line"""
+	return " ".join(line for line in caption.split("\n") if line)
+
+
+class JekyllTarget(MarkdownTarget):
+	def front_matter(self, post_data):
+		# consider putting first pic automatically
+		# feature-img: "assets/img/sample.png"
+		# thumbnail: "assets/img/thumbnails/sample-th.png"
+		return ("---\n"
+				"layout: post\n"
+				f"title: >\n    {post_data['title']}\n"
+				"hide_title: false\n"
+				f"tags: {post_data['categories']}\n"
+				"excerpt_separator: <!--more-->\n"
+				"---\n")
+
+	def post_file_name(self, post_data):
+		return f"{post_data['published'].strftime('%Y-%m-%d')}-{MarkdownTarget.post_file_name(self, post_data)}"
+
+	def post_link(self, file_name):
+		return f"{{% post_url {os.path.splitext(file_name)[0]} %}}"
+
+	def image(self, alt_text, path, caption, srcset=None):
+		"""
+			{% include image.html url="/assets/img/posts\ssh+file+transfer.jpg" caption="it's not stupid if it works" alt="some alt text" %}
+			with a srcset, the include gets a srcset="..." too
+		"""
+		srcset_param = f' srcset="{html.escape(srcset_text(srcset))}"' if srcset else ""
+		return (f'{{% include image.html url="{html.escape(path)}" caption="{html.escape(single_line(caption))}" '
+				f'alt="{html.escape(alt_text)}"{srcset_param} %}}')
+
+
+class HugoTarget(MarkdownTarget):
+	"""yaml front matter like hugo (and ghost's markdown importers) read. captioned images use hugo's figure shortcode"""
+	def front_matter(self, post_data):
+		# json strings are valid yaml strings, and take care of quoting
+		return ("---\n"
+				f"title: {json.dumps(post_data['title'], ensure_ascii=False)}\n"
+				f"date: {post_data['published'].isoformat()}\n"
+				f"author: {json.dumps(post_data['author'], ensure_ascii=False)}\n"
+				f"tags: {json.dumps(post_data['categories'], ensure_ascii=False)}\n"
+				"draft: false\n"
+				"---\n")
+
+	def post_link(self, file_name):
+		return f'{{{{< ref "{file_name}" >}}}}'
+
+	def image(self, alt_text, path, caption, srcset=None):
+		if not caption or srcset: # figure has no srcset
+			return MarkdownTarget.image(self, alt_text, path, caption, srcset)
+		return (f'{{{{< figure src="{html.escape(path)}" alt="{html.escape(alt_text)}" '
+				f'caption="{html.escape(single_line(caption))}" >}}}}')
+
+
+RENDER_TARGETS = {
+	"md": MarkdownTarget(),
+	"jekyll": JekyllTarget(),
+	"hugo": HugoTarget(),
+}
+
+
+def register_render_target(name, target):
+	"""
+		makes the "render target" setting name render posts with target, ie a MarkdownTarget subclass.
+		when converting with --jobs on Windows/macOS, register at import time of your module
+		so worker processes have it too.
+	"""
+	RENDER_TARGETS[name] = target
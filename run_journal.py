@@ -0,0 +1,140 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+
+import os
+import json
+import logging
+import threading
+from fs_utils import atomic_write_text
+
+converter_logger = logging.getLogger('converter')
+
+JOURNAL_VERSION = 1
+
+
+def _read_json_lines(path):
+	"""the records of a json lines file. a line cut short by a crash is skipped"""
+	records = []
+	with open(path, "r", encoding="utf-8") as f:
+		for line in f:
+			try:
+				records.append(json.loads(line))
+			except ValueError:
+				converter_logger.debug(f"skipping a cut short line of '{path}'")
+	return records
+
+
+class _JsonLinesAppender:
+	def __init__(self, path, keep):
+		self.path = path
+		self._lock = threading.Lock() # images are recorded from the download threads
+		self._file = open(path, "a" if keep else "w", encoding="utf-8")
+
+	def append(self, record, durable=True):
+		"""writes record as a line. durable records are on disk once this returns, the others with the next durable one"""
+		with self._lock:
+			self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+			self._file.flush()
+			if durable:
+				os.fsync(self._file.fileno())
+
+	def close(self):
+		with self._lock:
+			self._file.close()
+
+
+class CheckpointJournal:
+	"""
+		append-only record of what a conversion run finished: a line for each post saved (with
+		what the run's manifests need about it) and each image downloaded. a run that's
+		interrupted or crashes leaves its journal behind, and the next run of the same export
+		with the same settings (run_key) skips what the journal has, so it picks up where the
+		last one stopped. a journal of another run is started over.
+
+		post lines are fsynced as they're written, image lines are only flushed: losing the
+		last few of those just means looking the images up again.
+	"""
+	def __init__(self, path, run_key):
+		self.path = path
+		self.posts = {} # post id -> its record
+		self.failed = set() # ids of the posts that failed
+		self.images = set() # urls
+		resumed = os.path.isfile(path) and self._read(run_key)
+		self.resumed = bool(resumed)
+		self._out = _JsonLinesAppender(path, keep=self.resumed)
+		if self.resumed:
+			converter_logger.info(f"resuming the last run from '{path}': {len(self.posts)} posts and {len(self.images)} images done already")
+		else:
+			self._out.append({"journal": JOURNAL_VERSION, "run": run_key})
+
+	def _read(self, run_key):
+		records = _read_json_lines(self.path)
+		if not records or records[0].get("journal") != JOURNAL_VERSION or records[0].get("run") != run_key:
+			converter_logger.info(f"'{self.path}' is from a different export, settings or version. starting over")
+			return False
+		for record in records[1:]:
+			if "post" in record:
+				self.posts[record["post"]] = record
+			elif "failed" in record:
+				self.failed.add(record["failed"])
+			elif "image" in record:
+				self.images.add(record["image"])
+		return True
+
+	def post_done(self, post_id, **record):
+		self.posts[post_id] = dict(record, post=post_id)
+		self._out.append(self.posts[post_id])
+
+	def post_failed(self, post_id):
+		"""the resumed run doesn't try it again. the retry queue has it"""
+		self.failed.add(post_id)
+		self._out.append({"failed": post_id})
+
+	def image_done(self, url):
+		self.images.add(url)
+		self._out.append({"image": url}, durable=False)
+
+	def close(self, complete):
+		"""a complete run's journal is removed, the next run starts from the beginning"""
+		self._out.close()
+		if complete:
+			os.unlink(self.path)
+
+
+class RetryQueue:
+	"""
+		the posts and images a run failed on, with why, for a later run to try again
+		(--retry-failed). failures are appended as they happen, so a crashed run's are kept too.
+		entries are keyed by (kind, key): ("post", post id) or ("image", url). an entry stays
+		queued, run after run, until a run resolves it by getting past it.
+		close() rewrites the queue with what's still failing, or removes it if nothing is.
+	"""
+	def __init__(self, path):
+		self.path = path
+		self.entries = {} # (kind, key) -> {"kind", "key", "reason", "attempts", ...}
+		if os.path.isfile(path):
+			for record in _read_json_lines(path):
+				if record.get("resolved"):
+					self.entries.pop((record["kind"], record["key"]), None)
+				else:
+					self.entries[(record["kind"], record["key"])] = record
+		self._out = _JsonLinesAppender(path, keep=True)
+
+	def keys(self, kind):
+		return set(key for k, key in self.entries if k == kind)
+
+	def add(self, kind, key, reason, **info):
+		attempts = self.entries.get((kind, key), {}).get("attempts", 0) + 1
+		self.entries[(kind, key)] = dict(info, kind=kind, key=key, reason=reason, attempts=attempts)
+		self._out.append(self.entries[(kind, key)])
+
+	def resolve(self, kind, key):
+		"""takes what succeeded on a retry off the queue"""
+		if self.entries.pop((kind, key), None) is not None:
+			self._out.append({"kind": kind, "key": key, "resolved": True})
+
+	def close(self):
+		self._out.close()
+		if self.entries:
+			atomic_write_text(self.path, "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in self.entries.values()))
+		else:
+			os.unlink(self.path)
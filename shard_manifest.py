@@ -0,0 +1,152 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+
+import os
+import sys
+import json
+import hashlib
+import logging
+import argparse
+import collections
+from fs_utils import atomic_write_text
+
+converter_logger = logging.getLogger('converter')
+
+MANIFEST_VERSION = 1
+
+
+def parse_shard(text):
+	"""'2/4' -> (2, 4). shards are numbered from 1"""
+	try:
+		index, count = (int(n) for n in text.split("/"))
+	except ValueError:
+		raise argparse.ArgumentTypeError(f"expected a shard like '2/4', got '{text}'")
+	if not 1 <= index <= count:
+		raise argparse.ArgumentTypeError(f"shard {index} doesn't exist out of {count}")
+	return index, count
+
+
+def shard_of(post_id, count):
+	"""the shard (numbered from 1) post_id belongs to. the same on every host and python version"""
+	return int(hashlib.sha1(post_id.encode("utf-8")).hexdigest(), 16) % count + 1
+
+
+class ShardManifest:
+	"""
+		what one shard of a conversion did, so shards converted on different hosts can be merged:
+
+			{"shard": [2, 4], "posts": {post id: {"title": ..., "output": ...}},
+			 "images": {url: saved path}, "failures": {"posts": {post id: reason}, "images": {url: reason}}}
+
+		paths are relative to the shard's markdown and image folders.
+	"""
+	def __init__(self, shard, md_root, image_root):
+		self.shard = shard
+		self.md_root = md_root
+		self.image_root = image_root
+		self.posts = {}
+		self.images = {}
+		self.failures = {"posts": {}, "images": {}}
+
+	def _relative(self, path, root):
+		path = os.path.relpath(path, root)
+		return path.replace(os.sep, "/")
+
+	def post_written(self, post_id, title, output_path):
+		self.posts[post_id] = {"title": title,
+							   "output": self._relative(output_path, self.md_root) if output_path else None}
+
+	def image_referenced(self, src_url, save_path):
+		self.images[src_url] = self._relative(save_path, self.image_root)
+
+	def post_failed(self, post_id, reason):
+		self.failures["posts"][post_id] = reason
+
+	def images_failed(self, failed):
+		self.failures["images"].update(failed)
+
+	def to_json(self):
+		return {"version": MANIFEST_VERSION, "shard": list(self.shard), "posts": self.posts,
+				"images": self.images, "failures": self.failures}
+
+	def save(self, path):
+		atomic_write_text(path, json.dumps(self.to_json(), indent=1, sort_keys=True))
+
+
+def merge_shard_manifests(manifests):
+	"""
+		combines shard manifests (as loaded from JSON) into one, reporting what doesn't add up:
+		missing or repeated shards, posts converted by more than one shard, and different posts or
+		images saved under the same file name.
+	"""
+	merged = {"version": MANIFEST_VERSION, "posts": {}, "images": {},
+			  "failures": {"posts": {}, "images": {}}, "problems": []}
+	problems = merged["problems"]
+
+	counts = set(m["shard"][1] for m in manifests)
+	if len(counts) > 1:
+		problems.append(f"shards split the export differently: {sorted(counts)}")
+	seen_shards = collections.Counter(tuple(m["shard"]) for m in manifests)
+	for count in counts:
+		for index in range(1, count + 1):
+			if seen_shards[(index, count)] == 0:
+				problems.append(f"shard {index}/{count} is missing")
+	for shard, n in sorted(seen_shards.items()):
+		if n > 1:
+			problems.append(f"shard {shard[0]}/{shard[1]} given {n} times")
+
+	outputs = {} # output path -> post id
+	image_names = {} # saved image path -> url
+	for m in manifests:
+		for post_id, post in m["posts"].items():
+			if post_id in merged["posts"]:
+				problems.append(f"post '{post_id}' converted by more than one shard")
+				continue
+			merged["posts"][post_id] = dict(post, shard=m["shard"][0])
+			output = post["output"]
+			if output is None:
+				continue
+			# two names only differing in case are the same file on some file systems
+			key = output.lower()
+			if key in outputs:
+				problems.append(f"'{output}' written for both post '{outputs[key]}' and post '{post_id}'")
+			else:
+				outputs[key] = post_id
+
+		for url, saved in m["images"].items():
+			key = saved.lower()
+			if image_names.get(key, url) != url:
+				problems.append(f"image '{saved}' saved for both '{image_names[key]}' and '{url}'")
+			image_names.setdefault(key, url)
+			merged["images"][url] = saved
+
+		merged["failures"]["posts"].update(m["failures"]["posts"])
+		merged["failures"]["images"].update(m["failures"]["images"])
+	return merged
+
+
+def main():
+	parser = argparse.ArgumentParser(prog="shard_manifest.py", description="combine the results of --shard conversions")
+	subcommands = parser.add_subparsers(dest="command", required=True)
+	merge_parser = subcommands.add_parser("merge", help="merge shard manifests and check they don't collide")
+	merge_parser.add_argument("manifests", nargs="+", help="every shard's '.shard-I-of-N.json'")
+	merge_parser.add_argument("--output", help="where to write the merged manifest")
+	args = parser.parse_args()
+
+	logging.basicConfig(level=logging.INFO, format="%(message)s")
+	manifests = []
+	for path in args.manifests:
+		with open(path, "r", encoding="utf-8") as f:
+			manifests.append(json.load(f))
+	merged = merge_shard_manifests(manifests)
+	if args.output:
+		atomic_write_text(args.output, json.dumps(merged, indent=1, sort_keys=True))
+
+	converter_logger.info(f"{len(merged['posts'])} posts, {len(merged['images'])} images, "
+						  f"{len(merged['failures']['posts'])} failed posts, {len(merged['failures']['images'])} failed images")
+	for problem in merged["problems"]:
+		converter_logger.error(problem)
+	return 1 if merged["problems"] else 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,186 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+"""
+	indexes of the converted posts for a static site to build tag pages, archives and
+	client-side search from, without reading the posts back. written as compact json:
+
+		posts.json    {"version": 1, "posts": [{"id", "title", "path", "published", "tags", "excerpt"}]}
+		              newest first. the other indexes refer to posts by their position in this list
+		tags.json     {tag: [post, ...]}
+		archive.json  {year: {month: [post, ...]}}
+		search.json   {term: [post, count, post, count, ...]}, the posts' words (and title) lowercased
+
+	path is the post's file relative to the posts folder.
+"""
+
+import os
+import re
+import json
+import logging
+import collections
+from fs_utils import write_text_if_changed
+
+converter_logger = logging.getLogger('converter')
+
+INDEX_VERSION = 1
+EXCERPT_CHARS = 200
+MAX_TERM_CHARS = 40
+INDEX_FILES = ["posts.json", "tags.json", "archive.json", "search.json"]
+TERM_RE = re.compile(r"[^\W_]{2,}")
+# markdown that isn't a post's text: images, link targets, html tags and formatting characters
+MD_IMAGE_RE = re.compile(r"!\[([^\]]*)\]\([^)]*\)")
+MD_LINK_RE = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+HTML_TAG_RE = re.compile(r"<[^>]*>|\{%[^%]*%\}|\{\{<[^>]*>\}\}")
+MD_FORMATTING_RE = re.compile(r"[\\#>*_`|~]+|^\s*[-+]\s|^\s*\d+\.\s|^-{3,}$", re.MULTILINE)
+STOP_WORDS = frozenset("""
+	an and are as at be but by for from had has have he her his in is it its me my not of on or our
+	she so that the their them then there they this to was we were which who will with you your
+""".split())
+
+
+def plain_text(md):
+	"""the text of a post's markdown, without its markup"""
+	text = MD_IMAGE_RE.sub(r"\1", md)
+	text = MD_LINK_RE.sub(r"\1", text)
+	text = HTML_TAG_RE.sub(" ", text)
+	text = MD_FORMATTING_RE.sub(" ", text)
+	return " ".join(text.split())
+
+
+def text_terms(text):
+	"""{term: count} of text's words, lowercased, leaving out the most common english words"""
+	terms = collections.Counter(TERM_RE.findall(text.lower()))
+	return {term: count for term, count in terms.items() if term not in STOP_WORDS and len(term) <= MAX_TERM_CHARS}
+
+
+def excerpt(text):
+	if len(text) <= EXCERPT_CHARS:
+		return text
+	return text[:EXCERPT_CHARS].rsplit(" ", 1)[0] + "…"
+
+
+def index_fields(md):
+	"""what the indexes need of a post's markdown: its terms and excerpt. done where the post was converted"""
+	text = plain_text(md)
+	return {"terms": text_terms(text), "excerpt": excerpt(text)}
+
+
+class SiteIndexes:
+	"""
+		the index record of every post, merged with what's already in folder: posts this run
+		doesn't convert again (unchanged, or not in a partial run) keep the record they had.
+		save() once done converting writes the indexes, if anything changed.
+	"""
+	def __init__(self, folder, posts_root):
+		self.folder = folder
+		self.posts_root = posts_root
+		self.records = {} # post id -> {"title", "path", "published", "tags", "excerpt", "terms"}
+		self.seen = set()
+		self._dirty = True # until the indexes in folder are read, all of them
+		self._load()
+
+	def _read(self, name):
+		"""the index file's json, or None if it's missing or can't be read (ie an interrupted run left it half written)"""
+		path = os.path.join(self.folder, name)
+		if not os.path.isfile(path):
+			return None
+		try:
+			with open(path, "r", encoding="utf-8") as f:
+				return json.load(f)
+		except ValueError:
+			converter_logger.warning(f"ignoring unreadable site index '{path}'")
+			return None
+
+	def _load(self):
+		"""
+			reads the records of the posts back from posts.json and search.json. without either,
+			there are no records, and the posts are converted again to index them. the other
+			indexes are made from the records, they're written again if missing
+		"""
+		posts = self._read("posts.json")
+		if posts is None:
+			return
+		if posts.get("version") != INDEX_VERSION:
+			converter_logger.warning(f"ignoring site indexes of unknown version {posts.get('version')}, rebuilding them")
+			return
+		search = self._read("search.json")
+		if search is None:
+			converter_logger.info(f"no search index in '{self.folder}', rebuilding the site indexes")
+			return
+		records = [dict(post, terms={}) for post in posts["posts"]]
+		for term, postings in search.items():
+			# both are written by the same save(), unless a run was interrupted between them
+			if len(postings) % 2 or not all(type(i) is int and 0 <= i < len(records) for i in postings[::2]):
+				converter_logger.warning(f"the search index in '{self.folder}' doesn't match posts.json, rebuilding the site indexes")
+				return
+			for i in range(0, len(postings), 2):
+				records[postings[i]]["terms"][term] = postings[i + 1]
+		self.records = {record.pop("id"): record for record in records}
+		self._dirty = not all(os.path.isfile(os.path.join(self.folder, name)) for name in INDEX_FILES)
+
+	def has(self, post_id):
+		"""whether post_id has a record. it's kept through pruning"""
+		self.seen.add(post_id)
+		return post_id in self.records
+
+	def record(self, post_id):
+		return self.records.get(post_id)
+
+	def add(self, post_id, record):
+		self.seen.add(post_id)
+		if self.records.get(post_id) != record:
+			self.records[post_id] = record
+			self._dirty = True
+
+	def make_record(self, post_data, output_path, fields):
+		"""the post's record, from its metadata and index_fields() of its markdown"""
+		terms = collections.Counter(fields["terms"])
+		terms.update(text_terms(post_data["title"]))
+		return {
+			"title": post_data["title"],
+			"path": os.path.relpath(output_path, self.posts_root).replace(os.sep, "/") if output_path else None,
+			"published": post_data["published"].isoformat(),
+			"tags": list(post_data["categories"]),
+			"excerpt": fields["excerpt"],
+			"terms": dict(terms),
+		}
+
+	def prune_unseen(self):
+		"""forgets the posts this run didn't see. returns how many"""
+		pruned = [post_id for post_id in self.records if post_id not in self.seen]
+		for post_id in pruned:
+			del self.records[post_id]
+			self._dirty = True
+		return len(pruned)
+
+	def indexes(self):
+		"""{file name: index} of the records"""
+		order = sorted(self.records, key=lambda post_id: (self.records[post_id]["published"], post_id), reverse=True)
+		posts = []
+		tags = collections.defaultdict(list)
+		archive = collections.defaultdict(lambda: collections.defaultdict(list))
+		search = collections.defaultdict(list)
+		for i, post_id in enumerate(order):
+			record = self.records[post_id]
+			posts.append({"id": post_id, "title": record["title"], "path": record["path"], "published": record["published"],
+						  "tags": record["tags"], "excerpt": record["excerpt"]})
+			for tag in record["tags"]:
+				tags[tag].append(i)
+			archive[record["published"][:4]][record["published"][5:7]].append(i)
+			for term, count in record["terms"].items():
+				search[term] += (i, count)
+		return {
+			"posts.json": {"version": INDEX_VERSION, "posts": posts},
+			"tags.json": dict(sorted(tags.items())),
+			"archive.json": {year: dict(sorted(months.items())) for year, months in sorted(archive.items())},
+			"search.json": dict(sorted(search.items())),
+		}
+
+	def save(self):
+		if not self._dirty:
+			return
+		os.makedirs(self.folder, exist_ok=True)
+		for name, index in self.indexes().items():
+			write_text_if_changed(os.path.join(self.folder, name),
+								  json.dumps(index, ensure_ascii=False, separators=(",", ":")))
+		converter_logger.info(f"wrote the site indexes of {len(self.records)} posts to '{self.folder}'")
+		self._dirty = False
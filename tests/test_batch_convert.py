@@ -0,0 +1,56 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+"""run from the repo's root: py -m unittest discover tests"""
+
+import os
+import sys
+import json
+import logging
+import tempfile
+import unittest
+import convert_blogger_xml_to_md as converter
+from batch_convert import Blog, convert_blogs, blogs_from_manifest
+from run_journal import RetryQueue
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+if BENCHMARKS not in sys.path:
+	sys.path.insert(0, BENCHMARKS)
+from synthetic_export import SyntheticExport
+
+
+class BatchConvertTest(unittest.TestCase):
+	def setUp(self):
+		self.folder = tempfile.TemporaryDirectory()
+		logging.disable(logging.ERROR)
+
+	def tearDown(self):
+		logging.disable(logging.NOTSET)
+		self.folder.cleanup()
+
+	def path(self, name):
+		return os.path.join(self.folder.name, name)
+
+	def test_failed_images_are_queued_per_blog(self):
+		blogs = []
+		for name, seed in [("a", 1), ("b", 2)]:
+			export = SyntheticExport(posts=5, post_kb=2, mix={"paragraph": 1, "image": 3}, seed=seed)
+			export.write(self.path(f"{name}.xml"))
+			blogs.append((Blog(self.path(f"{name}.xml"), self.path(name)), export.image_urls))
+		config = converter.make_converter_config({"offline": True, "image cache path": self.path(".image-cache")})
+		results = convert_blogs([blog for blog, _ in blogs], config)
+		self.assertFalse(any("error" in r for r in results))
+		for blog, image_urls in blogs:
+			queue = RetryQueue(converter.get_retry_queue_path(blog.make_config(config)))
+			queue.close()
+			# the converter asks for the full size image, at another url than the export's
+			self.assertTrue(image_urls)
+			self.assertEqual({url.rsplit("/", 1)[1] for url in queue.keys("image")}, {url.rsplit("/", 1)[1] for url in image_urls})
+
+	def test_manifest_cant_set_shared_settings(self):
+		with open(self.path("blogs.json"), "w", encoding="utf-8") as f:
+			json.dump([{"export": "a.xml", "output": "a", "config": {"offline": True}}], f)
+		with self.assertRaises(SystemExit):
+			blogs_from_manifest(self.path("blogs.json"))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,62 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+"""run from the repo's root: py -m unittest discover tests"""
+
+import os
+import sys
+import logging
+import tempfile
+import unittest
+import convert_blogger_xml_to_md as converter
+from run_journal import RetryQueue
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+if BENCHMARKS not in sys.path:
+	sys.path.insert(0, BENCHMARKS)
+from synthetic_export import SyntheticExport
+
+POSTS = 10
+
+
+class PruneTest(unittest.TestCase):
+	"""posts a run doesn't convert itself aren't taken for deleted ones"""
+	def setUp(self):
+		self.folder = tempfile.TemporaryDirectory()
+		self.xml_path = os.path.join(self.folder.name, "export.xml")
+		self.out = os.path.join(self.folder.name, "posts")
+		SyntheticExport(posts=POSTS, post_kb=1).write(self.xml_path)
+		logging.disable(logging.WARNING)
+
+	def tearDown(self):
+		logging.disable(logging.NOTSET)
+		self.folder.cleanup()
+
+	def convert(self, **settings):
+		config = converter.make_converter_config(dict({"md_file_save_path": self.out, "offline": True,
+													   "dont download use demo image": "demo.jpg"}, **settings))
+		converter.convert_posts_to_md(self.xml_path, config=config)
+		return config
+
+	def posts(self):
+		return sorted(name for name in os.listdir(self.out) if name.endswith(".md"))
+
+	def test_resumed_posts_are_kept(self):
+		self.convert(**{"incremental conversion": True})
+		written = self.posts()
+		self.assertEqual(len(written), POSTS)
+		# interrupted by a run that isn't incremental, then resumed by one that prunes
+		self.convert(**{"stop after one conversion": True})
+		self.convert(**{"incremental conversion": True, "prune deleted posts": True})
+		self.assertEqual(self.posts(), written)
+
+	def test_retry_doesnt_prune(self):
+		config = self.convert(**{"incremental conversion": True})
+		written = self.posts()
+		queue = RetryQueue(converter.get_retry_queue_path(config))
+		queue.add("post", next(iter(converter.PostManifest(converter.get_post_manifest_path(config)).posts)), "failed")
+		queue.close()
+		self.convert(**{"incremental conversion": True, "prune deleted posts": True, "retry failed": True})
+		self.assertEqual(self.posts(), written)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,84 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+"""run from the repo's root: py -m unittest discover tests"""
+
+import os
+import sys
+import logging
+import tempfile
+import unittest
+import convert_blogger_xml_to_md as converter
+from fast_blogger_html import tokenize, compare_on_export, OutsideSubset
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+if BENCHMARKS not in sys.path:
+	sys.path.insert(0, BENCHMARKS)
+from synthetic_export import SyntheticExport, DEFAULT_MIX
+
+# html the fast tokenizer reads
+IN_SUBSET = [
+	"<p>a &amp; b &lt;c&gt; &#39;q&#39; *not bold* under_score</p>",
+	'<P CLASS="x">Upper</P><H2>heading</H2>',
+	"<a href=\"http://example.com/?a=1&amp;b=2\" title='t'>link</a>",
+	'<br/><br />text<img src="http://example.com/i.png" alt="a &quot;b&quot;"/>',
+	"<!-- comment --><!DOCTYPE html><div>x</div>",
+	"<table><tr><th>a-b</th></tr><tr><td><b>bold</b> c_d</td></tr></table>",
+	'<span style="font-family: courier;">malloc(0x10)</span> and <code>x = 1</code>',
+	"<ul><li>one</li><li><ol><li>nested</li></ol></li></ul>",
+	"<blockquote>quoted</blockquote><hr><i>it</i> <strike>gone</strike>",
+	"<pre>  spaced\n  lines</pre>\n\n   \n",
+	"<script></script><style></style><p>x &amp; y</p>",
+]
+# html it leaves to HTMLParser
+OUTSIDE_SUBSET = [
+	"<code>if (a < b) x = 1;</code>",
+	"<p align=center>unquoted</p>",
+	'<script>var a = "<b>";</script>after',
+	"<script>a &amp; b</script>after",
+	"<style>p &gt; a {}</style><p>x &amp; y</p>",
+	"<script> </script>",
+	"<textarea>a &lt; b</textarea>",
+	"text ending with &",
+	"<!-- a -- b -->",
+]
+
+
+def convert_both_ways(html):
+	fast = converter.convert_post_html(html, config=converter.make_converter_config({"fast html tokenizer": True}))
+	slow = converter.convert_post_html(html, config=converter.make_converter_config({"fast html tokenizer": False}))
+	return fast, slow
+
+
+class FastTokenizerTest(unittest.TestCase):
+	def test_subset_converts_like_htmlparser(self):
+		for html in IN_SUBSET:
+			with self.subTest(html=html):
+				tokenize(html) # doesn't raise
+				fast, slow = convert_both_ways(html)
+				self.assertEqual(fast, slow)
+
+	def test_falls_back_outside_subset(self):
+		for html in OUTSIDE_SUBSET:
+			with self.subTest(html=html):
+				with self.assertRaises(OutsideSubset):
+					tokenize(html)
+				fast, slow = convert_both_ways(html)
+				self.assertEqual(fast, slow)
+
+	def test_export_converts_like_htmlparser(self):
+		mix = dict(DEFAULT_MIX, post_link=1)
+		with tempfile.TemporaryDirectory() as folder:
+			xml_path = os.path.join(folder, "export.xml")
+			SyntheticExport(posts=40, post_kb=4, mix=mix, comments_per_post=2).write(xml_path)
+			logging.disable(logging.WARNING)
+			try:
+				stats, fallbacks, diffs = compare_on_export(xml_path, converter)
+			finally:
+				logging.disable(logging.NOTSET)
+		self.assertEqual(diffs, [])
+		self.assertEqual(stats["different"], 0)
+		self.assertEqual(stats["entries"], 40 + 40 * 2)
+		self.assertLess(stats["fell back"], stats["entries"])
+
+
+if __name__ == '__main__':
+	unittest.main()
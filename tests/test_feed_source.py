@@ -0,0 +1,108 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+"""run from the repo's root: py -m unittest discover tests"""
+
+import os
+import sys
+import logging
+import tempfile
+import unittest
+import convert_blogger_xml_to_md as converter
+from feed_source import FeedSource, POST_KIND, read_feed_state, save_feed_state
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+if BENCHMARKS not in sys.path:
+	sys.path.insert(0, BENCHMARKS)
+from synthetic_export import SyntheticExport
+from feed_server import FeedServer, ATOM, _time
+
+POSTS = 23
+
+
+def entry_ids(entries):
+	return [entry.find(f"{ATOM}id").text for entry in entries]
+
+
+class FeedSourceTest(unittest.TestCase):
+	@classmethod
+	def setUpClass(cls):
+		cls.folder = tempfile.TemporaryDirectory()
+		cls.xml_path = os.path.join(cls.folder.name, "export.xml")
+		SyntheticExport(posts=POSTS, post_kb=1, comments_per_post=1).write(cls.xml_path)
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.folder.cleanup()
+
+	def newest_first(self, server, key):
+		posts = sorted(server.posts, key=lambda p: _time(p.find(f"{ATOM}{key}").text), reverse=True)
+		return entry_ids(posts)
+
+	def test_reads_every_page(self):
+		with FeedServer(self.xml_path) as server:
+			source = FeedSource(server.url, page_size=5, workers=3)
+			entries = list(source.entries())
+			self.assertEqual(entry_ids(entries), self.newest_first(server, "published"))
+		self.assertEqual(len(entries), POSTS)
+		self.assertEqual(source.stats["pages"], 5)
+		self.assertEqual(server.stats["requests"], 5)
+		for entry in entries:
+			self.assertEqual(converter.extract_entry_kind(entry), "post")
+			self.assertIn(POST_KIND, [c.attrib.get("term") for c in entry.findall(f"{ATOM}category")])
+
+	def test_full_last_page_checks_for_more(self):
+		# the total can be out of date by the time the last page is read. after a full page, the next is asked for
+		with FeedServer(self.xml_path) as server:
+			source = FeedSource(server.url, page_size=POSTS, workers=3)
+			self.assertEqual(len(list(source.entries())), POSTS)
+		self.assertEqual(source.stats["pages"], 2)
+		self.assertEqual(source.stats["entries"], POSTS)
+
+	def test_updated_min_only_reads_updates(self):
+		with FeedServer(self.xml_path) as server:
+			source = FeedSource(server.url, page_size=5)
+			list(source.entries())
+			latest = source.latest_updated
+			self.assertEqual(latest, max((p.find(f"{ATOM}updated").text for p in server.posts), key=_time))
+
+			edited = server.posts[7].find(f"{ATOM}id").text
+			server.update_post(7, "2031-01-01T00:00:00.000+00:00")
+			server.stats.clear()
+			delta = FeedSource(server.url, page_size=5, updated_min=latest)
+			ids = entry_ids(delta.entries())
+			updated = {post.find(f"{ATOM}id").text: _time(post.find(f"{ATOM}updated").text) for post in server.posts}
+			expected = [post_id for post_id in self.newest_first(server, "updated") if updated[post_id] >= _time(latest)]
+		self.assertEqual(ids, expected)
+		self.assertEqual(ids[0], edited)
+		self.assertLess(len(ids), POSTS)
+		self.assertEqual(delta.latest_updated, "2031-01-01T00:00:00.000+00:00")
+		self.assertEqual(server.stats["requests"], 1)
+
+	def test_feed_state(self):
+		path = os.path.join(self.folder.name, ".feed-state.json")
+		self.assertIsNone(read_feed_state(path, "http://a/feeds/posts/default"))
+		save_feed_state(path, "http://a/feeds/posts/default", "2020-01-01T00:00:00.000+00:00")
+		save_feed_state(path, "http://b/feeds/posts/default", "2021-01-01T00:00:00.000+00:00")
+		self.assertEqual(read_feed_state(path, "http://a/feeds/posts/default"), "2020-01-01T00:00:00.000+00:00")
+		self.assertEqual(read_feed_state(path, "http://b/feeds/posts/default"), "2021-01-01T00:00:00.000+00:00")
+
+	def test_converts_like_the_export(self):
+		def convert(source, out):
+			config = converter.make_converter_config({"md_file_save_path": out, "offline": True, "feed page size": 5,
+													   "dont download use demo image": "demo.jpg"})
+			converter.convert_posts_to_md(source, config=config)
+			return {name: open(os.path.join(out, name), encoding="utf-8").read()
+					for name in os.listdir(out) if name.endswith(".md")}
+
+		logging.disable(logging.WARNING)
+		try:
+			from_export = convert(self.xml_path, os.path.join(self.folder.name, "from_export"))
+			with FeedServer(self.xml_path) as server:
+				from_feed = convert(server.url, os.path.join(self.folder.name, "from_feed"))
+		finally:
+			logging.disable(logging.NOTSET)
+		self.assertEqual(len(from_export), POSTS)
+		self.assertEqual(from_feed, from_export)
+
+
+if __name__ == '__main__':
+	unittest.main()
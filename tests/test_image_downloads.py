@@ -0,0 +1,108 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+"""run from the repo's root: py -m unittest discover tests"""
+
+import os
+import sys
+import socket
+import hashlib
+import tempfile
+import unittest
+import convert_blogger_xml_to_md as converter
+from image_downloader import ImageDownloader
+from image_cache import ImageCache
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+if BENCHMARKS not in sys.path:
+	sys.path.insert(0, BENCHMARKS)
+from image_server import ImageServer
+
+
+def closed_port():
+	"""a local port nothing listens on"""
+	with socket.socket() as s:
+		s.bind(("127.0.0.1", 0))
+		return s.getsockname()[1]
+
+
+class ParserImageRefsTest(unittest.TestCase):
+	def test_parser_only_records_images(self):
+		# nothing listens there: converting would hang or fail if the parser downloaded
+		src = f"http://127.0.0.1:{closed_port()}/img/a.png"
+		config = converter.make_converter_config()
+		converted = converter.convert_post_html(f'<img src="{src}"><p>text</p><img src="{src}" alt="again">', config=config)
+		self.assertEqual(converted["image_refs"], [src])
+		md_path = converter.image_paths_for_src(src, config)[1]
+		self.assertEqual(converted["md"].count(f"]({md_path})"), 2)
+
+
+class ImageDownloaderTest(unittest.TestCase):
+	def setUp(self):
+		self.folder = tempfile.TemporaryDirectory()
+		self.server = ImageServer().start()
+
+	def tearDown(self):
+		self.server.stop()
+		self.folder.cleanup()
+
+	def path(self, name):
+		return os.path.join(self.folder.name, name)
+
+	def test_downloads_each_url_once(self):
+		url = self.server.url + "/img/a.png"
+		with ImageDownloader(workers=4) as downloader:
+			first = downloader.submit(url, self.path("a.png"))
+			again = downloader.submit(url, self.path("a.png"))
+			copy = downloader.submit(url, self.path("copy.png"))
+		self.assertEqual(first.result(), self.path("a.png"))
+		self.assertEqual(again.result(), self.path("a.png"))
+		self.assertEqual(copy.result(), self.path("copy.png"))
+		self.assertEqual(self.server.stats["requests"], 1)
+		self.assertEqual(downloader.stats["deduplicated"], 2)
+		for name in ["a.png", "copy.png"]:
+			with open(self.path(name), "rb") as f:
+				self.assertEqual(f.read(), self.server.image("/img/a.png"))
+
+	def test_reuses_connections(self):
+		with ImageDownloader(workers=2, per_host=2) as downloader:
+			futures = [downloader.submit(f"{self.server.url}/img/{i}.png", self.path(f"{i}.png")) for i in range(20)]
+		self.assertTrue(all(f.result() for f in futures))
+		self.assertEqual(self.server.stats["requests"], 20)
+		self.assertLessEqual(self.server.stats["connections"], 2)
+
+	def test_retries_then_fails(self):
+		url = f"http://127.0.0.1:{closed_port()}/img/a.png"
+		with ImageDownloader(retries=1, timeout=5) as downloader:
+			future = downloader.submit(url, self.path("a.png"))
+		self.assertIsNone(future.result())
+		self.assertEqual(downloader.stats["retries"], 1)
+		self.assertEqual(downloader.stats["failed"], 1)
+		self.assertIn(url, downloader.failed)
+		self.assertFalse(os.path.exists(self.path("a.png")))
+
+	def test_offline_downloads_nothing(self):
+		url = self.server.url + "/img/a.png"
+		with ImageDownloader(offline=True) as downloader:
+			future = downloader.submit(url, self.path("a.png"))
+		self.assertIsNone(future.result())
+		self.assertEqual(downloader.failed, {url: "missing offline"})
+		self.assertEqual(self.server.stats["requests"], 0)
+
+
+class ImageCacheTest(unittest.TestCase):
+	def test_publish_replaces_another_image_of_the_same_size(self):
+		with tempfile.TemporaryDirectory() as folder:
+			cache = ImageCache(os.path.join(folder, "cache"))
+			f, tmp_path = cache.new_temp_file()
+			with f:
+				f.write(b"image")
+			entry = cache.store("http://example.com/a.png", tmp_path, hashlib.sha256(b"image").hexdigest(), 5)
+			dest_path = os.path.join(folder, "a.png")
+			with open(dest_path, "wb") as f:
+				f.write(b"other")
+			cache.publish("http://example.com/a.png", entry, dest_path)
+			with open(dest_path, "rb") as f:
+				self.assertEqual(f.read(), b"image")
+
+
+if __name__ == '__main__':
+	unittest.main()
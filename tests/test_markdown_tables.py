@@ -0,0 +1,36 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+"""run from the repo's root: py -m unittest discover tests"""
+
+import unittest
+from convert_blogger_xml_to_md import convert_post_html
+
+COMPLEX_TABLE = (
+	'<table border="1"><tr><th>a-b (x)</th><th>code</th></tr>'
+	'<tr><td><b>bold</b> c_d <a href="http://example.com/?a=1&amp;b=2">l*nk</a></td><td><code>x = 1<br>y &lt; 2</code></td></tr>'
+	'<tr><td><table><tr><td>in_ner</td></tr></table></td>'
+	'<td><span style="font-family: courier;">malloc(0x10)</span> <i>it</i></td></tr></table>'
+)
+
+
+class HtmlTableTest(unittest.TestCase):
+	def test_complex_table_is_html_without_markdown(self):
+		md = convert_post_html(COMPLEX_TABLE)["md"]
+		self.assertIn("<th>a-b (x)</th>", md)
+		self.assertIn('<td><strong>bold</strong> c_d <a href="http://example.com/?a=1&amp;b=2">l*nk</a></td>', md)
+		self.assertIn("<td><pre><code>x = 1<br>y &lt; 2</code></pre></td>", md)
+		self.assertIn("<td><table><tr><td>in_ner</td></tr></table></td>", md)
+		self.assertIn("<td><code>malloc(0x10)</code> <em>it</em></td>", md)
+		for markdown in ("\\", "**", "```", "`"):
+			self.assertNotIn(markdown, md)
+
+	def test_cell_leaves_tags_open(self):
+		md = convert_post_html("<table><tr><td><b>bold<td>next <table><tr><td>x</table></table>")["md"]
+		self.assertIn("<tr><td><strong>bold</strong></td><td>next <table><tr><td>x</td></tr></table></td></tr>", md)
+
+	def test_simple_table_is_markdown(self):
+		md = convert_post_html("<table><tr><th>a-b</th></tr><tr><td><b>x_y</b></td></tr></table>")["md"]
+		self.assertEqual(md.strip(), "| a\\-b |\n| --- |\n| **x\\_y** |")
+
+
+if __name__ == '__main__':
+	unittest.main()
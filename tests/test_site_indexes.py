@@ -0,0 +1,45 @@
+# NOTICE: using NO external libraries! Only std libs that come with python
+"""run from the repo's root: py -m unittest discover tests"""
+
+import os
+import json
+import logging
+import tempfile
+import unittest
+from site_indexes import SiteIndexes
+
+RECORD = {"title": "t", "path": "t.md", "published": "2020-01-01T00:00:00", "tags": ["a"], "excerpt": "e", "terms": {"word": 2}}
+
+
+class SiteIndexesTest(unittest.TestCase):
+	def setUp(self):
+		self.folder = tempfile.TemporaryDirectory()
+
+	def tearDown(self):
+		self.folder.cleanup()
+
+	def test_reads_back_records(self):
+		indexes = SiteIndexes(self.folder.name, self.folder.name)
+		indexes.add("1", RECORD)
+		indexes.add("2", dict(RECORD, published="2021-01-01T00:00:00", terms={"other": 1}))
+		indexes.save()
+		self.assertEqual(SiteIndexes(self.folder.name, self.folder.name).records, indexes.records)
+
+	def test_search_index_of_another_save_is_rebuilt(self):
+		indexes = SiteIndexes(self.folder.name, self.folder.name)
+		indexes.add("1", RECORD)
+		indexes.add("2", RECORD)
+		indexes.save()
+		# an interrupted run wrote search.json, not posts.json, of a save with more posts
+		search_path = os.path.join(self.folder.name, "search.json")
+		with open(search_path, "w", encoding="utf-8") as f:
+			json.dump({"word": [0, 2, 2, 1]}, f)
+		logging.disable(logging.WARNING)
+		try:
+			self.assertEqual(SiteIndexes(self.folder.name, self.folder.name).records, {})
+		finally:
+			logging.disable(logging.NOTSET)
+
+
+if __name__ == '__main__':
+	unittest.main()